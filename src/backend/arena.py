@@ -0,0 +1,308 @@
+"""
+Game states in shared memory for worker processes
+
+StateArena preallocates one multiprocessing.shared_memory block holding, per slot, the (6, 32) state,
+the deal (the deck is its tail from deck_starts on), an action, a seed, the ply count and the winner.
+Games are stepped in place by the process owning the slot, nothing but slot ranges and command codes
+go through the pipes. ArenaPool gives every worker a fixed contiguous range of slots, only the owner
+writes to a slot while a command on it is running and the parent reads it after the reply, so there
+are no locks and workers never contend for the same memory.
+"""
+
+import multiprocessing
+from enum import IntEnum
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from backend.game import Game
+from backend.moves import Action, legal_action_mask
+
+MAX_PLIES = 1000
+
+# Per slot arrays of the block in layout order, name: (shape after the slot axis, dtype)
+FIELDS = {
+    "states": ((6, 32), np.bool_),
+    "deals": ((32,), np.int64),
+    "deck_starts": ((), np.int64),
+    "actions": ((), np.int64),
+    "seeds": ((), np.uint64),
+    "plies": ((), np.int64),
+    "winners": ((), np.int64),
+}
+
+
+class Command(IntEnum):
+    RESET = 1 # Deal slot from seeds[slot]
+    STEP = 2 # Play actions[slot]
+    PLAYOUT = 3 # Play random moves seeded from seeds[slot] to the end of the game
+    CLOSE = 4
+
+
+class StateArena:
+    def __init__(self, slots, name=None):
+        """
+        Creates the shared block for slots games, or attaches to the existing block called name
+
+        Params:
+            slots: number of games
+            name: name of a block created by another StateArena with as many slots
+        """
+        self.slots = slots
+        self.size = sum(slots * int(np.prod(shape, dtype=int)) * np.dtype(dtype).itemsize for shape, dtype in FIELDS.values())
+        self.owner = name is None
+        self.shm = shared_memory.SharedMemory(name=name, create=self.owner, size=self.size)
+        self.name = self.shm.name
+        offset = 0
+        for field, (shape, dtype) in FIELDS.items():
+            array = np.ndarray((slots,) + shape, dtype=dtype, buffer=self.shm.buf, offset=offset)
+            offset += array.nbytes
+            setattr(self, field, array)
+        if self.owner:
+            self.winners[:] = -1
+        self.games = {}
+
+    def __reduce__(self):
+        # Other processes attach by name instead of copying the block
+        return StateArena, (self.slots, self.name)
+
+    def __len__(self):
+        return self.slots
+
+    def game(self, slot):
+        """
+        Game working on the slot in place, cached per slot. Its deck and board ranks are read again from
+        the arena on every call, so the slot may have been changed by another process in between.
+        """
+        game = self.games.get(slot)
+        if game is None:
+            game = Game.from_state(self.states[slot], self.deals[slot, self.deck_starts[slot]:])
+            game.deal = self.deals[slot]
+            self.games[slot] = game
+        else:
+            game.deck = game.deal[self.deck_starts[slot]:]
+            game.undo_stack = []
+            game.sync_board_ranks()
+            game.sync_phase()
+        return game
+
+    def store(self, slot, game):
+        """
+        Writes the deck position of a game from self.game back, after moving it
+        """
+        self.deck_starts[slot] = 32 - len(game.deck)
+
+    def load(self, slot, game):
+        """
+        Copies any Game into the slot
+        """
+        self.states[slot] = game.state
+        self.deals[slot] = -1
+        self.deals[slot, 32 - len(game.deck):] = game.deck
+        self.deck_starts[slot] = 32 - len(game.deck)
+        self.plies[slot] = 0
+        self.winners[slot] = -1
+
+    def reset(self, slot):
+        game = self.game(slot)
+        game.reset(int(self.seeds[slot]))
+        self.store(slot, game)
+        self.plies[slot] = 0
+        self.winners[slot] = -1
+
+    def step(self, slot):
+        """
+        Plays actions[slot], raises ValueError if it is not legal
+        """
+        game = self.game(slot)
+        player = 0 if game.state[5, 8] else 1
+        action = int(self.actions[slot])
+        if game.state[5, 11] or not legal_action_mask(game.state, player)[action]:
+            raise ValueError(f"Action {action} is not legal for player {player} in slot {slot}")
+        game.make_move(Action.from_index(action))
+        self.store(slot, game)
+        self.plies[slot] += 1
+        if game.state[5, 11]:
+            self.winners[slot] = 0 if game.state[5, 12] else 1
+
+    def playout(self, slot, max_plies=MAX_PLIES):
+        """
+        Plays uniformly random moves until the game is over or plies reaches max_plies
+        """
+        game = self.game(slot)
+        rng = np.random.default_rng(int(self.seeds[slot]))
+        plies = int(self.plies[slot])
+        while not game.state[5, 11] and plies < max_plies:
+            legal = np.flatnonzero(legal_action_mask(game.state, 0 if game.state[5, 8] else 1))
+            game.make_move(Action.from_index(legal[rng.integers(len(legal))]))
+            plies += 1
+        self.store(slot, game)
+        self.plies[slot] = plies
+        if game.state[5, 11]:
+            self.winners[slot] = 0 if game.state[5, 12] else 1
+
+    def close(self):
+        """
+        Detaches from the block, the creating arena also frees it
+        """
+        self.games = {}
+        for field in FIELDS:
+            setattr(self, field, None)
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+            self.owner = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _worker(remote, arena, max_plies):
+    arena.owner = False # A forked copy must not free the parent's block
+    while True:
+        command, start, stop = remote.recv()
+        if command == Command.CLOSE:
+            arena.close()
+            remote.close()
+            return
+        try:
+            for slot in range(start, stop):
+                if command == Command.RESET:
+                    arena.reset(slot)
+                elif command == Command.STEP:
+                    arena.step(slot)
+                else:
+                    arena.playout(slot, max_plies)
+            remote.send(None)
+        except Exception as error:
+            remote.send(str(error))
+
+
+class ArenaPool:
+    def __init__(self, arena, workers=None, max_plies=MAX_PLIES):
+        """
+        Worker processes stepping the games of a StateArena in place, each owns a contiguous range of slots
+
+        Write seeds or actions into the arena, then call reset, step or playout. They return once every
+        worker is done, so the arena may be read and written again.
+
+        Params:
+            arena: StateArena
+            workers: number of processes, defaults to the number of cores
+            max_plies: playouts stop after this many moves of a game
+        """
+        self.arena = arena
+        workers = min(workers or multiprocessing.cpu_count(), len(arena))
+        bounds = np.linspace(0, len(arena), workers + 1).astype(int)
+        self.ranges = [(int(bounds[w]), int(bounds[w + 1])) for w in range(workers)]
+        self.remotes = []
+        self.processes = []
+        for _ in self.ranges:
+            remote, worker_remote = multiprocessing.Pipe()
+            process = multiprocessing.Process(target=_worker, args=(worker_remote, arena, max_plies), daemon=True)
+            process.start()
+            worker_remote.close()
+            self.remotes.append(remote)
+            self.processes.append(process)
+
+    def run(self, command, slots=None):
+        """
+        Runs command on slots, a (start, stop) range or all slots if None, every worker takes its share
+
+        Raises:
+            RuntimeError: with the workers' messages if any slot failed
+        """
+        start, stop = (0, len(self.arena)) if slots is None else slots
+        busy = []
+        for remote, (first, last) in zip(self.remotes, self.ranges):
+            first, last = max(first, start), min(last, stop)
+            if first < last:
+                remote.send((int(command), first, last))
+                busy.append(remote)
+        # Every busy worker is drained before raising so the pipes stay in step
+        errors = [error for error in (remote.recv() for remote in busy) if error is not None]
+        if errors:
+            raise RuntimeError("; ".join(errors))
+
+    def reset(self, seeds, slots=None):
+        start, stop = (0, len(self.arena)) if slots is None else slots
+        self.arena.seeds[start:stop] = seeds
+        self.run(Command.RESET, (start, stop))
+
+    def step(self, actions, slots=None):
+        start, stop = (0, len(self.arena)) if slots is None else slots
+        self.arena.actions[start:stop] = actions
+        self.run(Command.STEP, (start, stop))
+
+    def playout(self, seeds, slots=None):
+        start, stop = (0, len(self.arena)) if slots is None else slots
+        self.arena.seeds[start:stop] = seeds
+        self.run(Command.PLAYOUT, (start, stop))
+
+    def close(self):
+        for remote in self.remotes:
+            remote.send((int(Command.CLOSE), 0, 0))
+        for process in self.processes:
+            process.join()
+        self.remotes = []
+        self.processes = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _pickled_step(job):
+    # What the pipes carry without an arena, the whole Game out and back for every move
+    game, action = job
+    game.make_move(Action.from_index(action))
+    return game
+
+
+if __name__ == "__main__":
+    import time
+
+    slots = 256
+    steps = 20 # Fewer than any game lasts
+    workers = multiprocessing.cpu_count()
+    rng = np.random.default_rng(0)
+    with StateArena(slots) as arena:
+        seeds = np.arange(slots)
+        for count in sorted({1, 2, workers}):
+            with ArenaPool(arena, count) as pool:
+                pool.reset(seeds)
+                start = time.perf_counter()
+                pool.playout(seeds)
+                elapsed = time.perf_counter() - start
+            assert (arena.winners >= 0).all()
+            print(f"arena playouts, {count} workers: {slots / elapsed:8.1f} games/s {arena.plies.sum() / elapsed:8.0f} plies/s")
+
+        # The workers' playouts are the same as playing the slots in this process
+        expected = arena.states.copy()
+        for slot in range(slots):
+            arena.reset(slot)
+            arena.playout(slot)
+        assert (arena.states == expected).all()
+
+        # Single moves, where the exchange costs most compared to the rules work
+        games = [Game(seed=int(seed)) for seed in seeds]
+        with ArenaPool(arena, workers) as pool, multiprocessing.Pool(workers) as pickled:
+            pool.reset(seeds)
+            arena_s = pickled_s = 0
+            for _ in range(steps):
+                to_move = np.where(arena.states[:, 5, 8], 0, 1)
+                mask = legal_action_mask(arena.states, to_move)
+                actions = [rng.choice(np.flatnonzero(row)) for row in mask]
+                start = time.perf_counter()
+                pool.step(actions)
+                arena_s += time.perf_counter() - start
+                start = time.perf_counter()
+                games = pickled.map(_pickled_step, zip(games, actions))
+                pickled_s += time.perf_counter() - start
+                assert all((game.state == state).all() for game, state in zip(games, arena.states))
+        print(f"step, {workers} workers: arena {slots * steps / arena_s:8.0f} moves/s, pickled Games {slots * steps / pickled_s:8.0f} moves/s")
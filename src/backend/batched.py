@@ -0,0 +1,276 @@
+import numpy as np
+
+from backend.bitstate import rank_fold_rows
+from backend.game import Game
+from backend.observation import encode_batch
+
+
+def _per_game(value, n):
+    """
+    Broadcasts a scalar player index (or an (N,) array of them) to an (N,) int array
+    """
+    return np.broadcast_to(np.asarray(value, dtype=np.intp), (n,))
+
+
+class BatchedGame:
+    state: np.ndarray
+    deck: np.ndarray
+    deck_pos: np.ndarray
+    """ Steps N independent games at once, every game uses the same layout as Game.state
+    Attribute |   Shape    | Purpose
+    state     | (N, 6, 32) | One Game.state per game
+    deck      | (N, 32)    | Full deal order of every game, the coser is always the last card
+    deck_pos  | (N,)       | Index into deck of the next card to draw, deck[n, deck_pos[n]:] is Game.deck
+
+    Every method takes moves as an (N, 6, 32) int array of the same deltas Game.attack and
+    Game.defend take, and a player that is either a single int or an (N,) array. Instead of
+    tuples they return (N,) bool masks, and only games whose mask is True are updated.
+    """
+
+    def __init__(self, n, seed=None):
+        self.rng = np.random.default_rng(seed)
+        self.state = np.zeros((n, 6, 32), dtype=bool)
+        self.deck = np.zeros((n, 32), dtype=np.intp)
+        self.deck_pos = np.zeros(n, dtype=np.intp)
+        self.reset()
+
+    def __len__(self):
+        return len(self.state)
+
+    def reset(self, mask=None):
+        """
+        Deals fresh games, either for all N games or only where mask is True
+
+        Params:
+            mask: ndarray(N,) bool or None, games to redeal
+        """
+        n = len(self.state)
+        games = np.arange(n) if mask is None else np.flatnonzero(mask)
+        m = len(games)
+        if m == 0:
+            return
+
+        # The coser is one of the 7 lowest trumps and goes to the bottom of the deck,
+        # pushing its sort key above every other card keeps the rest uniformly shuffled
+        keys = self.rng.random((m, 32))
+        coser = self.rng.integers(0, 7, size=m)
+        keys[np.arange(m), coser] = 2
+        deck = np.argsort(keys, axis=1)
+
+        state = np.zeros((m, 6, 32), dtype=bool)
+        state[:, 2, :] = True
+        rows = np.arange(m)[:, None]
+        state[rows, 0, deck[:, 0:6]] = True
+        state[rows, 1, deck[:, 6:12]] = True
+        state[rows, 2, deck[:, 0:12]] = False
+        state[np.arange(m), 5, coser] = True
+
+        self.state[games] = state
+        self.deck[games] = deck
+        self.deck_pos[games] = 12
+
+    def deck_size(self):
+        """
+        Returns:
+            ndarray(N,) number of cards left to draw in every game
+        """
+        return 32 - self.deck_pos
+
+    def observe(self, player, known=None):
+        """
+        backend.observation features of every game for player (int or ndarray(N,))
+
+        Returns:
+            ndarray(N,OBS_SIZE) float32
+        """
+        return encode_batch(self.state, self.deck_size(), player, known)
+
+    def to_game(self, i):
+        """
+        Copies game i into a standalone Game
+        """
+        return Game.from_state(self.state[i].copy(), self.deck[i, self.deck_pos[i]:].copy())
+
+    def attack(self, moves, player):
+        """
+        Batched Game.attack, applies every valid attack or throw in
+
+        Params:
+            moves: ndarray(N, 6, 32) Changes made to state by player
+            player: int or ndarray(N,) attacking player of each game
+        Returns:
+            valid: ndarray(N,) bool True where the move was valid and executed
+            beaten: ndarray(N,) bool True where no cards were added to a non empty board
+        """
+        moves = np.asarray(moves)
+        valid, beaten = self._attack(moves, player)
+        self._apply(moves, valid & ~beaten)
+        return valid, beaten
+
+    def _attack(self, moves, player):
+        n = len(self.state)
+        games = np.arange(n)
+        player = _per_game(player, n)
+        hand = self.state[games, player]
+        added = moves[:, 3] == 1
+
+        # Only the attackers hand, left to defend and board may change, all by the same cards
+        valid = ~np.any(moves[games, 1 - player], axis=1)
+        valid &= ~np.any(moves[:, 2], axis=1)
+        valid &= np.all(moves[:, 3] == moves[:, 4], axis=1)
+        valid &= np.all(-moves[games, player] == moves[:, 3], axis=1)
+        valid &= np.all((moves[:, 3] == 0) | (added & hand), axis=1)
+
+        played = rank_fold_rows(self.state[:, 4])
+        added_ranks = rank_fold_rows(added)
+        empty = ~np.any(played, axis=1)
+
+        # An empty board takes exactly one denomination, otherwise only denominations already played
+        rank_ok = np.where(empty, np.sum(added_ranks, axis=1) == 1, ~np.any(added_ranks & ~played, axis=1))
+        enough = np.sum(self.state[:, 3], axis=1) + np.sum(added, axis=1) <= np.sum(self.state[games, 1 - player], axis=1)
+        beaten = valid & ~empty & ~np.any(moves, axis=(1, 2))
+
+        valid &= beaten | (rank_ok & enough)
+        return valid, beaten
+
+    def check_wurf(self, moves, player):
+        """
+        Batched Game.check_wurf, only validates and does not update the state
+
+        Returns:
+            valid: ndarray(N,) bool True where every thrown in card is from the hand and of a played denomination
+        """
+        moves = np.asarray(moves)
+        n = len(self.state)
+        games = np.arange(n)
+        player = _per_game(player, n)
+        added = moves[:, 3] == 1
+
+        valid = np.all(moves[:, 3] == -moves[games, player], axis=1)
+        valid &= ~np.any(added & ~self.state[games, player], axis=1)
+        left2def = rank_fold_rows(self.state[:, 3] | added)
+        valid &= ~np.any(left2def & ~rank_fold_rows(self.state[:, 4]), axis=1)
+        return valid
+
+    def defend(self, moves, player):
+        """
+        Batched Game.defend, applies every valid defence, redirect or flash
+
+        Params:
+            moves: ndarray(N, 6, 32) Changes made to state by player
+            player: int or ndarray(N,) defending player of each game
+        Returns:
+            valid: ndarray(N,) bool
+            is_redirect: ndarray(N,) bool True where the attack was redirected or flashed
+            is_complete: ndarray(N,) bool True where no cards are left to defend
+        """
+        moves = np.asarray(moves)
+        valid, is_redirect, is_complete = self._defend(moves, player)
+        self._apply(moves, valid)
+        return valid, is_redirect, is_complete
+
+    def _defend(self, moves, player):
+        n = len(self.state)
+        games = np.arange(n)
+        player = _per_game(player, n)
+        hand = self.state[games, player]
+        left2def = self.state[:, 3]
+        old_count = np.sum(left2def, axis=1)
+        new_count = old_count + np.sum(moves[:, 3], axis=1)
+
+        untouched = ~np.any(moves[games, 1 - player], axis=1) & ~np.any(moves[:, 2], axis=1)
+
+        # Redirects and flashes, only possible before any card was defended
+        not_started = np.all(self.state[:, 4] == left2def, axis=1)
+        rank_on_board = rank_fold_rows(self.state[:, 4])
+        is_flash = (np.sum(moves[:, 3], axis=1) == 0) & ~np.any(moves[games, player], axis=1)
+        flash_ok = np.any(hand[:, :8] & rank_on_board, axis=1) & ~self.state[:, 5, 13]
+        flash_ok &= old_count <= np.sum(self.state[games, 1 - player], axis=1)
+
+        added = moves[:, 3] == 1
+        redirect_ok = np.any(added, axis=1)
+        redirect_ok &= np.all(moves[:, 3] == moves[:, 4], axis=1)
+        redirect_ok &= np.all(-moves[games, player] == moves[:, 3], axis=1)
+        redirect_ok &= ~np.any(added & ~hand, axis=1)
+        redirect_ok &= new_count <= np.sum(self.state[games, 1 - player], axis=1)
+        redirect_ok &= ~np.any(rank_fold_rows(added) & ~rank_on_board, axis=1)
+
+        is_redirect = untouched & (new_count >= old_count) & not_started & np.where(is_flash, flash_ok, redirect_ok)
+
+        # Defence of exactly one card left to defend
+        target = moves[:, 3] == -1
+        defending = moves[:, 4] == 1
+        shape_ok = (new_count + 1 == old_count) & (np.sum(moves[:, 4], axis=1) == 1)
+        shape_ok &= (np.sum(target, axis=1) == 1) & ~np.any(target & ~left2def, axis=1)
+        shape_ok &= np.all(-moves[games, player] == moves[:, 4], axis=1)
+        shape_ok &= ~np.any(defending & ~hand, axis=1)
+
+        card2def = np.argmax(target, axis=1)
+        defendingcard = np.argmax(defending, axis=1)
+        same_suit = card2def // 8 == defendingcard // 8
+        beats = np.where(same_suit, defendingcard < card2def, defendingcard // 8 == 0)
+        is_defence = untouched & shape_ok & beats
+
+        valid = is_redirect | is_defence
+        is_complete = is_defence & (new_count == 0)
+        return valid, is_redirect, is_complete
+
+    def _apply(self, moves, mask):
+        if not np.any(mask):
+            return
+        self.state[mask] = (self.state[mask] + moves[mask]).astype(bool)
+
+    def pickup(self, player, mask=None):
+        """
+        Batched Game.ExecutePickup, empties left2def and onboard and gives these cards to player
+        """
+        n = len(self.state)
+        games = np.arange(n) if mask is None else np.flatnonzero(mask)
+        player = _per_game(player, n)[games]
+        self.state[games, player] |= self.state[games, 4]
+        self.state[games, 3] = False
+        self.state[games, 4] = False
+
+    def drawto6(self, attacker, mask=None):
+        """
+        Batched Game.drawto6, the attacker draws first then the defender. Games where a
+        player is left without cards and the deck is empty are marked as over
+        """
+        n = len(self.state)
+        active = np.ones(n, dtype=bool) if mask is None else np.asarray(mask, dtype=bool).copy()
+        attacker = _per_game(attacker, n)
+        for player in (attacker, 1 - attacker):
+            active &= ~self.state[:, 5, 11]
+            self._draw(player, active)
+
+    def _draw(self, player, active):
+        n = len(self.state)
+        games = np.arange(n)
+        in_hand = np.sum(self.state[games, player], axis=1)
+        left = 32 - self.deck_pos
+
+        finished = active & (in_hand == 0) & (left == 0)
+        self.state[finished, 5, 11] = True
+        self.state[finished, 5, 12] = player[finished] == 0
+
+        wanted = np.where(active & ~finished, np.clip(6 - in_hand, 0, None), 0)
+        take = np.minimum(wanted, left)
+        positions = np.arange(32)
+        drawn = (positions >= self.deck_pos[:, None]) & (positions < (self.deck_pos + take)[:, None])
+        rows, cols = np.nonzero(drawn)
+        cards = self.deck[rows, cols]
+        self.state[rows, player[rows], cards] = True
+        self.state[rows, 2, cards] = False
+        self.deck_pos += take
+
+
+if __name__ == '__main__':
+    games = BatchedGame(10000, seed=0)
+    moves = np.zeros((len(games), 6, 32), dtype=np.int8)
+    # Every game's player 1 attacks with their lowest card
+    cards = 31 - np.argmax(games.state[:, 1, ::-1], axis=1)
+    moves[np.arange(len(games)), 1, cards] = -1
+    moves[np.arange(len(games)), 3, cards] = 1
+    moves[np.arange(len(games)), 4, cards] = 1
+    valid, beaten = games.attack(moves, 1)
+    print(valid.mean(), beaten.mean())
@@ -0,0 +1,196 @@
+import numpy as np
+
+from backend.cards import SUIT_WORDS
+
+# Bit i of a row is card i of the (6, 32) state matrix, so suit s is bits 8s..8s+7
+# and the trump suit is the lowest byte
+ALL_CARDS = 0xFFFFFFFF
+
+_BYTE_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def popcount(word):
+    """
+    Number of cards in a 32 bit card set
+    """
+    return int(word).bit_count()
+
+
+def rank_fold(word):
+    """
+    Folds the four suits of a card set onto each other
+
+    Returns:
+        int: 8 bit mask, bit r set if any card of rank r (0: Ace, ..., 7: Seven) is in the set
+    """
+    word = int(word)
+    return (word | word >> 8 | word >> 16 | word >> 24) & 0xFF
+
+
+def rank_unfold(ranks):
+    """
+    Inverse of rank_fold, every card of the ranks in the 8 bit mask
+    """
+    return (ranks & 0xFF) * 0x01010101
+
+
+def suit_mask(suit):
+    """
+    Card set of all 8 cards of a suit, suit 0 is trump
+    """
+    return int(SUIT_WORDS[suit])
+
+
+def cards(word):
+    """
+    Card indices in a card set, lowest (strongest trump) first
+    """
+    word = int(word)
+    out = []
+    while word:
+        low = word & -word
+        out.append(low.bit_length() - 1)
+        word ^= low
+    return out
+
+
+def move_words(move):
+    """
+    Card sets of a (6, 32) move matrix (new state - old state), built from its nonzero cells only
+
+    Returns:
+        cells: flat indices of the nonzero cells
+        plus: list of 6 words, the cells of each row set to 1
+        minus: list of 6 words, the cells of each row set to -1
+        total: sum of the move's entries
+    """
+    cells = np.flatnonzero(move).tolist()
+    plus = [0] * 6
+    minus = [0] * 6
+    total = 0
+    for cell in cells:
+        value = move.item(cell)
+        total += value
+        if value > 0:
+            plus[cell >> 5] |= 1 << (cell & 31)
+        else:
+            minus[cell >> 5] |= 1 << (cell & 31)
+    return cells, plus, minus, total
+
+
+def pack(matrix):
+    """
+    Packs bool card rows into uint32 words
+
+    Params:
+        matrix: ndarray(..., 32) bool, e.g. a (6, 32) state or an (N, 6, 32) batch
+    Returns:
+        ndarray(...) uint32
+    """
+    matrix = np.asarray(matrix, dtype=bool)
+    packed = np.packbits(matrix, axis=-1, bitorder="little")
+    return np.ascontiguousarray(packed).view("<u4")[..., 0].astype(np.uint32)
+
+
+def unpack(words):
+    """
+    Inverse of pack
+
+    Params:
+        words: ndarray(...) uint32
+    Returns:
+        ndarray(..., 32) bool
+    """
+    words = np.ascontiguousarray(np.asarray(words, dtype="<u4"))
+    as_bytes = words[..., None].view(np.uint8)
+    return np.unpackbits(as_bytes, axis=-1, count=32, bitorder="little").astype(bool)
+
+
+def popcount_array(words):
+    """
+    Vectorised popcount over an array of uint32 words
+    """
+    words = np.ascontiguousarray(np.asarray(words, dtype="<u4"))
+    return _BYTE_POPCOUNT[words[..., None].view(np.uint8)].sum(axis=-1, dtype=np.int64)
+
+
+def rank_fold_array(words):
+    """
+    Vectorised rank_fold over an array of uint32 words
+    """
+    words = np.asarray(words, dtype=np.uint32)
+    return ((words | words >> 8 | words >> 16 | words >> 24) & 0xFF).astype(np.uint8)
+
+
+def rank_fold_rows(rows):
+    """
+    rank_fold on bool card rows instead of words
+
+    Params:
+        rows: ndarray(..., 32) bool
+    Returns:
+        ndarray(..., 8) bool, True if any suit of that rank is set
+    """
+    return rows.reshape(rows.shape[:-1] + (4, 8)).any(axis=-2)
+
+
+class BitState:
+    words: np.ndarray
+    """ Compact Game.state, every row of the (6, 32) matrix is one uint32 word
+    Row 5 keeps the coser in bits 0-7 and the extra values from bit 8 on, as in Game.state
+    """
+    __slots__ = ("words",)
+
+    def __init__(self, words):
+        words = np.asarray(words, dtype=np.uint32)
+        assert words.shape == (6,), "BitState needs one word per state row"
+        self.words = words
+
+    @classmethod
+    def from_matrix(cls, matrix: np.ndarray) -> "BitState":
+        assert np.shape(matrix) == (6, 32), "State matrix must have shape (6,32)"
+        return cls(pack(matrix))
+
+    def to_matrix(self) -> np.ndarray:
+        """
+        Lossless (6, 32) bool matrix as read by frontend.state_wrapper.State and BoardVisualiser
+        """
+        return unpack(self.words)
+
+    def row(self, index: int) -> int:
+        return int(self.words[index])
+
+    def popcount(self, index: int) -> int:
+        return popcount(self.words[index])
+
+    def rank_fold(self, index: int) -> int:
+        return rank_fold(self.words[index])
+
+    def suit(self, index: int, suit: int) -> int:
+        """
+        Cards of one suit in a row, shifted down to an 8 bit rank mask
+        """
+        return (self.row(index) >> (8 * suit)) & 0xFF
+
+    def copy(self) -> "BitState":
+        return BitState(self.words.copy())
+
+    def __eq__(self, other):
+        return isinstance(other, BitState) and np.array_equal(self.words, other.words)
+
+    def __hash__(self):
+        return hash(self.words.tobytes())
+
+    def __repr__(self):
+        return "BitState(" + ", ".join(f"0x{int(w):08x}" for w in self.words) + ")"
+
+
+if __name__ == "__main__":
+    from backend.game import Game
+
+    game = Game()
+    bits = BitState.from_matrix(game.state)
+    assert np.array_equal(bits.to_matrix(), game.state)
+    print(bits)
+    print("cards in hands:", bits.popcount(0), bits.popcount(1))
+    print("bytes per state:", game.state.nbytes, "->", bits.words.nbytes)
@@ -0,0 +1,64 @@
+"""
+Precomputed metadata of the 32 card indices used in every row of Game.state
+Card index = 8 * suit + rank, suit 0 is trump, rank 0: Ace, 1: King, ..., 7: Seven
+Rank sets are 8 bit ints, bit r set for rank r (as bitstate.rank_fold returns them)
+Card sets are 32 bit words, bit i set for card i (as bitstate.pack returns them)
+"""
+
+import numpy as np
+
+CARDS = np.arange(32)
+RANK = CARDS % 8
+SUIT = CARDS // 8
+IS_TRUMP = SUIT == 0
+RANK_BIT = 1 << RANK
+
+# RANK_MASKS[r] / SUIT_MASKS[s] are the cards of rank r / suit s
+RANK_MASKS = RANK[None, :] == np.arange(8)[:, None]
+SUIT_MASKS = SUIT[None, :] == np.arange(4)[:, None]
+
+# RANKS_TO_CARDS[ranks] are all cards whose rank is in the rank set, the cards legal to add to a board
+RANKS_TO_CARDS = (np.arange(256)[:, None] >> RANK[None, :]) & 1 == 1
+
+# BEATS[target, card] is True if card beats target: same suit and higher, or trump on non trump
+BEATS = ((SUIT[:, None] == SUIT[None, :]) & (CARDS[None, :] < CARDS[:, None])) | (IS_TRUMP[None, :] & ~IS_TRUMP[:, None])
+
+# RANK_WORDS[r] / SUIT_WORDS[s] / BEATEN_BY[target] are RANK_MASKS[r] / SUIT_MASKS[s] / BEATS[target] as card sets
+_BITS = np.int64(1) << CARDS
+RANK_WORDS = (RANK_MASKS * _BITS).sum(axis=1)
+SUIT_WORDS = (SUIT_MASKS * _BITS).sum(axis=1)
+BEATEN_BY = (BEATS * _BITS).sum(axis=1)
+
+# Bits of the flags in row 5 of Game.state (the coser is bits 0 to 7), as masks of the row 5 card set word
+TURN = 1 << 8  # Player 0 is to move
+P0_ATTACKING = 1 << 9
+PICKUP = 1 << 10  # The defender declared a pickup
+OVER = 1 << 11
+P0_WON = 1 << 12
+FLASHED = 1 << 13  # A trump was flashed this bout
+
+for _table in (CARDS, RANK, SUIT, IS_TRUMP, RANK_BIT, RANK_MASKS, SUIT_MASKS, RANKS_TO_CARDS, BEATS, RANK_WORDS,
+               SUIT_WORDS, BEATEN_BY):
+    _table.flags.writeable = False
+
+
+def rank_set(cards):
+    """
+    Rank set of the card indices in cards
+
+    Params:
+        cards: sequence of card indices
+    Returns:
+        ranks: int, 8 bit rank set
+    """
+    ranks = 0
+    for card in cards:
+        ranks |= 1 << (card % 8)
+    return ranks
+
+
+def row_rank_set(row):
+    """
+    Rank set of a (32,) card row of the state
+    """
+    return rank_set(np.flatnonzero(row).tolist())
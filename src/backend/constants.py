@@ -0,0 +1,16 @@
+from enum import Enum
+
+
+class StateMatrix(Enum):
+    PLAYER_0: int = 0
+    PLAYER_1: int = 1
+    UNPLAYED: int = 2
+    LEFT2DEF: int = 3
+    ON_BOARD: int = 4
+    METADATA: int = 5
+
+
+class MoveType(Enum):
+    ATTACK = 0
+    DEFEND = 1
+    NRW = 2  # Nachwerfen
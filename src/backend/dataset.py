@@ -0,0 +1,349 @@
+"""
+Self-play training data in memory-mappable shards
+
+Games are turned into samples by a chain of generators, play -> encode -> buffer -> ShardWriter,
+one sample per decision:
+Field    | Shape            | Content
+obs      | OBS_SIZE float32 | backend.observation of the player to move
+mask     | MASK_BYTES uint8 | legal action mask, np.packbits of ACTION_SIZE bools (unpack with unpack_masks)
+action   | int16            | action index that was played
+player   | int8             | player to move
+winner   | int8             | state[5,12] at the end, 0 or 1, -1 if the game was cut off
+value    | int8             | +1 if player went on to win, -1 if it lost, 0 if cut off
+
+Every shard holds SHARD_SIZE samples in one .npy file per field (the last one is only partly filled),
+manifest.json lists the shards and how many samples each holds and is rewritten after every shard,
+so a directory that is still being written can be read up to its last complete shard.
+"""
+
+import json
+import multiprocessing
+import os
+
+import numpy as np
+
+from backend.game import Game
+from backend.moves import ACTION_SIZE, legal_action_mask, random_policy
+from backend.observation import OBS_SIZE, encode_batch
+
+MANIFEST = "manifest.json"
+VERSION = 1
+SHARD_SIZE = 65536
+MAX_PLIES = 1000
+MASK_BYTES = (ACTION_SIZE + 7) // 8
+
+# Field: (shape of one sample, dtype)
+FIELDS = {
+    "obs": ((OBS_SIZE,), np.float32),
+    "mask": ((MASK_BYTES,), np.uint8),
+    "action": ((), np.int16),
+    "player": ((), np.int8),
+    "winner": ((), np.int8),
+    "value": ((), np.int8),
+}
+
+
+def play(seeds, policy=random_policy, max_plies=MAX_PLIES):
+    """
+    Plays one game per seed, the deal and the policy's moves are drawn from the seed
+
+    Yields:
+        dict: states (T,6,32) bool, deck_sizes (T,), players (T,), known (T,32) bool (Observer.known of the
+              player to move), actions (T,) of every decision and winner, -1 if the game was cut off
+    """
+    game = None
+    for seed in seeds:
+        rng = np.random.default_rng(seed)
+        if game is None:
+            game = Game(seed=rng)
+            game.enable_observations()
+        else:
+            game.reset(rng)
+        states, deck_sizes, players, known, actions = [], [], [], [], []
+        while not game.state[5, 11] and len(actions) < max_plies:
+            player = 0 if game.state[5, 8] else 1
+            action = policy(game, player, rng)
+            states.append(game.state.copy())
+            deck_sizes.append(len(game.deck))
+            players.append(player)
+            known.append(game.observer.known[player].copy())
+            actions.append(action.index)
+            game.make_move(action)
+        yield {
+            "states": np.array(states), "deck_sizes": np.array(deck_sizes), "players": np.array(players),
+            "known": np.array(known), "actions": np.array(actions),
+            "winner": (0 if game.state[5, 12] else 1) if game.state[5, 11] else -1,
+        }
+
+
+def encode(games):
+    """
+    Turns the games from play into sample batches, one dict of FIELDS arrays per game
+    """
+    for game in games:
+        players = game["players"]
+        winner = game["winner"]
+        masks = legal_action_mask(game["states"], players)
+        yield {
+            "obs": encode_batch(game["states"], game["deck_sizes"], players, game["known"]),
+            "mask": np.packbits(masks, axis=1),
+            "action": game["actions"].astype(np.int16),
+            "player": players.astype(np.int8),
+            "winner": np.full(len(players), winner, dtype=np.int8),
+            "value": (np.where(players == winner, 1, -1) if winner >= 0 else np.zeros(len(players))).astype(np.int8),
+        }
+
+
+def buffer(batches, shard_size=SHARD_SIZE):
+    """
+    Regroups sample batches of any size into batches of exactly shard_size, the last one holds the rest
+    """
+    pending = []
+    count = 0
+    for batch in batches:
+        pending.append(batch)
+        count += len(batch["action"])
+        while count >= shard_size:
+            merged = {field: np.concatenate([part[field] for part in pending]) for field in FIELDS}
+            yield {field: array[:shard_size] for field, array in merged.items()}
+            pending = [{field: array[shard_size:] for field, array in merged.items()}]
+            count -= shard_size
+    if count:
+        yield {field: np.concatenate([part[field] for part in pending]) for field in FIELDS}
+
+
+def unpack_masks(packed):
+    """
+    Inverse of the mask packing, ndarray(..., MASK_BYTES) uint8 -> ndarray(..., ACTION_SIZE) bool
+    """
+    return np.unpackbits(packed, axis=-1, count=ACTION_SIZE).astype(bool)
+
+
+class ShardWriter:
+    def __init__(self, directory, shard_size=SHARD_SIZE):
+        """
+        Writes samples into fixed size shards in directory, continuing a dataset that is already there
+
+        Params:
+            directory: created if missing
+            shard_size: samples per shard, must match an existing dataset
+        """
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, MANIFEST)
+        if os.path.exists(path):
+            with open(path) as file:
+                self.manifest = json.load(file)
+            assert self.manifest["shard_size"] == shard_size, "Shard size differs from the existing dataset"
+        else:
+            self.manifest = {
+                "version": VERSION, "shard_size": shard_size, "samples": 0, "games": 0, "shards": [],
+                "fields": {field: [list(shape), np.dtype(dtype).str] for field, (shape, dtype) in FIELDS.items()},
+            }
+        self.shard_size = shard_size
+
+    def write(self, samples, games=0):
+        """
+        Writes one shard of up to shard_size samples, a dict of FIELDS arrays
+
+        Params:
+            games: number of games the samples finished, only counted in the manifest
+        """
+        count = len(samples["action"])
+        assert 0 < count <= self.shard_size, "A shard holds 1 to shard_size samples"
+        name = f"shard_{len(self.manifest['shards']):05d}"
+        for field, (shape, dtype) in FIELDS.items():
+            array = np.lib.format.open_memmap(os.path.join(self.directory, f"{name}.{field}.npy"), mode="w+",
+                                              dtype=dtype, shape=(self.shard_size,) + shape)
+            array[:count] = samples[field]
+            array.flush()
+            del array
+        self.manifest["shards"].append({"name": name, "samples": count})
+        self.manifest["samples"] += count
+        self.manifest["games"] += games
+        self._save_manifest()
+
+    def _save_manifest(self):
+        # Replaced in one step, readers never see a manifest listing a shard that is not written yet
+        path = os.path.join(self.directory, MANIFEST)
+        with open(path + ".tmp", "w") as file:
+            json.dump(self.manifest, file, indent=2)
+        os.replace(path + ".tmp", path)
+
+
+def _producer(queue, seeds, policy, max_plies):
+    try:
+        for batch in encode(play(seeds, policy, max_plies)):
+            queue.put(batch) # Blocks while the queue is full, the writer sets the pace
+        queue.put(None)
+    except Exception as error:
+        queue.put(error)
+
+
+def generate(directory, games, workers=None, seed=None, policy=random_policy, shard_size=SHARD_SIZE,
+             max_plies=MAX_PLIES, queue_size=64):
+    """
+    Plays games in parallel producer processes and writes their samples to directory
+
+    The producers hand one batch per game to this process through a queue holding at most queue_size
+    batches, when writing falls behind they wait instead of piling up games in memory. Every game is
+    seeded from seed, but the producers finish in any order so the order of the samples is not fixed.
+
+    Params:
+        games: number of games
+        workers: producer processes, defaults to the number of cores, 0 plays in this process
+        policy: policy(game, player, rng) -> Action, e.g. backend.moves.random_policy, picklable (module level)
+                for the producer processes
+    Returns:
+        manifest: dict, as saved in directory
+    """
+    seeds = np.random.SeedSequence(seed).spawn(games)
+    writer = ShardWriter(directory, shard_size)
+    if workers == 0:
+        batches = encode(play(seeds, policy, max_plies))
+    else:
+        workers = min(workers or multiprocessing.cpu_count(), games)
+        queue = multiprocessing.Queue(queue_size)
+        processes = [multiprocessing.Process(target=_producer, args=(queue, seeds[w::workers], policy, max_plies), daemon=True)
+                     for w in range(workers)]
+        for process in processes:
+            process.start()
+        batches = _drain(queue, workers)
+
+    finished = 0
+    counted = _Counting(batches)
+    for shard in buffer(counted, shard_size):
+        writer.write(shard, counted.games - finished)
+        finished = counted.games
+    if workers:
+        for process in processes:
+            process.join()
+    return writer.manifest
+
+
+def _drain(queue, workers):
+    done = 0
+    while done < workers:
+        batch = queue.get()
+        if batch is None:
+            done += 1
+        elif isinstance(batch, Exception):
+            raise batch
+        else:
+            yield batch
+
+
+class _Counting:
+    # Passes batches through and counts them, each batch is one game
+    def __init__(self, batches):
+        self.batches = batches
+        self.games = 0
+
+    def __iter__(self):
+        for batch in self.batches:
+            self.games += 1
+            yield batch
+
+
+class ShardedDataset:
+    def __init__(self, directory):
+        """
+        Reads a dataset written by ShardWriter, shards are memory mapped when first touched
+
+        Only the shards listed in the manifest when it is opened are read.
+        """
+        with open(os.path.join(directory, MANIFEST)) as file:
+            self.manifest = json.load(file)
+        assert self.manifest["version"] == VERSION, f"Unsupported dataset version {self.manifest['version']}"
+        self.directory = directory
+        self.counts = np.array([shard["samples"] for shard in self.manifest["shards"]], dtype=np.int64)
+        self.starts = np.concatenate([[0], np.cumsum(self.counts)])
+        self.shards = {}
+
+    def __len__(self):
+        return int(self.starts[-1])
+
+    def shard(self, i):
+        """
+        Memory maps of the fields of shard i, trimmed to its samples
+        """
+        if i not in self.shards:
+            name = self.manifest["shards"][i]["name"]
+            self.shards[i] = {field: np.load(os.path.join(self.directory, f"{name}.{field}.npy"), mmap_mode="r")[:self.counts[i]]
+                              for field in FIELDS}
+        return self.shards[i]
+
+    def __getitem__(self, i):
+        shard = int(np.searchsorted(self.starts, i, side="right")) - 1
+        return {field: array[i - self.starts[shard]] for field, array in self.shard(shard).items()}
+
+    def batches(self, batch_size, rng=None, window=4, drop_last=False):
+        """
+        Shuffled batches over the whole dataset, one pass
+
+        The shards are visited in random order, window at a time, and the samples of the shards in the window
+        are shuffled together. Only the rows of a batch are read from the memory maps, memory use stays at
+        about window shards of indices no matter how large the dataset is.
+
+        Params:
+            batch_size: samples per batch
+            rng: numpy Generator or seed
+            window: shards shuffled together, more mixes better
+            drop_last: leave out the smaller batch at the end of each window
+        Yields:
+            dict of FIELDS arrays with batch_size rows
+        """
+        rng = np.random.default_rng(rng)
+        order = rng.permutation(len(self.counts))
+        for start in range(0, len(order), window):
+            shards = order[start:start + window]
+            keys = np.concatenate([np.stack([np.full(self.counts[i], i), np.arange(self.counts[i])], axis=1) for i in shards])
+            keys = keys[rng.permutation(len(keys))]
+            for first in range(0, len(keys), batch_size):
+                chosen = keys[first:first + batch_size]
+                if drop_last and len(chosen) < batch_size:
+                    break
+                yield self._gather(chosen)
+
+    def _gather(self, keys):
+        batch = {field: np.empty((len(keys),) + shape, dtype=dtype) for field, (shape, dtype) in FIELDS.items()}
+        for i in np.unique(keys[:, 0]):
+            rows = keys[:, 0] == i
+            # Sorted rows read the memory map front to back
+            local = keys[rows, 1]
+            order = np.argsort(local)
+            targets = np.flatnonzero(rows)[order]
+            for field, array in self.shard(i).items():
+                batch[field][targets] = array[local[order]]
+        return batch
+
+
+if __name__ == "__main__":
+    import tempfile
+    import time
+
+    with tempfile.TemporaryDirectory() as directory:
+        start = time.perf_counter()
+        manifest = generate(directory, 100, workers=2, seed=0, shard_size=2048)
+        elapsed = time.perf_counter() - start
+        print(f"{manifest['games']} games, {manifest['samples']} samples in {len(manifest['shards'])} shards, "
+              f"{manifest['samples'] / elapsed:.0f} samples/s")
+
+        dataset = ShardedDataset(directory)
+        seen = 0
+        start = time.perf_counter()
+        for batch in dataset.batches(256, rng=0):
+            masks = unpack_masks(batch["mask"])
+            assert masks[np.arange(len(masks)), batch["action"]].all(), "Every action must be legal"
+            assert ((batch["value"] == 1) == (batch["player"] == batch["winner"])).all()
+            seen += len(batch["action"])
+        assert seen == len(dataset) == manifest["samples"]
+        print(f"read {seen} shuffled samples, {seen / (time.perf_counter() - start):.0f} samples/s")
+
+        # Without producer processes the samples come out in seed order, the same for every run
+        serial = os.path.join(directory, "serial")
+        generate(serial, 20, workers=0, seed=0, shard_size=2048)
+        again = os.path.join(directory, "again")
+        generate(again, 20, workers=0, seed=0, shard_size=2048)
+        first, second = ShardedDataset(serial), ShardedDataset(again)
+        assert all((first.shard(0)[field] == second.shard(0)[field]).all() for field in FIELDS)
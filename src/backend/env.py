@@ -0,0 +1,242 @@
+import multiprocessing
+
+import numpy as np
+
+from backend.game import Game
+from backend.moves import ACTION_SIZE, Action, legal_action_mask
+from backend.observation import OBS_SIZE
+
+MAX_PLIES = 1000
+
+
+class GameBatch:
+    """
+    K games stepped one after the other in the current process, the work unit of DurakVecEnv
+    """
+
+    def __init__(self, num_envs, max_plies=MAX_PLIES):
+        self.num_envs = num_envs
+        self.max_plies = max_plies
+        self.games = [None] * num_envs
+        self.rngs = [None] * num_envs
+        self.plies = np.zeros(num_envs, dtype=np.int64)
+        self.to_move = np.zeros(num_envs, dtype=np.int64)
+        self.mask = np.zeros((num_envs, ACTION_SIZE), dtype=bool) # Nothing is legal before reset
+
+    def _new_game(self, i):
+        if self.games[i] is None:
+            self.games[i] = Game(seed=self.rngs[i])
+            self.games[i].enable_observations()
+        else:
+            self.games[i].reset(self.rngs[i])
+        self.plies[i] = 0
+
+    def _outputs(self):
+        obs = np.empty((self.num_envs, OBS_SIZE), dtype=np.float32)
+        to_move = np.empty(self.num_envs, dtype=np.int64)
+        for i, game in enumerate(self.games):
+            to_move[i] = 0 if game.state[5, 8] else 1
+            obs[i] = game.observer[to_move[i]]
+        states = np.stack([game.state for game in self.games])
+        self.to_move = to_move
+        self.mask = legal_action_mask(states, to_move)
+        return obs, to_move, self.mask
+
+    def reset(self, seeds):
+        for i, seed in enumerate(seeds):
+            self.rngs[i] = np.random.default_rng(seed)
+            self._new_game(i)
+        return self._outputs()
+
+    def step(self, actions):
+        # Every action is checked before any game moves, so an illegal one leaves the whole batch as it was
+        for i, index in enumerate(actions):
+            if not (0 <= index < ACTION_SIZE and self.mask[i, index]):
+                raise ValueError(f"Action {index} is not legal for player {self.to_move[i]} in env {i}")
+
+        reward = np.zeros(self.num_envs, dtype=np.float32)
+        done = np.zeros(self.num_envs, dtype=bool)
+        truncated = np.zeros(self.num_envs, dtype=bool)
+        acted = np.empty(self.num_envs, dtype=np.int64)
+        winner = np.full(self.num_envs, -1, dtype=np.int64)
+
+        for i, (game, index) in enumerate(zip(self.games, actions)):
+            player = int(self.to_move[i])
+            game.step(player, Action.from_index(index))
+            acted[i] = player
+            self.plies[i] += 1
+
+            if game.state[5, 11]:
+                winner[i] = 0 if game.state[5, 12] else 1
+                reward[i] = 1.0 if winner[i] == player else -1.0
+                done[i] = True
+            elif self.plies[i] >= self.max_plies:
+                done[i] = truncated[i] = True
+            if done[i]:
+                self._new_game(i)
+
+        obs, to_move, mask = self._outputs()
+        info = {"acted": acted, "winner": winner, "truncated": truncated, "to_move": to_move, "legal_mask": mask}
+        return obs, reward, done, info
+
+
+def _worker(remote, num_envs, max_plies):
+    batch = GameBatch(num_envs, max_plies)
+    while True:
+        command, data = remote.recv()
+        try:
+            if command == "reset":
+                remote.send(("ok", batch.reset(data)))
+            elif command == "step":
+                remote.send(("ok", batch.step(data)))
+            elif command == "close":
+                remote.close()
+                return
+        except Exception as error:
+            remote.send(("error", error))
+
+
+class DurakVecEnv:
+    def __init__(self, num_envs, mode="sync", workers=None, max_plies=MAX_PLIES):
+        """
+        Vectorised self-play environment over num_envs Games
+
+        Every step takes one action index (backend.moves) per game for the player whose turn it is and returns
+        stacked (obs, reward, done, info). Observations (backend.observation) are for the player to move next and
+        hide the opponent's hand. The reward is for the player that acted, +1 for winning and -1 for losing the
+        game. Finished games are dealt again right away, so obs of a done env already belongs to the next game.
+
+        Params:
+            num_envs: number of games
+            mode: "sync" steps all games in this process, "subprocess" splits them over worker processes
+            workers: number of worker processes in subprocess mode, defaults to the number of cores
+            max_plies: games are cut off (done, truncated, no reward) after this many moves
+        """
+        assert mode in ("sync", "subprocess"), "Mode must be sync or subprocess"
+        self.num_envs = num_envs
+        self.mode = mode
+        self.action_size = ACTION_SIZE
+        self.observation_size = OBS_SIZE
+        self.waiting = False
+        self.legal_mask = np.zeros((num_envs, ACTION_SIZE), dtype=bool)
+
+        if mode == "sync":
+            self.batch = GameBatch(num_envs, max_plies)
+            self.slices = [slice(0, num_envs)]
+        else:
+            workers = min(workers or multiprocessing.cpu_count(), num_envs)
+            bounds = np.linspace(0, num_envs, workers + 1).astype(int)
+            self.slices = [slice(bounds[w], bounds[w + 1]) for w in range(workers)]
+            self.remotes = []
+            self.processes = []
+            for piece in self.slices:
+                remote, worker_remote = multiprocessing.Pipe()
+                process = multiprocessing.Process(target=_worker, args=(worker_remote, piece.stop - piece.start, max_plies), daemon=True)
+                process.start()
+                worker_remote.close()
+                self.remotes.append(remote)
+                self.processes.append(process)
+
+    def reset(self, seeds=None):
+        """
+        Deals new games, every env gets its own seed (drawn at random if seeds is None), later games of an env
+        are seeded from it so a run is reproducible
+
+        Returns:
+            obs: ndarray(num_envs, observation_size) float32
+            info: dict with to_move and legal_mask
+        """
+        if seeds is None:
+            seeds = np.random.SeedSequence().generate_state(self.num_envs)
+        seeds = [int(seed) for seed in seeds]
+        assert len(seeds) == self.num_envs, "One seed per env is needed"
+
+        if self.mode == "sync":
+            obs, to_move, mask = self.batch.reset(seeds)
+        else:
+            for remote, piece in zip(self.remotes, self.slices):
+                remote.send(("reset", seeds[piece]))
+            obs, to_move, mask = self._gather()
+        self.legal_mask = mask
+        return obs, {"to_move": to_move, "legal_mask": mask}
+
+    def step_async(self, actions):
+        """
+        Sends the actions to the workers without waiting, collect the results with step_wait. Every action is
+        checked against the legal mask of the last reset or step first, so an illegal one raises a ValueError
+        before any env, in any worker, moves
+        """
+        actions = np.asarray(actions, dtype=np.int64)
+        assert actions.shape == (self.num_envs,), "One action per env is needed"
+        illegal = np.flatnonzero((actions < 0) | (actions >= ACTION_SIZE)
+                                 | ~self.legal_mask[np.arange(self.num_envs), np.clip(actions, 0, ACTION_SIZE - 1)])
+        if len(illegal):
+            i = illegal[0]
+            raise ValueError(f"Action {actions[i]} is not legal in env {i}")
+        if self.mode == "sync":
+            self.pending = actions
+        else:
+            for remote, piece in zip(self.remotes, self.slices):
+                remote.send(("step", actions[piece]))
+        self.waiting = True
+
+    def step_wait(self):
+        assert self.waiting, "step_async was not called"
+        self.waiting = False
+        if self.mode == "sync":
+            obs, reward, done, info = self.batch.step(self.pending)
+        else:
+            obs, reward, done, info = self._gather()
+        self.legal_mask = info["legal_mask"]
+        return obs, reward, done, info
+
+    def step(self, actions):
+        """
+        Returns:
+            obs: ndarray(num_envs, observation_size) float32
+            reward: ndarray(num_envs,) float32
+            done: ndarray(num_envs,) bool
+            info: dict of stacked arrays, acted, winner (-1 if not over), truncated, to_move and legal_mask
+        """
+        self.step_async(actions)
+        return self.step_wait()
+
+    def _gather(self):
+        # Every worker is drained before raising so the pipes stay in step
+        replies = [remote.recv() for remote in self.remotes]
+        for status, result in replies:
+            if status == "error":
+                raise result
+        results = [result for _, result in replies]
+        stacked = []
+        for parts in zip(*results):
+            if isinstance(parts[0], dict):
+                stacked.append({key: np.concatenate([part[key] for part in parts]) for key in parts[0]})
+            else:
+                stacked.append(np.concatenate(parts))
+        return tuple(stacked)
+
+    def close(self):
+        if self.mode == "subprocess":
+            for remote in self.remotes:
+                remote.send(("close", None))
+            for process in self.processes:
+                process.join()
+            self.mode = "closed"
+
+
+if __name__ == "__main__":
+    import time
+
+    rng = np.random.default_rng(0)
+    for mode in ("sync", "subprocess"):
+        env = DurakVecEnv(64, mode=mode, workers=2)
+        obs, info = env.reset(seeds=range(64))
+        start = time.perf_counter()
+        finished = 0
+        for _ in range(200):
+            actions = [rng.choice(np.flatnonzero(mask)) for mask in info["legal_mask"]]
+            obs, reward, done, info = env.step(actions)
+            finished += done.sum()
+        print(f"{mode}: {200 * 64 / (time.perf_counter() - start):.0f} steps/s, {finished} games finished")
+        env.close()
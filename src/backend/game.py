@@ -1,15 +1,16 @@
 import numpy as np
 
+from backend.bitstate import cards, move_words, rank_fold, rank_unfold
+from backend.cards import (BEATS, FLASHED, OVER, P0_ATTACKING, P0_WON, PICKUP, RANKS_TO_CARDS, SUIT, TURN, rank_set,
+                           row_rank_set)
+from backend.instrumentation import reject
+from backend.moves import PHASE_KINDS, Action, Move, MoveKind, Phase, legal_action_mask, legal_moves, phase_of
+from backend.observation import Observer
+from backend.zobrist import DECK_KEYS, flip_hash, zobrist_hash
 
-ONES = np.ones(32)
-ZEROES = np.zeros(32)
-
-def set_hand(hand, random,unplayed):
-    for r in random:
-        hand[r] = 1
-        unplayed[r] = 0
-    return hand, unplayed
-
+# Flat indices into state.reshape(-1) of the row 5 flags of backend.cards that make_move toggles
+TURN_CELL, P0_ATTACKING_CELL, PICKUP_CELL, OVER_CELL, P0_WON_CELL, FLASHED_CELL = (
+    5*32 + flag.bit_length() - 1 for flag in (TURN, P0_ATTACKING, PICKUP, OVER, P0_WON, FLASHED))
 
 class Game:
     state: np.ndarray
@@ -23,24 +24,106 @@ class Game:
     4       |   Cards Played on Board| 0: Trump Ace, 1: Trump King, etc
     5       |   Coser | Extra Values | 0: Ace,...,7: Seven, 8: Player 0's Turn,
     5       |       Extra Values     | 9: Player 0 is attacking, 10 is pickup, 11 is_over, 12 P0_won
+    5       |       Extra Values     | 13: Trump was flashed this bout
     """
 
-    def __init__(self):
-        np.random.seed(47)
-
+    def __init__(self,seed=None):
+        """
+        Params:
+            seed: int or numpy Generator for the deal, see reset
+        """
         self.state = np.zeros((6, 32), dtype=bool)
-        # Shuffle deck and deal cards
-        deck = np.random.permutation(32)
-        coser = np.random.randint(0,7)
-        deck = deck[np.where(deck != coser)]
-        
+        self.deal = np.empty(32,dtype=int) # Every card in dealing order, deck is a view of its tail
+        self.rng = None
+        self.zobrist = None
+        self.observer = None
+        self.reset(seed)
+
+    def reset(self,seed=None):
+        """
+        Deals a new game into the existing state and deal buffers
+
+        Params:
+            seed: int seeds a new generator, a numpy Generator is used as is,
+                  None keeps drawing from the current generator (seeded from fresh entropy if there is none)
+        """
+        if isinstance(seed,np.random.Generator):
+            self.rng = seed
+        elif seed is not None or self.rng is None:
+            self.rng = np.random.default_rng(seed)
+        coser = int(self.rng.integers(7)) # Trump at the bottom of the deck, Ace to Eight
+        order = self.rng.permutation(31)
+        self.deal[:31] = order + (order >= coser) # The other 31 cards, shuffled
+        self.deal[31] = coser
+
+        self.state[...] = False
+        self.state[0,self.deal[0:6]] = True
+        self.state[1,self.deal[6:12]] = True
+        self.state[2,self.deal[12:]] = True
+        self.state[5,coser] = True
+        self.deck = self.deal[12:]
+        self.undo_stack = []
+        self.board_ranks = 0 # Rank set (backend.cards) of the cards on the board, kept up to date by every move
+        self.phase = Phase.ATTACK # Where the turn cycle stands (backend.moves.Phase), kept up to date by every move
+        if self.zobrist is not None:
+            self.enable_zobrist()
+        if self.observer is not None:
+            self.observer.reset()
+
+    @classmethod
+    def from_state(cls,state,deck):
+        """
+        Builds a Game around an existing position without dealing
+
+        Params:
+            state: ndarray(6,32) bool, used as is (not copied)
+            deck: ndarray of the card indices left to draw, in drawing order
+        """
+        game = cls.__new__(cls)
+        game.state = state
+        game.deck = np.asarray(deck,dtype=int)
+        game.deal = np.empty(32,dtype=int)
+        game.rng = None
+        game.undo_stack = []
+        game.zobrist = None
+        game.observer = None
+        game.sync_board_ranks()
+        game.sync_phase()
+        return game
+
+    def sync_board_ranks(self):
+        """
+        Recomputes board_ranks from row 4, needed after writing to state directly instead of through a move
+        """
+        self.board_ranks = row_rank_set(self.state[4,:])
+
+    def sync_phase(self):
+        """
+        Reads the phase from the state once, needed after writing to state directly instead of through a move
+        """
+        self.phase = phase_of(self.state)
+
+    def enable_zobrist(self):
+        """
+        Computes the Zobrist hash of the position (backend.zobrist), from then on make_move, unmake_move,
+        attack and defend keep self.zobrist up to date from the cells they toggle and ExecutePickup rehashes
+
+        Returns:
+            key: int, the current hash
+        """
+        self.zobrist = zobrist_hash(self.state,len(self.deck))
+        return self.zobrist
 
-        self.state[2,0:] = 1 # Set all cards to unplayed
-        self.state[0,0:],self.state[2,0:]=set_hand(self.state[0,0:],deck[0:6],self.state[2,0:])
-        self.state[1,0:],self.state[2,0:]=set_hand(self.state[1,0:],deck[6:12],self.state[2,0:])
-        self.deck = np.append(deck[12:],coser)
+    def enable_observations(self):
+        """
+        Starts tracking what each player may see (backend.observation), from then on make_move and
+        unmake_move update self.observer incrementally, attack, defend and ExecutePickup resync it
 
-        self.state[5,coser] = 1
+        Returns:
+            observer: Observer, observer[player] is that player's float32 observation
+        """
+        self.observer = Observer(self)
+        return self.observer
 
     #Legacy Code
     def send_state(self,boolean):
@@ -48,28 +131,229 @@ class Game:
 
     # Legacy code
     def user_update(self, move):
-        if self.state[5,8] and self.state[5,9]: # Player 0's turn to attack
-            legal = self.attack(move,0) # Player 0 attacks
-            if not legal:
-                self.send_state(False)
-            else: 
-                self.state[5,8] = 0
-                self.send_state(True)
-        elif not self.state[5,8] and not self.state[5,9]: # Player 1's turn to attack
-            legal = self.attack(move,1) # Player 1 attacks
-            if not legal:
-                self.send_state(False)
-            else:  
-                self.state[5,8] = 1
-                self.send_state(True)
-        elif self.state[5,8] and not self.state[5,10]: # Player 0's turn to defend
-            pass
-   
+        """
+        Plays move for the player whose turn it is through step
+
+        Returns:
+            (state, valid) as send_state
+        """
+        try:
+            self.step(0 if self.state[5,8] else 1, move)
+        except ValueError:
+            return self.send_state(False)
+        return self.send_state(True)
+
+    def step(self,player,move,validate=True):
+        """
+        The one entry point of the turn cycle, plays a move of player and runs everything that follows it:
+        attack -> defend, redirect or flash -> throw in -> pickup or discard -> draw to 6 -> roles switch
+
+        Params:
+            player: 0-1
+            move: backend.moves.Action, or a move matrix or Move as built by frontend.input.Player
+                  (pickups can only be given as an Action)
+            validate: check that the move is legal, only pass False for moves taken from legal_moves
+        Returns:
+            phase: Phase after the move, Phase.OVER once the game is over
+        Raises:
+            ValueError: if the move is not legal for player now
+        """
+        if isinstance(move,Action):
+            action = move
+        else:
+            action = self.action_from_matrix(move.get_move_matrix() if isinstance(move,Move) else move,player)
+        if validate:
+            if action.kind not in PHASE_KINDS[self.phase]:
+                raise ValueError(f"{action.kind.name} is not allowed in phase {self.phase.name}")
+            if not action.is_canonical() or not legal_action_mask(self.state,player)[action.index]:
+                raise ValueError(f"{action.kind.name} {action.cards} is not legal for player {player}")
+        self.make_move(action)
+        return self.phase
+
+    def action_from_matrix(self,move,player):
+        """
+        Reads the Action a move matrix plays in the current phase, an empty matrix is a pass while the
+        attacker moves and a flash (of the first trump that can be flashed) while the defender moves
+
+        Raises:
+            ValueError: if the matrix is not a move of the current phase
+        """
+        move = np.asarray(move)
+        if move.shape != (6,32):
+            raise ValueError("Move matrix must have shape (6,32)")
+        played = np.flatnonzero(move[player,:] == -1).tolist()
+        action = None
+        if self.phase == Phase.ATTACK:
+            if played:
+                action = Action(MoveKind.ATTACK,tuple(played))
+        elif self.phase in (Phase.THROW_IN,Phase.PICKUP):
+            if not played:
+                action = Action(MoveKind.PASS)
+            elif len(played) == 1:
+                action = Action(MoveKind.THROW_IN,tuple(played))
+        elif self.phase == Phase.DEFEND:
+            targets = np.flatnonzero(move[3,:] == -1).tolist()
+            if not played:
+                flashes = np.flatnonzero(self.state[player,:8] & RANKS_TO_CARDS[self.board_ranks,:8]).tolist()
+                if not flashes:
+                    raise ValueError("Empty defence but there is no trump to flash")
+                action = Action(MoveKind.FLASH,tuple(flashes[:1]))
+            elif len(played) == 1 and len(targets) == 1:
+                action = Action(MoveKind.DEFEND,tuple(played),targets[0])
+            elif len(played) == 1 and not targets:
+                action = Action(MoveKind.REDIRECT,tuple(played))
+        if action is None:
+            raise ValueError(f"Move does not fit phase {self.phase.name}")
+        # The action as indexed has to make exactly the changes of the matrix, nothing more or different
+        action = Action.from_index(action.index)
+        if not np.array_equal(action.to_matrix(player),move):
+            raise ValueError(f"Move matrix is not a {action.kind.name} of player {player}")
+        return action
+
+    def legal_moves(self,player):
+        """
+        Lists every legal move of player as backend.moves.Action, empty if it is not their turn
+
+        Params:
+            player: 0-1
+        Returns:
+            moves: list of Action (attacks, throw ins, defences, redirects, flashes, pickup and pass)
+        """
+        return legal_moves(self.state,player)
+
+    def legal_action_mask(self,player):
+        """
+        Same as legal_moves as a bool mask over backend.moves.ACTION_SIZE action indices
+        """
+        return legal_action_mask(self.state,player)
+
+    def make_move(self,action):
+        """
+        Plays an Action from legal_moves for the player whose turn it is, in place. Besides the cards
+        this runs the turn flow, passing the turn, swapping roles on redirects, executing the pickup or
+        discarding the board on PASS and drawing to 6, and moves self.phase on. The toggled cells are
+        recorded on undo_stack. step is the validating entry point.
+
+        Params:
+            action: backend.moves.Action, must be legal, it is not validated again
+        """
+        flat = self.state.reshape(-1)
+        flips = []
+        deck = self.deck
+        board_ranks = self.board_ranks
+        phase = self.phase
+
+        def toggle(index):
+            flat[index] = not flat[index]
+            flips.append(index)
+
+        player = 0 if flat[TURN_CELL] else 1
+        attacker = 0 if flat[P0_ATTACKING_CELL] else 1
+        defender = 1-attacker
+        kind = action.kind
+
+        if kind == MoveKind.ATTACK or kind == MoveKind.THROW_IN or kind == MoveKind.REDIRECT:
+            for card in action.cards:
+                toggle(player*32+card)
+                toggle(3*32+card)
+                toggle(4*32+card)
+            if kind == MoveKind.ATTACK:
+                self.board_ranks = rank_set(action.cards)
+            if kind == MoveKind.REDIRECT:
+                toggle(P0_ATTACKING_CELL)
+                toggle(TURN_CELL)
+            elif phase != Phase.PICKUP: # While picking up the attacker keeps adding
+                toggle(TURN_CELL)
+            self.phase = Phase.PICKUP if phase == Phase.PICKUP else Phase.DEFEND
+        elif kind == MoveKind.DEFEND:
+            card = action.cards[0]
+            toggle(player*32+card)
+            toggle(3*32+action.target)
+            toggle(4*32+card)
+            self.board_ranks |= 1 << (card%8)
+            if not self.state[3].any():
+                toggle(TURN_CELL)
+                self.phase = Phase.THROW_IN
+        elif kind == MoveKind.FLASH:
+            toggle(FLASHED_CELL)
+            toggle(P0_ATTACKING_CELL)
+            toggle(TURN_CELL)
+        elif kind == MoveKind.PICKUP:
+            toggle(PICKUP_CELL)
+            toggle(TURN_CELL)
+            self.phase = Phase.PICKUP
+        else: # PASS, the bout is over
+            picked_up = phase == Phase.PICKUP
+            for card in np.flatnonzero(self.state[4]).tolist():
+                if picked_up:
+                    toggle(defender*32+card)
+                if flat[3*32+card]:
+                    toggle(3*32+card)
+                toggle(4*32+card)
+            if picked_up:
+                toggle(PICKUP_CELL)
+            else:
+                toggle(P0_ATTACKING_CELL)
+                toggle(TURN_CELL)
+            if flat[FLASHED_CELL]:
+                toggle(FLASHED_CELL)
+            self.board_ranks = 0
+            self.drawto6(attacker,flips=flips)
+            self.phase = Phase.OVER if flat[OVER_CELL] else Phase.ATTACK
+
+        self.undo_stack.append((action,flips,deck,board_ranks,phase))
+        if self.zobrist is not None:
+            self.zobrist ^= flip_hash(flips) ^ int(DECK_KEYS[len(deck)]) ^ int(DECK_KEYS[len(self.deck)])
+        if self.observer is not None:
+            self.observer.update(action,player,flips)
+
+    def unmake_move(self):
+        """
+        Reverts the last make_move by toggling its recorded cells back
+
+        Returns:
+            action: the Action that was undone
+        """
+        action,flips,deck,self.board_ranks,self.phase = self.undo_stack.pop()
+        flat = self.state.reshape(-1)
+        flat[flips] = ~flat[flips] # Every cell is toggled at most once per move
+        if self.zobrist is not None:
+            self.zobrist ^= flip_hash(flips) ^ int(DECK_KEYS[len(deck)]) ^ int(DECK_KEYS[len(self.deck)])
+        self.deck = deck
+        if self.observer is not None:
+            self.observer.revert(flips)
+        return action
+
     def attack(self,move,player):
-        out = self._attack(move,player)
-        self.state = np.array(self.state,dtype=bool)
-        return out
-        
+        """
+        Calls _attack, which sets self.state if the move is valid, and updates the phase
+        """
+        result = self._attack(move,player)
+        if result[0]:
+            self.sync_phase()
+        return result
+
+    def _holds(self,row,word):
+        """
+        True if every card of the card set word is in row of state
+        """
+        return all(self.state.item(row*32+card) for card in cards(word))
+
+    def _holds_any(self,row,word):
+        return any(self.state.item(row*32+card) for card in cards(word))
+
+    def _flip(self,cells):
+        """
+        Toggles the flat state cells of a valid attack or defence
+        """
+        flat = self.state.reshape(-1)
+        for cell in cells:
+            flat[cell] = not flat[cell]
+        if self.zobrist is not None:
+            self.zobrist ^= flip_hash(cells)
+        if self.observer is not None:
+            self.observer.sync()
+
     def _attack(self,move,player):
         """
         Checks whether move is legal if so updates it and returns true, false otherwise
@@ -82,81 +366,59 @@ class Game:
             Beaten: Bool True if no cards where added to left to defend
 
         """
-        assert np.allclose(move[1-player], ZEROES) # Opponents hand doesnt change
-        assert np.allclose(move[2,:],ZEROES) #Cards arent being pulled
+        cells,plus,minus,total = move_words(move)
+        assert not plus[1-player] | minus[1-player] # Opponents hand doesnt change
+        assert not plus[2] | minus[2] #Cards arent being pulled
 
-        new = self.state + move
-        
-        
         # Check whether player has been updated correctly
         # Check that oppononents cards havent changed
         
-        if not np.allclose(self.state[1-player,0:],new[1-player,0:]): # Opponents hand is the same post and pre move
-            print("Opponents cards changed during attack")
+        if plus[1-player] | minus[1-player]: # Opponents hand is the same post and pre move
+            reject("opponent_hand_changed","Opponents cards changed during attack",player=player)
             return (False, False)
         
         #Any card that is added to left 2 defend hast to be also added to cards on board
-        if not np.allclose(move[3,0:],move[4,0:]): 
-            print("Cards played on board not updated")
+        if plus[3] != plus[4] or minus[3] != minus[4]:
+            reject("board_not_updated","Cards played on board not updated",player=player)
             return (False, False)
-        if not np.allclose(-move[player,:], move[3,:]):
-            print("Card removed without adding to board")
+        if plus[3] != minus[player] or minus[3] != plus[player]:
+            reject("card_not_placed","Card removed without adding to board",player=player)
             return(False,False)
-        if not np.allclose(new[3,0:],self.state[player,0:]*new[3,0:]):
-            print("Player added cards that were not in their hand")
+        if not self._holds(player,plus[3] | minus[3]):
+            reject("card_not_in_hand","Player added cards that were not in their hand",player=player)
+            return (False, False)
+        if minus[3]:
+            reject("card_taken_back","Cards cant be taken back from the board",player=player)
             return (False, False)
 
-
-        # Isolate all the values of cards that could legally could be added to the board :LegalToAdd
-        played = self.state[4,0:8] +self.state[4,8:16] + self.state[4,16:24] + self.state[4,24:32]
-        played[np.where(played>=1)] = 1
-        if np.allclose(played, np.zeros(8)): #Empty board any attack is legal
-
-            LegaltoAdd = np.ones(32)
-            added2 = new[3,:8] + new[3,8:16] + new[3,16:24] + new[3,24:]
-            
-            if len(added2[np.where(added2!= 0)])>= 2: # Ensure only one denomination of card is played
-                print("more than 1 denomination")
+        added = plus[3].bit_count()
+        if self.board_ranks == 0: #Empty board any attack is legal
+            ranks = rank_fold(plus[3])
+            if ranks == 0 or ranks & (ranks-1): # Ensure exactly one denomination of card is played
+                reject("several_ranks","More than 1 denomination",player=player)
                 return (False, False)
-            if np.sum(new[3,:])<= np.sum(new[1-player,:]):
-                self.state = new
+            if np.count_nonzero(self.state[3]) + added <= np.count_nonzero(self.state[1-player]):
+                self._flip(cells)
+                self.board_ranks = ranks
                 return (True, False)
             else:
-                print("Defender doesnt have enough cards")
+                reject("defender_short","Defender doesnt have enough cards",player=player)
                 return (False,False)
             
         else: #Board is not empty
-            if np.sum(move) == 0:
+            if total == 0:
                 return (True, True)
-            LegaltoAdd = np.zeros(32)
-            
-            #Make multiple occurences of cards of same denomination be no issue
-            
-            indices = np.where(played == 1)[0]
-            LegaltoAdd[indices] = 1
-            LegaltoAdd[indices + 8] = 1
-            LegaltoAdd[indices + 16] = 1
-            LegaltoAdd[indices + 24] = 1
-        leftdefendmove = new[3,0:]
 
-
-        # Check that the cards that are being added where in the players hand
-        # ONES@new[3,0:].T Whatever cards that have been added by the player
-        # self.state[player,0:]@new[3,0:].T The cards that have been played that are also in the had previously
-
-        
-
-        # Cant add card that has not been played 
-        if np.isclose(np.sum(leftdefendmove),np.dot(LegaltoAdd,leftdefendmove)): 
-            if np.sum(new[3,:])<= np.sum(new[1-player,:]):
-                self.state = new
+        # Cant add card that has not been played, the legal ones are the cards of the ranks on the board
+        if plus[3] & ~rank_unfold(self.board_ranks) == 0:
+            if np.count_nonzero(self.state[3]) + added <= np.count_nonzero(self.state[1-player]):
+                self._flip(cells)
                 return (True, False)
             else:
-                print("Defender doesnt have enough cards")
+                reject("defender_short","Defender doesnt have enough cards",player=player)
                 return (False,False)
         else:
-        
-            print("Cant add card that hasnt been played")
+            reject("rank_not_on_board","Cant add card that hasnt been played",player=player)
             return False, False
     def defend(self,move,player):
         """
@@ -164,7 +426,10 @@ class Game:
         """
         valid,is_redirect,is_complete = self._defend(move,player)
         if valid:
-            self.state = np.array(self.state+move,dtype=bool)
+            cells,plus,_,_ = move_words(move)
+            self._flip(cells)
+            self.board_ranks |= rank_fold(plus[4])
+            self.sync_phase()
         return (valid,is_redirect,is_complete)
     def _defend(self,move,player):
         """
@@ -182,119 +447,131 @@ class Game:
             valid: Bool
             
         """
-        new = self.state + move
-        assert np.allclose(move[1-player], ZEROES) # Opponents hand doesnt change
-        assert np.allclose(move[2,:],ZEROES) #Cards arent being pulled
-        
+        cells,plus,minus,total = move_words(move)
+        assert not plus[1-player] | minus[1-player] # Opponents hand doesnt change
+        assert not plus[2] | minus[2] #Cards arent being pulled
+        left = np.count_nonzero(self.state[3])
+        added = plus[3].bit_count() - minus[3].bit_count() # Change in the number of cards left to defend
 
-        if np.sum(new[3,:]) >= np.sum(self.state[3,:]): # Attempted redirect or flash
-            if np.sum(self.state[4:0]^self.state[3,:]) != 0:
-                return (False,False,False) # Cant redirect if you already started defending
+        if added >= 0: # Attempted redirect or flash
+            if np.count_nonzero(self.state[4]) != left: # Cards left to defend are a subset of the board
+                reject("defence_started","Cant redirect after defending started",player=player)
+                return (False,False,False)
             
-            rankonboard = self.state[4,0:8] +self.state[4,8:16] + self.state[4,16:24] + self.state[4,24:]
+            legal2add = rank_unfold(self.board_ranks) # Cards of the ranks on board, the lowest byte are the trumps
             
-            if np.sum(move[3,:]) == 0 and np.allclose(move[player,:],ZEROES) : #Attempted Flash
-                if self.state[player,np.where(rankonboard>=1)[0]] != 1:
-                    print("player doesnt have the trump card to redirect")
+            if added == 0 and not plus[player] | minus[player]: #Attempted Flash
+                if not self._holds_any(player,legal2add & 0xFF):
+                    reject("no_trump_to_flash","Player doesnt have the trump card to redirect",player=player)
+                    return (False,False,False)
+                elif self.state[5,13]:
+                    reject("already_flashed","Trump was already flashed this bout",player=player)
+                    return (False,False,False)
+                elif left > np.count_nonzero(self.state[1-player]):
+                    reject("attacker_short","Attacker doesnt have enough cards",player=player)
                     return (False,False,False)
                 else:
                     return (True,True,False)
             else: #Normal redirect
-                redirectedcard = np.where(move[3,:]==1)[0]
-                if np.allclose(np.where(rankonboard==1)[0],(redirectedcard%8)): #The card added by move must be of same rank 
+                if plus[3] != plus[4] or minus[3] != minus[4] or plus[3] != minus[player] or minus[3] != plus[player]:
+                    reject("board_not_updated","Cards played on board not updated",player=player)
+                    return (False,False,False)
+                if not plus[3] or not self._holds(player,plus[3]):
+                    reject("card_not_in_hand","Player redirected with cards that were not in their hand",player=player)
+                    return (False,False,False)
+                if left + added > np.count_nonzero(self.state[1-player]):
+                    reject("attacker_short","Attacker doesnt have enough cards",player=player)
+                    return (False,False,False)
+                if plus[3] & ~legal2add == 0: #The card added by move must be of same rank 
                     return (True,True,False)
                 else:
-                    print("Card of wrong rank used to redirect")
+                    reject("wrong_rank","Card of wrong rank used to redirect",player=player)
                     return (False,False,False)   
         else:
-            print("we here")
-            print(f"{ np.sum(new[3,:])+1==np.sum(self.state[3,:])}")
-            if np.sum(new[3,:])+1==np.sum(self.state[3,:]) and (np.sum(move[4,:]) == 1): # Attempted Defense of exactly 1 card
-                cardsdefended  = np.where(move==-1)[0]
-
-                card2def = ZEROES - move[3,:]
-                defendingcard = move[4,:]
-        
-
-                if not np.allclose(defendingcard * self.state[player,:], defendingcard):
-                    print(defendingcard)
-                    print(defendingcard * self.state[player,:])
-                    print(f'Cards have been used that arent in player {player}`s hand')
+            if added == -1 and plus[4].bit_count() - minus[4].bit_count() == 1: # Attempted Defense of exactly 1 card
+                if minus[3].bit_count() != 1 or not self._holds(3,plus[3] | minus[3]):
+                    reject("target_not_left","Defended card is not left to defend",player=player)
+                    return (False,False,False)
+                if plus[4] != minus[player] or minus[4] != plus[player]:
+                    reject("card_not_placed","Card used in defence was not removed from hand",player=player)
+                    return (False,False,False)
+                if not self._holds(player,plus[4] | minus[4]):
+                    reject("card_not_in_hand","Cards have been used that arent in player %d`s hand",player,player=player)
                     return (False,False,False)
-                card2def=card2def[np.where(card2def==1)]
-                defendingcard = defendingcard[np.where(defendingcard==1)]
-                if card2def//8 == defendingcard//8: #Defense with same suit
-                    if card2def<defendingcard:
-                        print("Card is of the same suit but too low")
-                        return (False,False,False)
-                elif card2def//8 != 0:
-                    print("Card isnt of the same suit and isnt trump")
+                card2def = minus[3].bit_length() - 1
+                defendingcard = (plus[4] & -plus[4]).bit_length() - 1
+                if not BEATS[card2def,defendingcard]:
+                    if SUIT[card2def] == SUIT[defendingcard]: #Defense with same suit
+                        reject("too_low","Card is of the same suit but too low",player=player)
+                    else:
+                        reject("does_not_beat","Card isnt of the same suit and isnt trump",player=player)
                     return (False,False,False)
-                if np.sum(new[3,:]) == 0:
+                if left == 1:
                     return (True,False,True)
                 return(True,False,False)
             else:
-                print("Unaccouted for sequence")
+                reject("unknown_sequence","Unaccounted for sequence",player=player)
                 return (False,False,False)
                 
     def check_wurf(self,move,player):
-        assert move[3,:] - move[player, :] == 0
-        if not np.allclose(self.state[player,:]@move[3,:].T,move[3,:].T):
-            print("Player added a card thats not in their hand")
+        _,plus,minus,_ = move_words(move)
+        assert plus[3] == minus[player] and minus[3] == plus[player]
+        if not self._holds(player,plus[3] | minus[3]):
+            reject("card_not_in_hand","Player added a card thats not in their hand",player=player)
             return False
         
-        played = self.state[4,0:8] +self.state[4,8:16] + self.state[4,17:23] + self.state[4,24:31]
-        played[np.where(played>=1)] = 1
-        LegaltoAdd = np.zeros(32)
-        indices = np.where(played == 1)[0]
-        LegaltoAdd[indices] = 1
-        LegaltoAdd[indices + 8] = 1
-        LegaltoAdd[indices + 16] = 1
-        LegaltoAdd[indices + 24] = 1
-
-        leftdefendmove = self.state[3,:] + move[3,:]
-        if np.isclose(np.sum(leftdefendmove),np.dot(LegaltoAdd,leftdefendmove)):
+        # Cards left to defend are on the board so their ranks are legal, only the cards of the move need checking
+        if (plus[3] | minus[3]) & ~rank_unfold(self.board_ranks) == 0:
             return True
         else:
-            print("Cant add card that hasnt been played")
+            reject("rank_not_on_board","Cant add card that hasnt been played",player=player)
             return False
 
-        pass
-
     def ExecutePickup(self,player):
         """
         Empties left2def and onboard and gives these cards to player
         """
 
+        if self.observer is not None:
+            self.observer.note_pickup(player,self.state[4,:])
         self.state[player,:] +=self.state[4,:]
         self.state[3,:] = False
         self.state[4,:] = False 
+        self.board_ranks = 0
+        self.sync_phase()
+        if self.zobrist is not None:
+            self.zobrist = zobrist_hash(self.state,len(self.deck))
+        if self.observer is not None:
+            self.observer.sync()
 
         return
 
-    def drawto6(self,attacker,rek=False):
+    def drawto6(self,attacker,rek=False,flips=None):
         """
         Draws cards for attacker first then for defender, if there are no cards left at a point sets winner variables
-    
+        flips: optional list, the flat index of every cell of state that changes is appended to it
         """
-        cardsleftattacker = np.sum(self.state[attacker,:])
+        cardsleftattacker = np.count_nonzero(self.state[attacker,:])
         cardsleft = len(self.deck)
         if cardsleftattacker <6:
             if cardsleft == 0 and cardsleftattacker == 0:
                 self.state[5,11] = 1
                 self.state[5,12] = 1-attacker
+                if flips is not None:
+                    flips.append(OVER_CELL)
+                    if attacker == 0:
+                        flips.append(P0_WON_CELL)
                 return
             else:
-                if cardsleft < 6-cardsleftattacker:
-                    self.state[attacker,self.deck] = 1
-                    self.state[2,self.deck] = 0
-                    self.deck = []
-                else:
-                    self.state[attacker,self.deck[0:6-cardsleftattacker]] = 1
-                    self.state[2,self.deck[0:6-cardsleftattacker]] = 0
-                    self.deck = self.deck[6-cardsleftattacker:]
+                drawn = self.deck[0:6-cardsleftattacker] # Views of the deck, it is never copied
+                self.state[attacker,drawn] = 1
+                self.state[2,drawn] = 0
+                self.deck = self.deck[len(drawn):]
+                if flips is not None:
+                    flips.extend((attacker*32+drawn).tolist())
+                    flips.extend((2*32+drawn).tolist())
         if not rek:
-            self.drawto6(1-attacker,rek=True)
+            self.drawto6(1-attacker,rek=True,flips=flips)
 
 
 if __name__ == '__main__':
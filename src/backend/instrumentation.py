@@ -0,0 +1,234 @@
+"""
+Opt in diagnostics of the rules engine
+
+The validators report why they refuse a move through the "durak.rules" logger instead of printing,
+each record carries a short reason key (record.reason) and the player. The logger has no output of
+its own, enable_logging attaches a handler writing one JSON object per record, or configure it like
+any other logger. Disabled, a rejection costs one logger level check. enable_logging and Profiler
+lower the logger to DEBUG and stop it propagating while they are attached, otherwise handlers of the
+root logger, which filter on their own level only, would print every rejection too.
+
+Profiler times Game methods while it is enabled by wrapping them on the class, and counts the
+rejection reasons. Disabled it puts the original methods back, so there is no overhead left at all.
+"""
+
+import functools
+import json
+import logging
+import sys
+import time
+from collections import Counter, deque
+
+import numpy as np
+
+log = logging.getLogger("durak.rules")
+log.addHandler(logging.NullHandler())
+
+# Game methods a Profiler times by default, drawto6 also counts its nested call for the defender
+DEFAULT_METHODS = ("_attack", "_defend", "check_wurf", "drawto6", "ExecutePickup", "make_move", "unmake_move",
+                   "legal_action_mask")
+
+# LogRecord attributes every record has, anything else was passed as a structured field
+_RECORD_FIELDS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+def reject(reason, message, *args, **fields):
+    """
+    Logs at debug level why a validator refused a move
+
+    Params:
+        reason: short snake_case key, what Profiler counts
+        message: human readable text, %-formatted with args like any log message
+        fields: extra structured fields, e.g. player
+    """
+    if log.isEnabledFor(logging.DEBUG):
+        log.debug(message, *args, extra=dict(fields, reason=reason))
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    One JSON object per record: time, logger, level, message and every structured field
+    """
+
+    def format(self, record):
+        entry = {"time": record.created, "logger": record.name, "level": record.levelname, "message": record.getMessage()}
+        for key, value in vars(record).items():
+            if key not in _RECORD_FIELDS:
+                entry[key] = value
+        return json.dumps(entry, default=str)
+
+
+def enable_logging(path=None, level=logging.DEBUG):
+    """
+    Writes the rules engine's diagnostics as JSON lines to path, or stderr if None
+
+    Returns:
+        handler: logging.Handler, pass it to disable_logging to switch the output off again
+    """
+    handler = logging.StreamHandler(sys.stderr) if path is None else logging.FileHandler(path)
+    handler.setFormatter(JsonFormatter())
+    log.addHandler(handler)
+    log.setLevel(level)
+    log.propagate = False
+    return handler
+
+
+def disable_logging(handler):
+    log.removeHandler(handler)
+    handler.close()
+    log.setLevel(logging.NOTSET)
+    log.propagate = True
+
+
+class _ReasonCounter(logging.Handler):
+    def __init__(self, counter):
+        super().__init__(logging.DEBUG)
+        self.counter = counter
+
+    def emit(self, record):
+        self.counter[getattr(record, "reason", "unknown")] += 1
+
+
+class Profiler:
+    def __init__(self, methods=DEFAULT_METHODS, samples=100000):
+        """
+        Call counts, total and percentile latencies of Game methods and counts of rejection reasons
+
+        Only one Profiler can be enabled at a time, it patches the Game class so every game is measured.
+        Usable as a context manager.
+
+        Params:
+            methods: names of the Game methods to time
+            samples: latencies kept per method for the percentiles, the most recent ones
+        """
+        self.methods = tuple(methods)
+        self.samples = samples
+        self.originals = {}
+        self.rejections = Counter()
+        self.handler = _ReasonCounter(self.rejections)
+        self.reset()
+
+    def reset(self):
+        self.calls = Counter()
+        self.total_ns = Counter()
+        self.latencies = {name: deque(maxlen=self.samples) for name in self.methods}
+        self.rejections.clear()
+
+    def enable(self):
+        from backend.game import Game # backend.game imports this module for reject
+
+        assert not self.originals, "Profiler is already enabled"
+        for name in self.methods:
+            original = Game.__dict__[name]
+            assert not hasattr(original, "__profiled__"), "Another Profiler is enabled"
+            self.originals[name] = original
+            setattr(Game, name, self._timed(name, original))
+        self.level = log.level
+        self.propagate = log.propagate
+        if log.getEffectiveLevel() > logging.DEBUG:
+            log.setLevel(logging.DEBUG)
+            log.propagate = False # Rejections are only counted, they are not for the root logger's handlers
+        log.addHandler(self.handler)
+        return self
+
+    def disable(self):
+        from backend.game import Game
+
+        for name, original in self.originals.items():
+            setattr(Game, name, original)
+        self.originals = {}
+        log.removeHandler(self.handler)
+        log.setLevel(self.level)
+        log.propagate = self.propagate
+
+    def __enter__(self):
+        return self.enable()
+
+    def __exit__(self, *exc):
+        self.disable()
+
+    def _timed(self, name, method):
+        calls = self.calls
+        total_ns = self.total_ns
+        latencies = self.latencies[name]
+
+        @functools.wraps(method)
+        def timed(*args, **kwargs):
+            start = time.perf_counter_ns()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter_ns() - start
+                calls[name] += 1
+                total_ns[name] += elapsed
+                latencies.append(elapsed)
+
+        timed.__profiled__ = True
+        return timed
+
+    def stats(self):
+        """
+        Returns:
+            dict: per method name calls, total_s, mean_us, p50_us, p90_us and p99_us, methods never called are left out,
+                  and the rejection reason counts under "rejections"
+        """
+        methods = {}
+        for name in self.methods:
+            if not self.calls[name]:
+                continue
+            p50, p90, p99 = np.percentile(np.array(self.latencies[name]) / 1000, [50, 90, 99])
+            methods[name] = {
+                "calls": self.calls[name],
+                "total_s": self.total_ns[name] / 1e9,
+                "mean_us": self.total_ns[name] / self.calls[name] / 1000,
+                "p50_us": float(p50),
+                "p90_us": float(p90),
+                "p99_us": float(p99),
+            }
+        return {"methods": methods, "rejections": dict(self.rejections.most_common())}
+
+    def report(self):
+        """
+        The stats as a text table, slowest total first
+        """
+        stats = self.stats()
+        lines = [f"{'method':<20}{'calls':>10}{'total s':>10}{'mean us':>10}{'p50 us':>10}{'p90 us':>10}{'p99 us':>10}"]
+        for name, row in sorted(stats["methods"].items(), key=lambda item: -item[1]["total_s"]):
+            lines.append(f"{name:<20}{row['calls']:>10}{row['total_s']:>10.3f}{row['mean_us']:>10.1f}"
+                         f"{row['p50_us']:>10.1f}{row['p90_us']:>10.1f}{row['p99_us']:>10.1f}")
+        if stats["rejections"]:
+            lines.append("")
+            lines.append(f"{'rejection':<20}{'count':>10}")
+            for reason, count in stats["rejections"].items():
+                lines.append(f"{reason:<20}{count:>10}")
+        return "\n".join(lines)
+
+    def export(self, path):
+        """
+        Writes the stats to path as JSON
+        """
+        with open(path, "w") as file:
+            json.dump(self.stats(), file, indent=2)
+
+
+if __name__ == "__main__":
+    from backend.game import Game
+    from backend.moves import Action, MoveKind
+
+    rng = np.random.default_rng(0)
+    with Profiler() as profiler:
+        for seed in range(50):
+            game = Game(seed=seed)
+            while not game.state[5, 11]:
+                player = 0 if game.state[5, 8] else 1
+                legal = game.legal_action_mask(player)
+                action = Action.from_index(rng.choice(np.flatnonzero(legal)))
+                # Runs a random action through the validators first, most of them are refused
+                attempt = Action.from_index(rng.integers(len(legal)))
+                scratch = Game.from_state(game.state.copy(), game.deck)
+                if attempt.kind in (MoveKind.ATTACK, MoveKind.THROW_IN):
+                    scratch.attack(attempt.to_matrix(player), player)
+                elif attempt.kind in (MoveKind.DEFEND, MoveKind.REDIRECT):
+                    scratch.defend(attempt.to_matrix(player), player)
+                game.make_move(action)
+    print(profiler.report())
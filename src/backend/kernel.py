@@ -0,0 +1,287 @@
+"""
+Rules kernel on bitboards for whole random playouts, compiled with Numba when it is importable
+A position is an int64 array of the 6 backend.bitstate row words of Game.state plus the deck (card
+indices in drawing order) and the index of the next card to draw. legal_actions and apply_action
+play the rules of backend.moves.legal_action_mask and Game.make_move (with drawto6) on them, written
+with plain ints and arrays only so Numba can compile them in nopython mode.
+
+random_playouts runs the kernel compiled if Numba is installed and otherwise falls back to the NumPy
+engine (legal_action_mask and Game.make_move). Both pick move int(draw * number of legal moves) from
+the legal moves in action index order for the same uniform draws, so they return the same results.
+"""
+
+import numpy as np
+
+from backend.bitstate import pack, rank_fold
+from backend.cards import BEATEN_BY, FLASHED, OVER, P0_ATTACKING, P0_WON, PICKUP, TURN
+from backend.game import Game
+from backend.moves import (ACTION_SIZE, DEFEND_OFFSET, FLASH_OFFSET, PASS_INDEX, PICKUP_INDEX, REDIRECT_OFFSET,
+                           THROW_IN_OFFSET, Action, legal_action_mask)
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+NUMBA = numba is not None
+MAX_PLIES = 1000
+
+
+def _jit(function):
+    return numba.njit(cache=True)(function) if NUMBA else function
+
+
+@_jit
+def _popcount(word):
+    word = word - ((word >> 1) & 0x55555555)
+    word = (word & 0x33333333) + ((word >> 2) & 0x33333333)
+    word = (word + (word >> 4)) & 0x0F0F0F0F
+    return ((word * 0x01010101) & 0xFFFFFFFF) >> 24
+
+
+_rank_fold = _jit(rank_fold)
+
+
+@_jit
+def legal_actions(words, out):
+    """
+    Writes the legal action indices of the player to move into out in ascending order
+
+    Params:
+        words: ndarray(6,) int64 position
+        out: ndarray(ACTION_SIZE,) int64
+    Returns:
+        n: number of legal actions, out[:n] holds them
+    """
+    flags = words[5]
+    if flags & OVER:
+        return 0
+    player = 0 if flags & TURN else 1
+    hand = words[player]
+    opponent_count = _popcount(words[1 - player])
+    left = words[3]
+    board = words[4]
+    left_count = _popcount(left)
+    attacking = ((flags & P0_ATTACKING) != 0) == (player == 0)
+    rank_on_board = _rank_fold(board)
+    rank_cards = rank_on_board * 0x01010101
+    n = 0
+
+    if attacking:
+        if board == 0:
+            for rank in range(8):
+                suits = 0
+                for suit in range(4):
+                    suits |= ((hand >> (8 * suit + rank)) & 1) << suit
+                for subset in range(1, 16):
+                    if subset & ~suits == 0 and _popcount(subset) <= opponent_count:
+                        out[n] = rank * 15 + subset - 1
+                        n += 1
+        elif left_count == 0 or flags & PICKUP:
+            if left_count + 1 <= opponent_count:
+                for card in range(32):
+                    if (hand & rank_cards) >> card & 1:
+                        out[n] = THROW_IN_OFFSET + card
+                        n += 1
+            out[n] = PASS_INDEX
+            n += 1
+    elif not flags & PICKUP and left_count > 0:
+        for target in range(32):
+            if left >> target & 1:
+                beaters = hand & BEATEN_BY[target]
+                for card in range(32):
+                    if beaters >> card & 1:
+                        out[n] = DEFEND_OFFSET + target * 32 + card
+                        n += 1
+        if left == board: # Nothing defended yet, the attack may be passed on
+            if left_count + 1 <= opponent_count:
+                for card in range(32):
+                    if (hand & rank_cards) >> card & 1:
+                        out[n] = REDIRECT_OFFSET + card
+                        n += 1
+            if not flags & FLASHED and left_count <= opponent_count:
+                for rank in range(8):
+                    if (hand & rank_on_board) >> rank & 1:
+                        out[n] = FLASH_OFFSET + rank
+                        n += 1
+        out[n] = PICKUP_INDEX
+        n += 1
+    return n
+
+
+@_jit
+def _draw(words, deck, position, player):
+    """
+    Game.drawto6 for one player, returns the new deck position, marks the game over if player is out of cards
+    """
+    in_hand = _popcount(words[player])
+    if in_hand < 6:
+        if position == len(deck) and in_hand == 0:
+            words[5] |= OVER
+            if player == 0:
+                words[5] |= P0_WON
+            return position
+        while in_hand < 6 and position < len(deck):
+            bit = 1 << deck[position]
+            words[player] |= bit
+            words[2] &= ~bit
+            position += 1
+            in_hand += 1
+    return position
+
+
+@_jit
+def apply_action(words, deck, position, action):
+    """
+    Game.make_move of a legal action index on the position, in place
+
+    Returns:
+        position: index into deck of the next card to draw
+    """
+    flags = words[5]
+    player = 0 if flags & TURN else 1
+    attacker = 0 if flags & P0_ATTACKING else 1
+
+    if action < DEFEND_OFFSET or REDIRECT_OFFSET <= action < FLASH_OFFSET: # Cards go to the board
+        if action < THROW_IN_OFFSET:
+            rank = action // 15
+            subset = action % 15 + 1
+            cards = 0
+            for suit in range(4):
+                if subset >> suit & 1:
+                    cards |= 1 << (8 * suit + rank)
+        elif action < DEFEND_OFFSET:
+            cards = 1 << (action - THROW_IN_OFFSET)
+        else:
+            cards = 1 << (action - REDIRECT_OFFSET)
+        words[player] &= ~cards
+        words[3] |= cards
+        words[4] |= cards
+        if action >= REDIRECT_OFFSET:
+            flags ^= P0_ATTACKING ^ TURN
+        elif action < THROW_IN_OFFSET or not flags & PICKUP:
+            flags ^= TURN
+    elif action < REDIRECT_OFFSET:
+        target = (action - DEFEND_OFFSET) // 32
+        card = 1 << ((action - DEFEND_OFFSET) % 32)
+        words[player] &= ~card
+        words[3] &= ~(1 << target)
+        words[4] |= card
+        if words[3] == 0:
+            flags ^= TURN
+    elif action < PICKUP_INDEX:
+        flags ^= FLASHED ^ P0_ATTACKING ^ TURN
+    elif action == PICKUP_INDEX:
+        flags ^= PICKUP ^ TURN
+    else: # PASS, the bout is over
+        if flags & PICKUP:
+            words[1 - attacker] |= words[4]
+            flags &= ~PICKUP
+        else:
+            flags ^= P0_ATTACKING ^ TURN
+        words[3] = 0
+        words[4] = 0
+        words[5] = flags & ~FLASHED
+        position = _draw(words, deck, position, attacker)
+        if not words[5] & OVER:
+            position = _draw(words, deck, position, 1 - attacker)
+        return position
+    words[5] = flags
+    return position
+
+
+@_jit
+def _playouts(words, deck, position, draws):
+    """
+    Random playouts from one position, draws[i, ply] picks the move of playout i at ply
+
+    Returns:
+        winners: ndarray(N,) int64, -1 if the playout hit the move limit (draws.shape[1])
+        plies: ndarray(N,) int64
+    """
+    n, max_plies = draws.shape
+    winners = np.full(n, -1, dtype=np.int64)
+    plies = np.zeros(n, dtype=np.int64)
+    actions = np.empty(ACTION_SIZE, dtype=np.int64)
+    current = np.empty(6, dtype=np.int64)
+    for i in range(n):
+        current[:] = words
+        at = position
+        ply = 0
+        while ply < max_plies and not current[5] & OVER:
+            count = legal_actions(current, actions)
+            at = apply_action(current, deck, at, actions[int(draws[i, ply] * count)])
+            ply += 1
+        if current[5] & OVER:
+            winners[i] = 0 if current[5] & P0_WON else 1
+        plies[i] = ply
+    return winners, plies
+
+
+def _numpy_playouts(game, draws):
+    """
+    _playouts through legal_action_mask and Game.make_move
+    """
+    n, max_plies = draws.shape
+    winners = np.full(n, -1, dtype=np.int64)
+    plies = np.zeros(n, dtype=np.int64)
+    for i in range(n):
+        current = Game.from_state(game.state.copy(), np.array(game.deck))
+        ply = 0
+        while ply < max_plies and not current.state[5, 11]:
+            legal = np.flatnonzero(legal_action_mask(current.state, 0 if current.state[5, 8] else 1))
+            current.make_move(Action.from_index(legal[int(draws[i, ply] * len(legal))]))
+            ply += 1
+        if current.state[5, 11]:
+            winners[i] = 0 if current.state[5, 12] else 1
+        plies[i] = ply
+    return winners, plies
+
+
+def position_of(game):
+    """
+    Kernel position of a Game
+
+    Returns:
+        words: ndarray(6,) int64
+        deck: ndarray int64, the cards left to draw in order
+    """
+    return pack(game.state).astype(np.int64), np.array(game.deck, dtype=np.int64)
+
+
+def random_playouts(game, n, rng=None, max_plies=MAX_PLIES, compiled=None):
+    """
+    Plays n uniformly random games to the end from game's position, which is not changed
+
+    Params:
+        game: Game
+        n: number of playouts
+        rng: numpy Generator or seed for the move draws
+        max_plies: playouts are cut off after this many moves
+        compiled: run the kernel (compiled if Numba is installed), None picks it only when Numba is installed
+    Returns:
+        winners: ndarray(n,) int64, -1 for playouts that were cut off
+        plies: ndarray(n,) int64
+    """
+    rng = np.random.default_rng(rng)
+    draws = rng.random((n, max_plies))
+    if compiled is None:
+        compiled = NUMBA
+    if not compiled:
+        return _numpy_playouts(game, draws)
+    words, deck = position_of(game)
+    return _playouts(words, deck, 0, draws)
+
+
+if __name__ == "__main__":
+    import time
+
+    print(f"Kernel {'compiled with Numba' if NUMBA else 'interpreted, Numba is not installed'}")
+    game = Game(seed=0)
+    random_playouts(game, 1, compiled=True) # Compiles the kernel
+    for compiled, n in ((False, 20), (True, 200)):
+        start = time.perf_counter()
+        winners, plies = random_playouts(game, n, rng=1, compiled=compiled)
+        elapsed = time.perf_counter() - start
+        name = "kernel" if compiled else "NumPy"
+        print(f"{name:>8}: {n / elapsed:10.1f} playouts/s {plies.sum() / elapsed:12.0f} plies/s, P0 won {np.mean(winners == 0):.0%}")
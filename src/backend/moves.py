@@ -0,0 +1,277 @@
+from enum import IntEnum
+from typing import NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from backend.bitstate import rank_fold_rows
+from backend.cards import BEATS
+from backend.constants import MoveType
+
+
+class MoveKind(IntEnum):
+    ATTACK = 0  # Open an empty board with one denomination
+    THROW_IN = 1  # Add a card of a played denomination (check_wurf)
+    DEFEND = 2  # Beat one card left to defend
+    REDIRECT = 3  # Add a card of the same denomination and pass the attack on
+    FLASH = 4  # Redirect by showing the trump of the attacked denomination
+    PICKUP = 5  # Defender takes the board
+    PASS = 6  # Attacker stops adding cards, board is discarded or picked up
+
+
+class Phase(IntEnum):
+    ATTACK = 0  # Board is empty, the attacker opens a bout
+    DEFEND = 1  # Cards are left to defend, the defender beats, redirects, flashes or picks up
+    THROW_IN = 2  # Everything is beaten, the attacker throws in or passes and the board is discarded
+    PICKUP = 3  # The defender picks up, the attacker throws in more or passes and the defender takes the board
+    OVER = 4
+
+
+# Move kinds each phase allows, the attacker moves in every phase but DEFEND
+PHASE_KINDS = {
+    Phase.ATTACK: frozenset({MoveKind.ATTACK}),
+    Phase.DEFEND: frozenset({MoveKind.DEFEND, MoveKind.REDIRECT, MoveKind.FLASH, MoveKind.PICKUP}),
+    Phase.THROW_IN: frozenset({MoveKind.THROW_IN, MoveKind.PASS}),
+    Phase.PICKUP: frozenset({MoveKind.THROW_IN, MoveKind.PASS}),
+    Phase.OVER: frozenset(),
+}
+
+
+def phase_of(state):
+    """
+    Phase of a position read from its cells, only for positions that were not reached through
+    Game.make_move (which tracks the phase itself)
+    """
+    if state[5, 11]:
+        return Phase.OVER
+    if state[5, 10]:
+        return Phase.PICKUP
+    if state[3].any():
+        return Phase.DEFEND
+    return Phase.THROW_IN if state[4].any() else Phase.ATTACK
+
+
+# Flat action space for policies, every legal move has exactly one index
+# ATTACK: rank * 15 + (suit subset - 1), suit subset bit s set if the card of suit s is played
+ATTACK_OFFSET = 0
+THROW_IN_OFFSET = ATTACK_OFFSET + 8 * 15
+DEFEND_OFFSET = THROW_IN_OFFSET + 32  # + target * 32 + card
+REDIRECT_OFFSET = DEFEND_OFFSET + 32 * 32
+FLASH_OFFSET = REDIRECT_OFFSET + 32  # + rank, the flashed card is the trump of that rank
+PICKUP_INDEX = FLASH_OFFSET + 8
+PASS_INDEX = PICKUP_INDEX + 1
+ACTION_SIZE = PASS_INDEX + 1
+
+# SUBSET_SUITS[s - 1, suit] is True if suit is part of suit subset s
+SUBSET_SUITS = (np.arange(1, 16)[:, None] >> np.arange(4)) & 1 == 1
+SUBSET_SIZES = SUBSET_SUITS.sum(axis=1)
+
+
+
+class Action(NamedTuple):
+    """
+    Compact move of one player, convertible to the (6, 32) move matrix Game.attack and Game.defend take
+    kind: MoveKind
+    cards: card indices the player plays (or flashes)
+    target: card left to defend that is beaten, only for DEFEND
+    """
+    kind: MoveKind
+    cards: Tuple[int, ...] = ()
+    target: int = -1
+
+    @property
+    def index(self) -> int:
+        if self.kind == MoveKind.ATTACK:
+            subset = sum(1 << (card // 8) for card in self.cards)
+            return ATTACK_OFFSET + (self.cards[0] % 8) * 15 + subset - 1
+        if self.kind == MoveKind.THROW_IN:
+            return THROW_IN_OFFSET + self.cards[0]
+        if self.kind == MoveKind.DEFEND:
+            return DEFEND_OFFSET + self.target * 32 + self.cards[0]
+        if self.kind == MoveKind.REDIRECT:
+            return REDIRECT_OFFSET + self.cards[0]
+        if self.kind == MoveKind.FLASH:
+            return FLASH_OFFSET + self.cards[0]
+        if self.kind == MoveKind.PICKUP:
+            return PICKUP_INDEX
+        return PASS_INDEX
+
+    @classmethod
+    def from_index(cls, index: int) -> "Action":
+        index = int(index)
+        if index < THROW_IN_OFFSET:
+            rank, subset = divmod(index - ATTACK_OFFSET, 15)
+            suits = np.flatnonzero(SUBSET_SUITS[subset])
+            return cls(MoveKind.ATTACK, tuple(int(suit * 8 + rank) for suit in suits))
+        if index < DEFEND_OFFSET:
+            return cls(MoveKind.THROW_IN, (index - THROW_IN_OFFSET,))
+        if index < REDIRECT_OFFSET:
+            target, card = divmod(index - DEFEND_OFFSET, 32)
+            return cls(MoveKind.DEFEND, (card,), target)
+        if index < FLASH_OFFSET:
+            return cls(MoveKind.REDIRECT, (index - REDIRECT_OFFSET,))
+        if index < PICKUP_INDEX:
+            return cls(MoveKind.FLASH, (index - FLASH_OFFSET,))
+        if index == PICKUP_INDEX:
+            return cls(MoveKind.PICKUP)
+        if index == PASS_INDEX:
+            return cls(MoveKind.PASS)
+        raise ValueError(f"Action index must be below {ACTION_SIZE}")
+
+    def is_canonical(self) -> bool:
+        """
+        True if the action is Action.from_index(self.index). index reads only the first card of a throw in,
+        defence or redirect and only the rank of the first card of an attack, so any other action plays
+        cards its index, and so the legal action mask, does not stand for
+        """
+        try:
+            return self == Action.from_index(self.index)
+        except (IndexError, ValueError):
+            return False
+
+    def to_matrix(self, player: int) -> np.ndarray:
+        """
+        Move matrix as built by frontend.input.Player, FLASH, PICKUP and PASS are all zeros
+        (an empty attack is a pass, an empty defence a flash, pickups go through ExecutePickup)
+        """
+        move = np.zeros((6, 32), dtype=int)
+        cards = list(self.cards)
+        if self.kind in (MoveKind.ATTACK, MoveKind.THROW_IN, MoveKind.REDIRECT):
+            move[player, cards] = -1
+            move[3, cards] = 1
+            move[4, cards] = 1
+        elif self.kind == MoveKind.DEFEND:
+            move[player, cards] = -1
+            move[3, self.target] = -1
+            move[4, cards] = 1
+        return move
+
+
+class Move:
+    """
+    Move as a (6, 32) int matrix of changes to the state, what players hand to Game.attack and Game.defend
+    """
+
+    def __init__(self, move_type: MoveType, move_matrix: Optional[np.ndarray] = None):
+        assert type(move_type) == MoveType, "Move type must be a MoveType"
+
+        if move_matrix is not None:
+            assert type(move_matrix) == np.ndarray, "Move matrix must be a numpy array"
+            assert move_matrix.shape == (6,32), "Move matrix must have shape (6,32)"
+            assert move_matrix.dtype == int, "Move matrix must be a int array"
+            self.move_matrix = move_matrix
+        else:
+            self.move_matrix = np.zeros((6, 32), dtype=int)
+
+        self.move_type = move_type
+
+    def __str__(self) -> str:
+        return f"Move type: {self.move_type}\nMove matrix:\n{self.move_matrix}"
+
+    def get_move_matrix(self) -> np.ndarray:
+        return self.move_matrix
+
+    def get_move_type(self) -> MoveType:
+        return self.move_type
+
+    def set_move_row(self, row_index: int, row: np.ndarray): # FIXME:
+        if row_index < 0 or row_index >= 6:
+            raise ValueError("Row index must be between 0 and 5")
+        if row.shape != (32,):
+            raise ValueError("Row must have shape (32,)")
+        if row.dtype != int:
+            raise ValueError("Row must be a integer array")
+
+        self.move_matrix[row_index] = row
+
+    def __add__(self, other):
+        if type(other) != Move:
+            raise ValueError("Cannot add a Move object with a non-Move object")
+
+        if self.move_type != other.get_move_type():
+            raise ValueError("Cannot add moves of different types")
+
+        return Move(self.move_type, self.move_matrix + other.get_move_matrix())
+
+
+def legal_action_mask(state, player):
+    """
+    Legal moves of player as a mask over the flat action space, under the same rules as
+    Game._attack, Game._defend and Game.check_wurf. Whose turn it is and who attacks is
+    read from row 5, so the mask is empty for the player that is not to move.
+
+    Params:
+        state: ndarray(6, 32) or ndarray(N, 6, 32) bool
+        player: int or ndarray(N,) 0-1
+    Returns:
+        mask: ndarray(ACTION_SIZE,) or ndarray(N, ACTION_SIZE) bool
+    """
+    state = np.asarray(state, dtype=bool)
+    single = state.ndim == 2
+    if single:
+        state = state[None]
+    n = len(state)
+    games = np.arange(n)
+    player = np.broadcast_to(np.asarray(player, dtype=np.intp), (n,))
+
+    hand = state[games, player]
+    opponent_count = np.sum(state[games, 1 - player], axis=1)
+    left2def = state[:, 3]
+    on_board = state[:, 4]
+    left_count = np.sum(left2def, axis=1)
+
+    to_move = (state[:, 5, 8] == (player == 0)) & ~state[:, 5, 11]
+    attacking = state[:, 5, 9] == (player == 0)
+    pickup = state[:, 5, 10]
+    board_empty = ~np.any(on_board, axis=1)
+    rank_on_board = rank_fold_rows(on_board)
+    rank_cards = np.tile(rank_on_board, 4)
+
+    attacker = to_move & attacking
+    defender = to_move & ~attacking & ~pickup & (left_count > 0)
+    adding = attacker & ~board_empty & ((left_count == 0) | pickup)
+    not_started = defender & np.all(left2def == on_board, axis=1)
+
+    mask = np.zeros((n, ACTION_SIZE), dtype=bool)
+
+    # Opening attack, every subset of suits of one rank the defender can still answer
+    held = hand.reshape(n, 4, 8).transpose(0, 2, 1)
+    subsets = ~np.any(SUBSET_SUITS[None, None] & ~held[:, :, None, :], axis=3)
+    subsets &= SUBSET_SIZES[None, None] <= opponent_count[:, None, None]
+    mask[:, ATTACK_OFFSET:THROW_IN_OFFSET] = subsets.reshape(n, 8 * 15) & (attacker & board_empty)[:, None]
+
+    fits = (left_count + 1 <= opponent_count)[:, None]
+    mask[:, THROW_IN_OFFSET:DEFEND_OFFSET] = hand & rank_cards & fits & adding[:, None]
+
+    defences = left2def[:, :, None] & hand[:, None, :] & BEATS[None]
+    mask[:, DEFEND_OFFSET:REDIRECT_OFFSET] = defences.reshape(n, 32 * 32) & defender[:, None]
+
+    mask[:, REDIRECT_OFFSET:FLASH_OFFSET] = hand & rank_cards & fits & not_started[:, None]
+    flash = hand[:, :8] & rank_on_board & (~state[:, 5, 13] & (left_count <= opponent_count))[:, None]
+    mask[:, FLASH_OFFSET:PICKUP_INDEX] = flash & not_started[:, None]
+
+    mask[:, PICKUP_INDEX] = defender
+    mask[:, PASS_INDEX] = adding
+
+    return mask[0] if single else mask
+
+
+def legal_moves(state, player):
+    """
+    Legal moves of player as a list of Action
+    """
+    return [Action.from_index(index) for index in np.flatnonzero(legal_action_mask(state, player))]
+
+
+def random_policy(game, player, rng):
+    """
+    Uniformly random legal move of player, the default playout policy of bots.ismcts and backend.dataset
+
+    Params:
+        game: Game
+        player: int 0-1
+        rng: np.random.Generator
+    Returns:
+        action: Action
+    """
+    legal = np.flatnonzero(legal_action_mask(game.state, player))
+    return Action.from_index(legal[rng.integers(len(legal))])
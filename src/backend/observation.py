@@ -0,0 +1,174 @@
+"""
+Per-player observations of Game.state, holding only what that player may know
+Features are float32, OBS_SIZE long, laid out as
+Slice    | Size | Content
+HAND     |  32  | own hand
+DEFEND   |  32  | cards left to defend (row 3)
+BOARD    |  32  | cards on the board (row 4)
+DISCARD  |  32  | cards out of the game
+KNOWN    |  32  | cards the opponent is known to hold: picked up, flashed, the drawn coser,
+         |      | and every unseen card once the deck is empty
+COSER    |   8  | rank of the trump card at the bottom of the deck, one hot
+FLAGS    |   4  | own turn, attacking, pickup declared, trump flashed this bout
+COUNTS   |   2  | cards left in the deck and in the opponent's hand, divided by 32
+"""
+
+import numpy as np
+
+from backend.moves import MoveKind
+
+HAND = 0
+DEFEND = 32
+BOARD = 64
+DISCARD = 96
+KNOWN = 128
+COSER = 160
+FLAGS = 168
+COUNTS = 172
+OBS_SIZE = 174
+
+# Rows that hold a card while it is still in play, a card in none of them is discarded
+_IN_PLAY_ROWS = [0, 1, 2, 4]
+
+
+def encode_batch(states, deck_sizes, players, known=None):
+    """
+    Observations of many positions at once, computed from scratch
+
+    Params:
+        states: ndarray(N,6,32) bool
+        deck_sizes: ndarray(N,) cards left to draw
+        players: ndarray(N,) or int, whose observation
+        known: ndarray(N,32) bool, opponent cards known from the game history (Observer.known), none if None
+    Returns:
+        obs: ndarray(N,OBS_SIZE) float32
+    """
+    states = np.asarray(states, dtype=bool)
+    n = len(states)
+    players = np.broadcast_to(np.asarray(players), (n,))
+    deck_sizes = np.asarray(deck_sizes)
+    games = np.arange(n)
+    own = states[games, players]
+    opp = states[games, 1 - players]
+
+    obs = np.empty((n, OBS_SIZE), dtype=np.float32)
+    obs[:, HAND:DEFEND] = own
+    obs[:, DEFEND:BOARD] = states[:, 3]
+    obs[:, BOARD:DISCARD] = states[:, 4]
+    obs[:, DISCARD:KNOWN] = ~states[:, _IN_PLAY_ROWS].any(axis=1)
+    known = np.zeros((n, 32), dtype=bool) if known is None else np.asarray(known, dtype=bool)
+    obs[:, KNOWN:COSER] = np.where((deck_sizes == 0)[:, None], opp, known & opp)
+    obs[:, COSER:FLAGS] = states[:, 5, :8]
+    is_p0 = players == 0
+    obs[:, FLAGS] = states[:, 5, 8] == is_p0
+    obs[:, FLAGS + 1] = states[:, 5, 9] == is_p0
+    obs[:, FLAGS + 2] = states[:, 5, 10]
+    obs[:, FLAGS + 3] = states[:, 5, 13]
+    obs[:, COUNTS] = deck_sizes / 32
+    obs[:, COUNTS + 1] = opp.sum(axis=1) / 32
+    return obs
+
+
+def encode(state, deck_size, player, known=None):
+    """
+    encode_batch for a single position, returns ndarray(OBS_SIZE,) float32
+    """
+    return encode_batch(state[None], [deck_size], player, None if known is None else known[None])[0]
+
+
+class Observer:
+    """
+    Both players' observations of one Game, updated from the cells every make_move toggles
+    instead of being recomputed. Created by Game.enable_observations.
+
+    known[p] are the cards player p knows to be in the opponent's hand, which depends on the
+    history of the game and not only on the position, so it is kept on a stack for unmake_move.
+    """
+
+    def __init__(self, game):
+        self.game = game
+        self.known = np.zeros((2, 32), dtype=bool)
+        self.obs = np.empty((2, OBS_SIZE), dtype=np.float32)
+        self.reset()
+
+    def reset(self):
+        """
+        Starts over at the game's current position with nothing known, called by Game.reset
+        """
+        self.coser = int(np.flatnonzero(self.game.state[5, :8])[0])
+        self.known[:] = False
+        self.history = []
+        self.sync()
+
+    def __getitem__(self, player):
+        return self.obs[player]
+
+    def sync(self):
+        """
+        Recomputes both observations from the state, needed after writing to state directly instead of through a move
+        """
+        state = self.game.state
+        self.known &= state[[1, 0]]
+        self.obs[:] = encode_batch(np.stack([state, state]), [len(self.game.deck)] * 2, np.arange(2), self.known)
+
+    def note_pickup(self, player, cards):
+        """
+        Remembers that player took the cards, the opponent saw them go to their hand
+        """
+        self.known[1 - player] |= cards
+        self.obs[1 - player, KNOWN:COSER] = self.known[1 - player]
+
+    def update(self, action, player, flips):
+        """
+        Applies a move made by player that toggled the flat state cells in flips
+        """
+        self.history.append(self.known.copy())
+        state = self.game.state
+        known = self.known
+        board = [flip - 4 * 32 for flip in flips if 4 * 32 <= flip < 5 * 32]
+        for flip in flips:
+            if flip < 2 * 32:
+                holder, card = divmod(flip, 32)
+                if not state[holder, card]:
+                    known[1 - holder, card] = False
+                elif card in board or card == self.coser: # Picked up, or the coser that lay face up under the deck
+                    known[1 - holder, card] = True
+        if action.kind == MoveKind.FLASH:
+            known[1 - player, action.cards[0]] = True
+        self._apply(flips)
+
+    def revert(self, flips):
+        """
+        Undoes the last update, after Game.unmake_move restored the state
+        """
+        self.known = self.history.pop()
+        self._apply(flips)
+
+    def _apply(self, flips):
+        state = self.game.state
+        obs = self.obs
+        for flip in flips:
+            row, card = divmod(flip, 32)
+            if row < 2:
+                obs[row, HAND + card] = state[row, card]
+            elif row == 3:
+                obs[:, DEFEND + card] = state[3, card]
+            elif row == 4:
+                obs[:, BOARD + card] = state[4, card]
+                obs[:, DISCARD + card] = not (state[0, card] or state[1, card] or state[2, card] or state[4, card])
+
+        deck_size = len(self.game.deck)
+        if deck_size == 0:
+            self.known[0] = state[1]
+            self.known[1] = state[0]
+        obs[:, KNOWN:COSER] = self.known
+        flags = state[5]
+        obs[0, FLAGS] = flags[8]
+        obs[0, FLAGS + 1] = flags[9]
+        obs[1, FLAGS] = not flags[8]
+        obs[1, FLAGS + 1] = not flags[9]
+        obs[:, FLAGS + 2] = flags[10]
+        obs[:, FLAGS + 3] = flags[13]
+        obs[:, COUNTS] = deck_size / 32
+        obs[0, COUNTS + 1] = np.count_nonzero(state[1]) / 32
+        obs[1, COUNTS + 1] = np.count_nonzero(state[0]) / 32
@@ -0,0 +1,224 @@
+"""
+Binary game log, one file holds any number of games appended one after the other
+Part        |    Size    | Content
+File header |  8 bytes   | MAGIC, format VERSION (uint16), reserved
+Game header |  38 bytes  | number of moves (uint32), coser (uint8), row 5 flags 8-15 (uint8),
+            |            | deal order (32 x uint8): player 0's hand, player 1's hand, deck top to bottom
+Moves       | 2 per move | Action.index of every move (uint16), in order
+
+Games start at the offsets listed in the sidecar index file (path + INDEX_SUFFIX, uint64 each),
+the reader rebuilds it by hopping over the game headers if it is missing.
+"""
+
+import mmap
+import os
+import struct
+
+import numpy as np
+
+from backend.game import Game
+from backend.moves import Action
+
+MAGIC = b"DRKL"
+VERSION = 1
+FILE_HEADER = struct.Struct("<4sHH")
+GAME_HEADER = struct.Struct("<IBB32s")
+INDEX_SUFFIX = ".idx"
+
+
+def deal_order(game):
+    """
+    Deal of a freshly dealt game as 32 card indices: player 0's hand, player 1's hand, then the deck
+
+    Params:
+        game: Game before any move was made
+    Returns:
+        deal: ndarray(32,) uint8
+    """
+    hands = [np.flatnonzero(game.state[0]), np.flatnonzero(game.state[1])]
+    assert len(hands[0]) == 6 and len(hands[1]) == 6, "Only freshly dealt games can be recorded"
+    deal = np.concatenate(hands + [np.asarray(game.deck)])
+    assert len(deal) == 32, "Deal must contain every card"
+    return deal.astype(np.uint8)
+
+
+def game_from_deal(deal, coser, flags=0):
+    """
+    Inverse of deal_order, rebuilds the game at its first move
+    """
+    deal = np.asarray(deal, dtype=int)
+    state = np.zeros((6, 32), dtype=bool)
+    state[0, deal[0:6]] = True
+    state[1, deal[6:12]] = True
+    state[2, deal[12:]] = True
+    state[5, coser] = True
+    state[5, 8:16] = np.unpackbits(np.array([flags], dtype=np.uint8), bitorder="little").astype(bool)
+    return Game.from_state(state, deal[12:].copy())
+
+
+class GameRecord:
+    """
+    One recorded game, actions is a zero copy view into the reader's memory map
+    """
+    __slots__ = ("deal", "coser", "flags", "actions")
+
+    def __init__(self, deal, coser, flags, actions):
+        self.deal = deal
+        self.coser = coser
+        self.flags = flags
+        self.actions = actions
+
+    def __len__(self):
+        return len(self.actions)
+
+    def game(self):
+        return game_from_deal(self.deal, self.coser, self.flags)
+
+    def states(self):
+        """
+        Replays the game through the engine, yielding (state, action) before every move and
+        (state, None) for the final position. States are copies and safe to keep.
+        """
+        game = self.game()
+        for index in self.actions:
+            action = Action.from_index(index)
+            yield game.state.copy(), action
+            game.make_move(action)
+        yield game.state.copy(), None
+
+
+class GameRecordWriter:
+    def __init__(self, path, buffer_size=1 << 20):
+        """
+        Appends games to path, creating it with a file header if it does not exist
+
+        Params:
+            path: log file, the offset index is written next to it
+            buffer_size: bytes buffered before writing to disk
+        """
+        new = not os.path.exists(path) or os.path.getsize(path) == 0
+        self.file = open(path, "ab", buffering=buffer_size)
+        self.index = open(path + INDEX_SUFFIX, "ab", buffering=buffer_size)
+        if new:
+            self.file.write(FILE_HEADER.pack(MAGIC, VERSION, 0))
+        self.offset = self.file.tell()
+        self.deal = None
+        self.coser = 0
+        self.flags = 0
+        self.actions = []
+
+    def start(self, game):
+        """
+        Starts recording a freshly dealt game, the previous game must have been ended
+        """
+        assert self.deal is None, "Previous game was not ended"
+        self.deal = deal_order(game)
+        self.coser = int(np.flatnonzero(game.state[5, :8])[0])
+        self.flags = int(np.packbits(game.state[5, 8:16], bitorder="little")[0])
+        self.actions = []
+
+    def add(self, action):
+        self.actions.append(action.index)
+
+    def end(self):
+        """
+        Writes the recorded game to the buffer
+        """
+        assert self.deal is not None, "No game was started"
+        moves = np.array(self.actions, dtype="<u2")
+        self.index.write(struct.pack("<Q", self.offset))
+        self.file.write(GAME_HEADER.pack(len(moves), self.coser, self.flags, self.deal.tobytes()))
+        self.file.write(moves.tobytes())
+        self.offset += GAME_HEADER.size + moves.nbytes
+        self.deal = None
+
+    def write(self, game, actions):
+        """
+        Records a whole game at once, game must be at its first move
+        """
+        self.start(game)
+        for action in actions:
+            self.add(action)
+        self.end()
+
+    def close(self):
+        self.file.close()
+        self.index.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class GameRecordReader:
+    def __init__(self, path):
+        """
+        Memory maps a log written by GameRecordWriter, games are only decoded when accessed
+        """
+        self.file = open(path, "rb")
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, _ = FILE_HEADER.unpack_from(self.map, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} game log")
+
+        index_path = path + INDEX_SUFFIX
+        if os.path.exists(index_path):
+            self.offsets = np.fromfile(index_path, dtype="<u8")
+        else:
+            self.offsets = self._scan()
+
+    def _scan(self):
+        offsets = []
+        offset = FILE_HEADER.size
+        while offset < len(self.map):
+            offsets.append(offset)
+            n_moves = GAME_HEADER.unpack_from(self.map, offset)[0]
+            offset += GAME_HEADER.size + 2 * n_moves
+        return np.array(offsets, dtype="<u8")
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def __getitem__(self, i):
+        offset = int(self.offsets[i])
+        n_moves, coser, flags, deal = GAME_HEADER.unpack_from(self.map, offset)
+        actions = np.frombuffer(self.map, dtype="<u2", count=n_moves, offset=offset + GAME_HEADER.size)
+        return GameRecord(np.frombuffer(deal, dtype=np.uint8), coser, flags, actions)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def close(self):
+        self.offsets = None
+        self.map.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+if __name__ == "__main__":
+    import tempfile
+
+    rng = np.random.default_rng(0)
+    path = os.path.join(tempfile.mkdtemp(), "games.drk")
+    with GameRecordWriter(path) as writer:
+        for seed in range(100):
+            game = Game(seed=seed)
+            writer.start(game)
+            while not game.state[5, 11]:
+                moves = game.legal_moves(0 if game.state[5, 8] else 1)
+                action = moves[rng.integers(len(moves))]
+                writer.add(action)
+                game.make_move(action)
+            writer.end()
+
+    with GameRecordReader(path) as reader:
+        final, _ = list(reader[42].states())[-1]
+        print(len(reader), "games,", os.path.getsize(path), "bytes, game 42 won by player", 0 if final[5, 12] else 1)
@@ -0,0 +1,162 @@
+"""
+Random access to the positions of a played game, rebuilt from its moves on demand
+Ply p is the position before move p, a game of n moves has n + 1 positions.
+
+A Replay keeps a checkpoint (state copy and deck size) every `interval` plies and the cells every
+move toggles (its delta, from Game.make_move). Both are filled lazily: the first time play gets
+past a ply it is replayed through the engine, later seeks start from the nearest checkpoint or
+cached position at or before the ply, so they cost at most `interval` moves. Single steps forward
+and back apply one recorded delta to a neighbouring cached position.
+"""
+
+from collections import OrderedDict
+
+import numpy as np
+
+from backend.game import Game
+from backend.moves import Action
+
+
+class Replay:
+    def __init__(self, game, actions, interval=32, cache_size=64):
+        """
+        Params:
+            game: Game at the first move to replay from, it is copied and not changed
+            actions: action indices (backend.moves) of the moves played from there, in order
+            interval: plies between checkpoints
+            cache_size: most recently used positions kept materialised
+        """
+        assert interval > 0, "Checkpoint interval must be positive"
+        self.actions = np.asarray(actions, dtype=np.int64)
+        self.interval = interval
+        self.cache_size = cache_size
+        self.deck = np.array(game.deck, dtype=int) # Deck at ply 0, later decks are tails of it
+
+        start = game.state.copy()
+        start.setflags(write=False)
+        self.checkpoints = {0: (start, len(self.deck))}
+        self.deltas = [None] * len(self.actions) # Flat cells move p toggles, once play got past p
+        self.deck_sizes = np.full(len(self.actions) + 1, -1, dtype=np.int64)
+        self.deck_sizes[0] = len(self.deck)
+        self.replayed = 0 # Furthest ply reached so far, every ply up to it has its delta
+        self.cache = OrderedDict([(0, start)])
+        self.moves_replayed = 0 # Moves run through the engine, for profiling seeks
+
+    @classmethod
+    def from_record(cls, record, interval=32, cache_size=64):
+        """
+        Replay of a backend.records.GameRecord
+        """
+        return cls(record.game(), record.actions, interval, cache_size)
+
+    def __len__(self):
+        return len(self.actions) + 1
+
+    def action(self, ply):
+        """
+        The move made at ply, None for the final position
+        """
+        return Action.from_index(self.actions[ply]) if ply < len(self.actions) else None
+
+    def state(self, ply):
+        """
+        The (6,32) state at ply, read only, copy it to change it
+        """
+        if not 0 <= ply < len(self):
+            raise IndexError(f"Ply {ply} is outside of the game's {len(self)} positions")
+        state = self.cache.get(ply)
+        if state is not None:
+            self.cache.move_to_end(ply)
+            return state
+        if ply <= self.replayed:
+            state = self._from_neighbour(ply)
+            if state is None:
+                state = self._replay(ply)
+        else:
+            state = self._replay(ply)
+        self._remember(ply, state)
+        return state
+
+    def game(self, ply):
+        """
+        A new Game at ply, e.g. to analyse or play on from that position
+        """
+        state = self.state(ply)
+        return Game.from_state(state.copy(), self._deck(ply).copy())
+
+    def _deck(self, ply):
+        return self.deck[len(self.deck) - self.deck_sizes[ply]:]
+
+    def _from_neighbour(self, ply):
+        # One delta away from a cached position, the usual case when stepping
+        previous = self.cache.get(ply - 1)
+        if previous is not None:
+            return self._toggled(previous, self.deltas[ply - 1])
+        following = self.cache.get(ply + 1)
+        if following is not None:
+            return self._toggled(following, self.deltas[ply])
+        return None
+
+    def _toggled(self, state, cells):
+        state = state.copy()
+        flat = state.reshape(-1)
+        flat[cells] = ~flat[cells]
+        state.setflags(write=False)
+        return state
+
+    def _replay(self, ply):
+        """
+        Plays the moves from the nearest known position at or before ply, leaving checkpoints behind
+        """
+        base = min(ply // self.interval * self.interval, self.replayed // self.interval * self.interval)
+        for cached in self.cache:
+            if base < cached <= ply:
+                base = cached
+        state = self.cache[base] if base in self.cache else self.checkpoints[base][0]
+
+        game = Game.from_state(state.copy(), self._deck(base))
+        for current in range(base, ply):
+            game.make_move(Action.from_index(self.actions[current]))
+            flips = game.undo_stack.pop()[1]
+            following = current + 1
+            if self.deltas[current] is None:
+                self.deltas[current] = np.array(flips, dtype=np.int64)
+                self.deck_sizes[following] = len(game.deck)
+            if following % self.interval == 0 and following not in self.checkpoints:
+                checkpoint = game.state.copy()
+                checkpoint.setflags(write=False)
+                self.checkpoints[following] = (checkpoint, len(game.deck))
+        self.moves_replayed += ply - base
+        self.replayed = max(self.replayed, ply)
+        state = game.state
+        state.setflags(write=False)
+        return state
+
+    def _remember(self, ply, state):
+        self.cache[ply] = state
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+
+
+if __name__ == "__main__":
+    import time
+
+    rng = np.random.default_rng(0)
+    game = Game(seed=0)
+    start = Game.from_state(game.state.copy(), game.deck.copy())
+    actions = []
+    while not game.state[5, 11] and len(actions) < 5000:
+        legal = np.flatnonzero(game.legal_action_mask(0 if game.state[5, 8] else 1))
+        actions.append(int(legal[rng.integers(len(legal))]))
+        game.make_move(Action.from_index(actions[-1]))
+
+    replay = Replay(start, actions, interval=16, cache_size=8)
+    assert np.array_equal(replay.state(len(actions)), game.state)
+    seeks = rng.integers(len(replay), size=1000)
+    begin = time.perf_counter()
+    replay.moves_replayed = 0
+    for ply in seeks:
+        replay.state(int(ply))
+    elapsed = time.perf_counter() - begin
+    print(f"{len(actions)} moves, {elapsed / len(seeks) * 1e6:.0f} us per random seek, "
+          f"{replay.moves_replayed / len(seeks):.1f} moves replayed per seek")
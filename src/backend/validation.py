@@ -0,0 +1,198 @@
+"""
+Batch versions of Game._attack, Game._defend and Game.check_wurf for many candidate moves against one position
+Candidates are an (M, 6, 32) stack of the move deltas the scalar validators take, entries -1, 0 or 1.
+Every check of the scalar path is made on the whole stack at once, in the same order, and each candidate
+gets the Reason of the first check it fails, the same reason the scalar path logs (backend.instrumentation)
+under Reason.name.lower(). Nothing is applied to the game.
+
+Where the scalar path fails an assertion (the opponent's hand or the deck touched, or a throw in that does
+not move cards from hand to board) the candidate gets MALFORMED.
+"""
+
+from enum import IntEnum
+
+import numpy as np
+
+from backend.bitstate import rank_fold_rows
+from backend.cards import BEATS, RANKS_TO_CARDS
+
+
+class Reason(IntEnum):
+    VALID = 0
+    MALFORMED = 1
+    OPPONENT_HAND_CHANGED = 2
+    BOARD_NOT_UPDATED = 3
+    CARD_NOT_PLACED = 4
+    CARD_NOT_IN_HAND = 5
+    CARD_TAKEN_BACK = 6
+    SEVERAL_RANKS = 7
+    DEFENDER_SHORT = 8
+    RANK_NOT_ON_BOARD = 9
+    DEFENCE_STARTED = 10
+    NO_TRUMP_TO_FLASH = 11
+    ALREADY_FLASHED = 12
+    ATTACKER_SHORT = 13
+    WRONG_RANK = 14
+    TARGET_NOT_LEFT = 15
+    TOO_LOW = 16
+    DOES_NOT_BEAT = 17
+    UNKNOWN_SEQUENCE = 18
+
+
+class _Reasons:
+    """
+    Reason of the first failed check per candidate, checks are added in the scalar path's order
+    """
+
+    def __init__(self, m):
+        self.codes = np.zeros(m, dtype=np.int8)
+
+    def fail(self, failed, reason):
+        self.codes[(self.codes == 0) & failed] = reason
+
+    def valid(self):
+        return self.codes == 0
+
+
+def _malformed(moves, player):
+    return np.any(moves[:, 1 - player] != 0, axis=1) | np.any(moves[:, 2] != 0, axis=1)
+
+
+def check_attacks(game, moves, player):
+    """
+    Game._attack for every candidate
+
+    Params:
+        game: Game, read only
+        moves: ndarray(M, 6, 32) int
+        player: 0-1
+    Returns:
+        valid: ndarray(M,) bool
+        beaten: ndarray(M,) bool, True where the empty move ends the attack on a non empty board
+        reasons: ndarray(M,) int8 Reason
+    """
+    state = game.state
+    moves = np.asarray(moves)
+    added = moves[:, 3]
+    reasons = _Reasons(len(moves))
+
+    reasons.fail(_malformed(moves, player), Reason.MALFORMED)
+    reasons.fail(np.any(added != moves[:, 4], axis=1), Reason.BOARD_NOT_UPDATED)
+    reasons.fail(np.any(-moves[:, player] != added, axis=1), Reason.CARD_NOT_PLACED)
+    reasons.fail(np.any((added != 0) & ~state[player], axis=1), Reason.CARD_NOT_IN_HAND)
+    reasons.fail(np.any(added < 0, axis=1), Reason.CARD_TAKEN_BACK)
+
+    played = added != 0
+    short = np.sum(state[3]) + np.sum(added, axis=1) > np.sum(state[1 - player])
+    beaten = np.zeros(len(moves), dtype=bool)
+    if game.board_ranks == 0:
+        ranks = rank_fold_rows(played)
+        reasons.fail(np.sum(ranks, axis=1) != 1, Reason.SEVERAL_RANKS)
+    else:
+        beaten = reasons.valid() & (np.sum(moves, axis=(1, 2)) == 0)
+        reasons.fail(~beaten & np.any(played & ~RANKS_TO_CARDS[game.board_ranks], axis=1), Reason.RANK_NOT_ON_BOARD)
+    reasons.fail(~beaten & short, Reason.DEFENDER_SHORT)
+    return reasons.valid(), beaten, reasons.codes
+
+
+def check_defences(game, moves, player):
+    """
+    Game._defend for every candidate
+
+    Params:
+        game: Game, read only
+        moves: ndarray(M, 6, 32) int
+        player: 0-1
+    Returns:
+        valid: ndarray(M,) bool
+        is_redirect: ndarray(M,) bool, True for valid redirects and flashes
+        is_complete: ndarray(M,) bool, True for valid defences that leave nothing to defend
+        reasons: ndarray(M,) int8 Reason
+    """
+    state = game.state
+    moves = np.asarray(moves)
+    m = len(moves)
+    hand = state[player]
+    left = np.sum(state[3])
+    opponent = np.sum(state[1 - player])
+    new_left = left + np.sum(moves[:, 3], axis=1)
+    reasons = _Reasons(m)
+    reasons.fail(_malformed(moves, player), Reason.MALFORMED)
+
+    # Redirects and flashes
+    redirecting = new_left >= left
+    legal2add = RANKS_TO_CARDS[game.board_ranks]
+    started = bool(np.any(state[4] ^ state[3]))
+    reasons.fail(redirecting & started, Reason.DEFENCE_STARTED)
+
+    flash = redirecting & (np.sum(moves[:, 3], axis=1) == 0) & ~np.any(moves[:, player] != 0, axis=1)
+    reasons.fail(flash & (not np.any(hand[:8] & legal2add[:8])), Reason.NO_TRUMP_TO_FLASH)
+    reasons.fail(flash & bool(state[5, 13]), Reason.ALREADY_FLASHED)
+    reasons.fail(flash & (left > opponent), Reason.ATTACKER_SHORT)
+
+    redirect = redirecting & ~flash
+    redirected = moves[:, 3] == 1
+    reasons.fail(redirect & (np.any(moves[:, 3] != moves[:, 4], axis=1) | np.any(-moves[:, player] != moves[:, 3], axis=1)),
+                 Reason.BOARD_NOT_UPDATED)
+    reasons.fail(redirect & (~np.any(redirected, axis=1) | np.any(redirected & ~hand, axis=1)), Reason.CARD_NOT_IN_HAND)
+    reasons.fail(redirect & (new_left > opponent), Reason.ATTACKER_SHORT)
+    reasons.fail(redirect & np.any(redirected & ~legal2add, axis=1), Reason.WRONG_RANK)
+
+    # Defence of exactly one card
+    defence = ~redirecting & (new_left + 1 == left) & (np.sum(moves[:, 4], axis=1) == 1)
+    reasons.fail(~redirecting & ~defence, Reason.UNKNOWN_SEQUENCE)
+    targets = moves[:, 3] == -1
+    defending = moves[:, 4]
+    reasons.fail(defence & ((np.sum(targets, axis=1) != 1) | np.any((moves[:, 3] != 0) & ~state[3], axis=1)),
+                 Reason.TARGET_NOT_LEFT)
+    reasons.fail(defence & np.any(-moves[:, player] != defending, axis=1), Reason.CARD_NOT_PLACED)
+    reasons.fail(defence & np.any((defending != 0) & ~hand, axis=1), Reason.CARD_NOT_IN_HAND)
+    target = np.argmax(targets, axis=1)
+    card = np.argmax(defending == 1, axis=1)
+    beats = BEATS[target, card]
+    same_suit = target // 8 == card // 8
+    reasons.fail(defence & ~beats & same_suit, Reason.TOO_LOW)
+    reasons.fail(defence & ~beats & ~same_suit, Reason.DOES_NOT_BEAT)
+
+    valid = reasons.valid()
+    return valid, valid & redirecting, valid & defence & (new_left == 0), reasons.codes
+
+
+def check_throw_ins(game, moves, player):
+    """
+    Game.check_wurf for every candidate
+
+    Returns:
+        valid: ndarray(M,) bool
+        reasons: ndarray(M,) int8 Reason
+    """
+    state = game.state
+    moves = np.asarray(moves)
+    added = moves[:, 3]
+    reasons = _Reasons(len(moves))
+    reasons.fail(np.any(added != -moves[:, player], axis=1), Reason.MALFORMED)
+    reasons.fail(np.any((added != 0) & ~state[player], axis=1), Reason.CARD_NOT_IN_HAND)
+    left_after = (state[3] + added) != 0
+    reasons.fail(np.any(left_after & ~RANKS_TO_CARDS[game.board_ranks], axis=1), Reason.RANK_NOT_ON_BOARD)
+    return reasons.valid(), reasons.codes
+
+
+if __name__ == "__main__":
+    import time
+
+    from backend.game import Game
+    from backend.moves import DEFEND_OFFSET, FLASH_OFFSET, Action
+
+    game = Game(seed=1)
+    game.make_move(Action.from_index(np.flatnonzero(game.legal_action_mask(0 if game.state[5, 8] else 1))[0]))
+    player = 0 if game.state[5, 8] else 1
+    # Every defence and redirect action of the defender
+    moves = np.array([Action.from_index(index).to_matrix(player) for index in range(DEFEND_OFFSET, FLASH_OFFSET)])
+    start = time.perf_counter()
+    for move in moves:
+        Game.from_state(game.state.copy(), game.deck)._defend(move, player)
+    scalar = time.perf_counter() - start
+    start = time.perf_counter()
+    check_defences(game, moves, player)
+    batch = time.perf_counter() - start
+    print(f"{len(moves)} candidate defences: scalar {scalar * 1e3:.1f} ms, batch {batch * 1e3:.1f} ms")
@@ -0,0 +1,145 @@
+from collections import OrderedDict
+from enum import IntEnum
+from typing import Any, NamedTuple, Optional
+
+import numpy as np
+
+
+# One random key per cell of the flattened (6, 32) state and one per deck length (0-32),
+# fixed so hashes are comparable between processes and runs
+_keys = np.random.default_rng(0x5EED_D0AC).integers(0, 2**64, size=6 * 32 + 33, dtype=np.uint64)
+CELL_KEYS = _keys[:6 * 32]
+DECK_KEYS = _keys[6 * 32:]
+
+
+def zobrist_hash(state, deck_size):
+    """
+    Full Zobrist hash of a position
+
+    Params:
+        state: ndarray(6,32) bool
+        deck_size: number of cards left to draw
+    Returns:
+        key: int below 2**64
+    """
+    cells = CELL_KEYS[np.flatnonzero(state)]
+    return int(np.bitwise_xor.reduce(cells)) ^ int(DECK_KEYS[deck_size])
+
+
+def flip_hash(flips):
+    """
+    Hash difference of toggling the flat state cells in flips, as recorded by Game.make_move
+    """
+    if not flips:
+        return 0
+    return int(np.bitwise_xor.reduce(CELL_KEYS[flips]))
+
+
+class Bound(IntEnum):
+    EXACT = 0
+    LOWER = 1  # Value is at least the stored value (search failed high)
+    UPPER = 2  # Value is at most the stored value (search failed low)
+
+
+class Entry(NamedTuple):
+    key: int
+    value: Any
+    depth: int
+    best_move: Any = None
+    bound: Bound = Bound.EXACT
+
+
+class TranspositionTable:
+    """
+    Bounded map from Zobrist keys to search results
+
+    Eviction policies:
+    depth | Fixed slots indexed by key % capacity, a colliding store only replaces an entry searched to at most the same depth
+    lru   | Any key fits until capacity is reached, then the least recently used entry is evicted
+    """
+
+    def __init__(self, capacity=1 << 20, policy="depth"):
+        assert policy in ("depth", "lru"), "Policy must be depth or lru"
+        self.capacity = capacity
+        self.policy = policy
+        if policy == "depth":
+            self.slots = [None] * capacity
+        else:
+            self.entries = OrderedDict()
+        self.size = 0
+        self.probes = 0
+        self.hits = 0
+        self.stores = 0
+        self.evictions = 0
+        self.rejected = 0
+
+    def get(self, key) -> Optional[Entry]:
+        self.probes += 1
+        if self.policy == "depth":
+            entry = self.slots[key % self.capacity]
+            if entry is None or entry.key != key:
+                return None
+        else:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            self.entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def store(self, key, value, depth=0, best_move=None, bound=Bound.EXACT):
+        """
+        Stores a search result, returns False if the depth policy kept the existing entry
+        """
+        entry = Entry(key, value, depth, best_move, bound)
+        if self.policy == "depth":
+            slot = key % self.capacity
+            old = self.slots[slot]
+            if old is None:
+                self.size += 1
+            elif old.key != key:
+                if old.depth > depth:
+                    self.rejected += 1
+                    return False
+                self.evictions += 1
+            self.slots[slot] = entry
+        else:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+            else:
+                if self.size == self.capacity:
+                    self.entries.popitem(last=False)
+                    self.evictions += 1
+                else:
+                    self.size += 1
+            self.entries[key] = entry
+        self.stores += 1
+        return True
+
+    def __len__(self):
+        return self.size
+
+    def __contains__(self, key):
+        if self.policy == "depth":
+            entry = self.slots[key % self.capacity]
+            return entry is not None and entry.key == key
+        return key in self.entries
+
+    def clear(self):
+        self.__init__(self.capacity, self.policy)
+
+    @property
+    def hit_rate(self):
+        return self.hits / self.probes if self.probes else 0.0
+
+    def stats(self):
+        return {
+            "size": self.size,
+            "capacity": self.capacity,
+            "probes": self.probes,
+            "hits": self.hits,
+            "hit_rate": self.hit_rate,
+            "stores": self.stores,
+            "evictions": self.evictions,
+            "rejected": self.rejected,
+        }
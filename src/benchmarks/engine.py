@@ -0,0 +1,278 @@
+import argparse
+import itertools
+import json
+import pickle
+import platform
+import sys
+import time
+
+import numpy as np
+
+from backend.bitstate import BitState
+from backend.game import Game
+from backend.kernel import random_playouts
+from backend.moves import Action, MoveKind, legal_action_mask
+from frontend.board_visualiser import BoardVisualiser
+from frontend.card_visualiser import CardVisualiser
+from frontend.constants import MoveType
+from frontend.input import Move
+from frontend.state_wrapper import State
+
+SEED = 47
+
+
+def measure(call, reset=None, number=2000, repeat=5):
+    """
+    Median time of one call in microseconds over repeat runs of number calls.
+
+    Parameters:
+        call (Callable): The code under test.
+        reset (Optional[Callable]): Restores the position after call, its own cost is measured separately and subtracted.
+        number (int): Calls per run.
+        repeat (int): Runs, the median is reported.
+
+    Returns:
+        float: Microseconds per call.
+    """
+    def run(body):
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter_ns()
+            for _ in range(number):
+                body()
+            times.append((time.perf_counter_ns() - start) / number / 1000)
+        return float(np.median(times))
+
+    if reset is None:
+        return run(call)
+
+    def both():
+        call()
+        reset()
+
+    return max(run(both) - run(reset), 0.0)
+
+
+def find_position(predicate, seed=SEED, games=200):
+    """
+    First position of seeded random games that satisfies predicate(game, player).
+    """
+    rng = np.random.default_rng(seed)
+    for game_seed in range(games):
+        game = Game(seed=game_seed)
+        while not game.state[5, 11]:
+            player = 0 if game.state[5, 8] else 1
+            if predicate(game, player):
+                return game, player
+            legal = np.flatnonzero(legal_action_mask(game.state, player))
+            game.make_move(Action.from_index(legal[rng.integers(len(legal))]))
+    raise RuntimeError("No position found")
+
+
+def first_move(game, player, kind):
+    return next(action for action in game.legal_moves(player) if action.kind == kind)
+
+
+def weakest_attack(game, player):
+    """
+    Single card attack with the lowest card, so the defender can usually beat it.
+    """
+    attacks = [action for action in game.legal_moves(player) if action.kind == MoveKind.ATTACK and len(action.cards) == 1]
+    return max(attacks, key=lambda action: action.cards[0] % 8 + 8 * (action.cards[0] >= 8))
+
+
+def validator_benchmarks():
+    results = {}
+
+    def restorer(game):
+        state, deck, board_ranks = game.state.copy(), game.deck, game.board_ranks
+
+        def reset():
+            game.state[...] = state
+            game.deck = deck
+            game.board_ranks = board_ranks
+        return reset
+
+    # Empty board, the opening attack
+    game = Game(seed=SEED)
+    player = 1
+    move = weakest_attack(game, player).to_matrix(player)
+    results["attack_empty"] = measure(lambda: game._attack(move, player), restorer(game))
+
+    # One card to defend
+    game.make_move(weakest_attack(game, player))
+    defend = first_move(game, 0, MoveKind.DEFEND).to_matrix(0)
+    results["defend_empty"] = measure(lambda: game._defend(defend, 0), restorer(game))
+
+    # Busy boards from random play
+    busy, player = find_position(lambda g, p: g.state[4].sum() >= 6 and g.state[3].any() and (p == 0) != g.state[5, 9]
+                                 and any(a.kind == MoveKind.DEFEND for a in g.legal_moves(p)))
+    defend = first_move(busy, player, MoveKind.DEFEND).to_matrix(player)
+    results["defend_busy"] = measure(lambda: busy._defend(defend, player), restorer(busy))
+
+    busy, player = find_position(lambda g, p: g.state[4].sum() >= 6 and (p == 0) == g.state[5, 9]
+                                 and any(a.kind == MoveKind.THROW_IN for a in g.legal_moves(p)))
+    throw_in = first_move(busy, player, MoveKind.THROW_IN).to_matrix(player)
+    results["attack_busy"] = measure(lambda: busy._attack(throw_in, player), restorer(busy))
+    results["check_wurf_busy"] = measure(lambda: busy.check_wurf(throw_in, player))
+
+    game = Game(seed=SEED)
+    game.make_move(weakest_attack(game, 1))
+    game.make_move(first_move(game, 0, MoveKind.DEFEND))
+    throw_in = game.legal_moves(1)
+    throw_in = [a for a in throw_in if a.kind == MoveKind.THROW_IN]
+    if throw_in:
+        matrix = throw_in[0].to_matrix(1)
+        results["check_wurf_empty"] = measure(lambda: game.check_wurf(matrix, 1))
+
+    # Drawing after a bout where both players played cards
+    drawing, _ = find_position(lambda g, p: len(g.deck) >= 8 and g.state[0].sum() <= 4 and g.state[1].sum() <= 4)
+    attacker = 0 if drawing.state[5, 9] else 1
+    results["drawto6"] = measure(lambda: drawing.drawto6(attacker), restorer(drawing))
+
+    results["game_init"] = measure(lambda: Game(seed=SEED))
+    results["game_reset"] = measure(lambda: game.reset(SEED))
+
+    game = Game(seed=SEED)
+    results["legal_action_mask"] = measure(lambda: legal_action_mask(game.state, 1))
+    action = first_move(game, 1, MoveKind.ATTACK)
+
+    def make_unmake():
+        game.make_move(action)
+        game.unmake_move()
+    results["make_unmake_move"] = measure(make_unmake)
+
+    return results
+
+
+def frontend_benchmarks():
+    results = {}
+    game = Game(seed=SEED)
+    move = Move(MoveType.ATTACK, first_move(game, 1, MoveKind.ATTACK).to_matrix(1))
+    state = State(game.state)
+
+    def reset():
+        state.state_matrix = game.state
+    results["state_apply_move"] = measure(lambda: state.apply_move(move), reset)
+
+    card_visualiser = CardVisualiser(0)
+    hand = game.state[0]
+    results["convert_cards_to_strings"] = measure(lambda: card_visualiser.convert_cards_to_strings(hand))
+
+    # Spectating a game, every frame is the next position
+    frames = []
+    rng = np.random.default_rng(SEED)
+    game = Game(seed=SEED)
+    while not game.state[5, 11]:
+        frames.append(game.state.copy())
+        legal = np.flatnonzero(legal_action_mask(game.state, 0 if game.state[5, 8] else 1))
+        game.make_move(Action.from_index(legal[rng.integers(len(legal))]))
+    board_visualiser = BoardVisualiser(frames[0], 0)
+    frame_cycle = itertools.cycle(frames)
+
+    def next_frame():
+        board_visualiser.set_state_matrix(next(frame_cycle))
+        board_visualiser.visualise_board()
+    results["visualise_board_frame"] = measure(next_frame, number=500)
+    return results
+
+
+def throughput(games=200, seed=SEED):
+    """
+    Full random games per second through legal_action_mask and make_move.
+    """
+    rng = np.random.default_rng(seed)
+    plies = 0
+    start = time.perf_counter()
+    for game_seed in range(games):
+        game = Game(seed=game_seed)
+        while not game.state[5, 11]:
+            player = 0 if game.state[5, 8] else 1
+            legal = np.flatnonzero(legal_action_mask(game.state, player))
+            game.make_move(Action.from_index(legal[rng.integers(len(legal))]))
+            plies += 1
+    elapsed = time.perf_counter() - start
+    return {"games_per_s": games / elapsed, "plies_per_s": plies / elapsed}
+
+
+def kernel_throughput(games=200, seed=SEED):
+    """
+    Full random games per second through the bitboard kernel, compiled if Numba is installed.
+    """
+    game = Game(seed=seed)
+    random_playouts(game, 1, compiled=True) # Compiles the kernel
+    start = time.perf_counter()
+    _, plies = random_playouts(game, games, seed, compiled=True)
+    elapsed = time.perf_counter() - start
+    return {"kernel_games_per_s": games / elapsed, "kernel_plies_per_s": int(plies.sum()) / elapsed}
+
+
+def memory():
+    game = Game(seed=SEED)
+    return {
+        "state_bytes": game.state.nbytes,
+        "state_pickle_bytes": len(pickle.dumps(game.state)),
+        "bitstate_bytes": BitState.from_matrix(game.state).words.nbytes,
+    }
+
+
+def run(games=200):
+    """
+    Runs every benchmark, every result is {"value", "unit", "better"} keyed by name.
+    """
+    results = {}
+    for name, value in {**validator_benchmarks(), **frontend_benchmarks()}.items():
+        results[name] = {"value": value, "unit": "us", "better": "lower"}
+    for name, value in {**throughput(games), **kernel_throughput(games)}.items():
+        # games or plies per second, the kernel_ prefix names the engine and not the unit
+        results[name] = {"value": value, "unit": name.split("_per_")[0].split("_")[-1] + "/s", "better": "higher"}
+    for name, value in memory().items():
+        results[name] = {"value": value, "unit": "bytes", "better": "lower"}
+    return results
+
+
+def compare(results, baseline, threshold):
+    """
+    Lists the benchmarks that got worse than baseline by more than threshold (a fraction).
+    """
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        old, new = baseline[name]["value"], result["value"]
+        if result["better"] == "lower":
+            change = (new - old) / old if old else 0.0
+        else:
+            change = (old - new) / old if old else 0.0
+        if change > threshold:
+            regressions.append((name, old, new, change))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the rules engine hot paths")
+    parser.add_argument("-o", "--out", default="bench_results.json", help="where to save the results")
+    parser.add_argument("-b", "--baseline", help="results of an earlier run to compare against")
+    parser.add_argument("-t", "--threshold", type=float, default=0.2, help="allowed slowdown as a fraction, 0.2 is 20%%")
+    parser.add_argument("-g", "--games", type=int, default=200, help="random games for the throughput benchmark")
+    args = parser.parse_args()
+
+    results = run(args.games)
+    with open(args.out, "w") as f:
+        json.dump({"python": platform.python_version(), "numpy": np.__version__, "results": results}, f, indent=2)
+
+    for name, result in results.items():
+        print(f"{name:<28}{result['value']:>14.2f} {result['unit']}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.threshold)
+        for name, old, new, change in regressions:
+            print(f"REGRESSION {name}: {old:.2f} -> {new:.2f} ({change:+.0%})")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
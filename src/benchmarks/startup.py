@@ -0,0 +1,87 @@
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+import sys
+
+from benchmarks.engine import compare
+
+# Entry points of short lived processes, the headless ones must not load any frontend module
+HEADLESS = ["backend.game", "backend.env", "backend.kernel", "bots.random_player", "bots.ismcts", "tournament",
+            "server.game_server"]
+RENDERING = ["frontend.board_visualiser", "frontend.input"]
+
+# Runs in a fresh interpreter: imports the module and reports the time and the packages that were loaded
+PROBE = """
+import sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(elapsed, sum(name.split(".")[0] == "frontend" for name in sys.modules))
+"""
+
+
+def measure_import(module, repeat=7):
+    """
+    Median seconds to import module in a new interpreter, after the interpreter itself started,
+    and the number of frontend modules it loaded.
+    """
+    times = []
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, "-c", PROBE.format(module=module)], capture_output=True, text=True, check=True).stdout
+        elapsed, frontend = output.split()
+        times.append(float(elapsed))
+    return statistics.median(times), int(frontend)
+
+
+def run(repeat=7):
+    """
+    Runs every startup benchmark, every result is {"value", "unit", "better"} keyed by name.
+
+    Returns:
+        results: dict
+        leaks: names of the headless modules that imported frontend code
+    """
+    results = {}
+    leaks = []
+    for module in HEADLESS + RENDERING:
+        elapsed, frontend = measure_import(module, repeat)
+        results[f"import_{module}"] = {"value": elapsed * 1000, "unit": "ms", "better": "lower"}
+        if module in HEADLESS and frontend:
+            leaks.append(module)
+    return results, leaks
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the import time of the entry points")
+    parser.add_argument("-o", "--out", default="startup_results.json", help="where to save the results")
+    parser.add_argument("-b", "--baseline", help="results of an earlier run to compare against")
+    parser.add_argument("-t", "--threshold", type=float, default=0.2, help="allowed slowdown as a fraction, 0.2 is 20%%")
+    parser.add_argument("-r", "--repeat", type=int, default=7, help="fresh interpreters per module, the median is kept")
+    args = parser.parse_args()
+
+    results, leaks = run(args.repeat)
+    with open(args.out, "w") as f:
+        json.dump({"python": platform.python_version(), "results": results}, f, indent=2)
+
+    for name, result in results.items():
+        print(f"{name:<36}{result['value']:>10.1f} {result['unit']}")
+
+    failed = False
+    for module in leaks:
+        print(f"FRONTEND IMPORTED by headless {module}")
+        failed = True
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.threshold)
+        for name, old, new, change in regressions:
+            print(f"REGRESSION {name}: {old:.2f} -> {new:.2f} ({change:+.0%})")
+        failed = failed or bool(regressions)
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
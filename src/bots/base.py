@@ -0,0 +1,40 @@
+import numpy as np
+
+from backend.constants import MoveType
+from backend.moves import Action, Move
+
+
+class Bot:
+    def __init__(self, player_id: int, trump: int):
+        """
+        Base class of computer players, they share the interface of frontend.input.Player.
+
+        Subclasses implement get_action, get_attack and get_defence wrap its result into a Move.
+
+        Parameters:
+            player_id (int): 0 or 1.
+            trump (int): The trump suit.
+        """
+        assert type(player_id) == int, "Player ID must be an integer"
+        assert player_id in {0, 1}, "Player ID must be 0 or 1"
+
+        self.player_id = player_id
+        self.trump = trump
+
+    def get_player_id(self) -> int:
+        return self.player_id
+
+    def get_action(self, state_matrix: np.ndarray) -> Action:
+        raise NotImplementedError
+
+    def get_attack(self, state_matrix: np.ndarray) -> Move:
+        return Move(MoveType.ATTACK, self.get_action(state_matrix).to_matrix(self.player_id))
+
+    def get_defence(self, state_matrix: np.ndarray) -> Move:
+        return Move(MoveType.DEFEND, self.get_action(state_matrix).to_matrix(self.player_id))
+
+    def close(self):
+        """
+        Releases any worker processes the bot holds.
+        """
+        pass
@@ -0,0 +1,180 @@
+import numpy as np
+
+from backend.bitstate import pack
+from backend.game import Game
+from backend.kernel import legal_actions
+from backend.moves import ACTION_SIZE, DEFEND_OFFSET, FLASH_OFFSET, PICKUP_INDEX, REDIRECT_OFFSET, THROW_IN_OFFSET, Action
+from bots.base import Bot
+
+# Strength of every card, 0 for a plain Seven up to 15 for the trump Ace (suit 0 is trump, rank 0 is the Ace)
+CARD_STRENGTH = np.array([(7 - card % 8) + 8 * (card < 8) for card in range(32)], dtype=np.float32)
+IS_TRUMP = np.arange(32) < 8
+
+# Worth of holding a card: strong cards are worth keeping, every card costs SIZE_COST as the aim is to get rid of them
+SIZE_COST = 0.5
+CARD_WORTH = (CARD_STRENGTH - 7.5) / 7.5 - SIZE_COST
+# Extra worth of every further card of a rank already held, they go out together in one attack
+PAIR_BONUS = 0.25
+
+# ACTION_CARDS[index] are the cards the action moves out of the hand, nothing for FLASH, PICKUP and PASS
+ACTION_CARDS = np.zeros((ACTION_SIZE, 32), dtype=bool)
+for _index in range(PICKUP_INDEX):
+    if not FLASH_OFFSET <= _index < PICKUP_INDEX:
+        ACTION_CARDS[_index, list(Action.from_index(_index).cards)] = True
+ACTION_TRUMPS = (ACTION_CARDS & IS_TRUMP).any(axis=1)
+
+IS_THROW_IN = (np.arange(ACTION_SIZE) >= THROW_IN_OFFSET) & (np.arange(ACTION_SIZE) < DEFEND_OFFSET)
+IS_DEFENCE = (np.arange(ACTION_SIZE) >= DEFEND_OFFSET) & (np.arange(ACTION_SIZE) < REDIRECT_OFFSET)
+
+
+def evaluate_hands(hands: np.ndarray) -> np.ndarray:
+    """
+    Heuristic worth of hands, the higher the better for the holder.
+
+    Sums CARD_WORTH over the cards and adds PAIR_BONUS for every card of a rank beyond the first,
+    so shedding weak cards raises the worth and picking up or spending trumps lowers it.
+
+    Parameters:
+        hands (np.ndarray): (..., 32) bool card rows, e.g. the hands after each candidate move.
+
+    Returns:
+        np.ndarray: (...) float32 worths.
+    """
+    hands = np.asarray(hands, dtype=bool)
+    per_rank = hands.reshape(hands.shape[:-1] + (4, 8)).sum(axis=-2)
+    return hands @ CARD_WORTH + PAIR_BONUS * np.maximum(per_rank - 1, 0).sum(axis=-1)
+
+
+def hands_after(state: np.ndarray, player: int, legal: np.ndarray) -> np.ndarray:
+    """
+    player's hand after each of the legal actions, a pickup takes the cards on the board.
+
+    Returns:
+        np.ndarray: (len(legal), 32) bool.
+    """
+    hands = state[player] & ~ACTION_CARDS[legal]
+    hands[legal == PICKUP_INDEX] |= state[4]
+    return hands
+
+
+class HeuristicBot(Bot):
+    """
+    Rule based player, every decision scores the hand left after each legal move with evaluate_hands
+    and plays the best. Subclasses add their style in adjust. The legal moves come from the bitboard
+    kernel (backend.kernel) and there is no lookahead, so a decision takes tens of microseconds and
+    policy() can drive the playouts of bots.ismcts.
+    """
+
+    def __init__(self, player_id: int, trump: int, seed=None):
+        super().__init__(player_id, trump)
+
+    @classmethod
+    def choose(cls, state: np.ndarray, player: int) -> int:
+        """
+        Index of the chosen action, ties go to the lowest index.
+        """
+        assert bool(state[5, 8]) == (player == 0) and not state[5, 11], "It is not this player's turn"
+        # A buffer per call, bots are called from several threads at once (server.game_server)
+        legal = np.empty(ACTION_SIZE, dtype=np.int64)
+        legal = legal[:legal_actions(pack(state).astype(np.int64), legal)]
+        assert len(legal) > 0, "The player has no legal move"
+        if len(legal) == 1:
+            return int(legal[0])
+        scores = evaluate_hands(hands_after(state, player, legal))
+        return int(legal[np.argmax(cls.adjust(state, player, legal, scores))])
+
+    @classmethod
+    def adjust(cls, state: np.ndarray, player: int, legal: np.ndarray, scores: np.ndarray) -> np.ndarray:
+        return scores
+
+    @classmethod
+    def policy(cls, game: Game, player: int, rng: np.random.Generator) -> Action:
+        """
+        Playout policy (game, player, rng) -> Action for bots.ismcts, rng is not used.
+        """
+        return Action.from_index(cls.choose(game.state, player))
+
+    def get_action(self, state_matrix: np.ndarray) -> Action:
+        return Action.from_index(self.choose(state_matrix, self.player_id))
+
+
+class LowestCardBot(HeuristicBot):
+    """
+    Attacks with its lowest non-trump cards first and only throws in cards that are cheaper to lose than
+    to keep, trumps are played like any other card when they are the cheapest answer.
+    """
+
+    TRUMP_COST = 1.0
+
+    @classmethod
+    def adjust(cls, state, player, legal, scores):
+        return scores - cls.TRUMP_COST * ACTION_TRUMPS[legal] * ~IS_DEFENCE[legal]
+
+
+class TrumpSaverBot(HeuristicBot):
+    """
+    Beats with the cheapest card that does it and uses a trump only when it is forced to, i.e. when
+    picking up would leave a worse hand than spending the trump. Never gives trumps away while attacking.
+    """
+
+    TRUMP_COST = 2.0
+
+    @classmethod
+    def adjust(cls, state, player, legal, scores):
+        # Spending trumps gets dearer the more cards are left to draw, with an empty deck it is free
+        weight = cls.TRUMP_COST * np.count_nonzero(state[2]) / 20
+        return scores - weight * ACTION_TRUMPS[legal] - cls.TRUMP_COST * ACTION_TRUMPS[legal] * ~IS_DEFENCE[legal]
+
+
+class OverloadBot(HeuristicBot):
+    """
+    Throws in every card it can spare while the defender struggles, most of all once the defender is
+    picking up, so the defender is loaded with as many cards as possible.
+    """
+
+    THROW_IN_BONUS = 1.0
+    PICKUP_BONUS = 2.0
+
+    @classmethod
+    def adjust(cls, state, player, legal, scores):
+        bonus = cls.PICKUP_BONUS if state[5, 10] else cls.THROW_IN_BONUS
+        return scores + bonus * (IS_THROW_IN[legal] & ~ACTION_TRUMPS[legal])
+
+
+# Playout policies for bots.ismcts by name
+POLICIES = {
+    "lowest": LowestCardBot.policy,
+    "trumpsaver": TrumpSaverBot.policy,
+    "overload": OverloadBot.policy,
+}
+
+
+if __name__ == "__main__":
+    import itertools
+    import time
+
+    from bots.random_player import RandomPlayer
+
+    bots = {"random": RandomPlayer, "lowest": LowestCardBot, "trumpsaver": TrumpSaverBot, "overload": OverloadBot}
+    games = 100
+    for first, second in itertools.combinations(bots, 2):
+        wins = 0
+        decisions = 0
+        elapsed = 0.0
+        for index in range(games):
+            seats = [bots[first], bots[second]] if index % 2 == 0 else [bots[second], bots[first]]
+            players = [seats[player](player, 0, seed=index) for player in (0, 1)]
+            game = Game(seed=index)
+            plies = 0
+            while not game.state[5, 11] and plies < 1000:
+                player = 0 if game.state[5, 8] else 1
+                start = time.perf_counter()
+                action = players[player].get_action(game.state)
+                elapsed += time.perf_counter() - start
+                decisions += 1
+                game.make_move(action)
+                plies += 1
+            if game.state[5, 11]:
+                winner = 0 if game.state[5, 12] else 1
+                wins += (winner == 0) == (index % 2 == 0)
+        print(f"{first:>10} vs {second:<10} {wins:3d}/{games} won, {elapsed / decisions * 1e6:6.1f} us per decision")
@@ -0,0 +1,245 @@
+import math
+import multiprocessing
+import time
+from typing import Callable, Dict, Optional, Union
+
+import numpy as np
+
+from backend.game import Game
+from backend.moves import Action, MoveKind, legal_action_mask, random_policy
+from backend.solver import EndgameSolver
+from bots.base import Bot
+from bots.heuristic import POLICIES
+
+MAX_PLAYOUT_PLIES = 1000
+
+
+def determinize(state_matrix: np.ndarray, player_id: int, rng: np.random.Generator) -> Game:
+    """
+    Samples a full game consistent with what player_id can see.
+
+    The opponent's hand and the deck are dealt at random from the unseen cards, which are the
+    unplayed cards (row 2) plus the opponent's hand. The coser stays at the bottom of the deck.
+
+    Parameters:
+        state_matrix (np.ndarray): The (6, 32) state as seen by the game, the opponent's hand is ignored.
+        player_id (int): The observing player.
+        rng (np.random.Generator): Source of randomness.
+
+    Returns:
+        Game: A game with the sampled opponent hand and deck.
+    """
+    opponent = 1 - player_id
+    state = state_matrix.copy()
+
+    coser = int(np.flatnonzero(state[5, :8])[0])
+    coser_in_deck = bool(state[2, coser])
+    unseen = state[2] | state[opponent]
+    unseen[coser] &= not coser_in_deck
+    pool = rng.permutation(np.flatnonzero(unseen))
+
+    n_opponent = int(np.count_nonzero(state[opponent]))
+    deck = pool[n_opponent:]
+    if coser_in_deck:
+        deck = np.append(deck, coser)
+
+    state[opponent] = False
+    state[2] = False
+    state[opponent, pool[:n_opponent]] = True
+    state[2, deck] = True
+    return Game.from_state(state, deck)
+
+
+def playout(game: Game, rng: np.random.Generator, policy: Callable = random_policy) -> Optional[int]:
+    """
+    Plays game to the end in place.
+
+    Returns:
+        Optional[int]: The winner, None if the game did not finish within MAX_PLAYOUT_PLIES.
+    """
+    for _ in range(MAX_PLAYOUT_PLIES):
+        if game.state[5, 11]:
+            return 0 if game.state[5, 12] else 1
+        player = 0 if game.state[5, 8] else 1
+        game.make_move(policy(game, player, rng))
+    return None
+
+
+# Playout policies that can be named instead of passed, e.g. "ismcts:policy=lowest" in a tournament spec
+PLAYOUT_POLICIES = {"random": random_policy, **POLICIES}
+
+
+class Node:
+    __slots__ = ("parent", "action", "player", "children", "visits", "wins", "available")
+
+    def __init__(self, parent: Optional["Node"] = None, action: Optional[int] = None, player: Optional[int] = None):
+        self.parent = parent
+        self.action = action  # Action index that leads here
+        self.player = player  # Player that played it
+        self.children: Dict[int, Node] = {}
+        self.visits = 0
+        self.wins = 0.0
+        self.available = 0
+
+    def select(self, legal: np.ndarray, exploration: float) -> "Node":
+        """
+        UCB1 over the children legal in the current determinization, weighted by how often each was available.
+        """
+        best, best_score = None, -math.inf
+        for index in legal:
+            child = self.children[index]
+            child.available += 1
+            score = child.wins / child.visits + exploration * math.sqrt(math.log(child.available) / child.visits)
+            if score > best_score:
+                best, best_score = child, score
+        return best
+
+
+def search(state_matrix: np.ndarray, player_id: int, iterations: Optional[int] = None, time_limit: Optional[float] = None,
+           exploration: float = 0.7, seed=None, policy: Callable = random_policy) -> Dict[int, int]:
+    """
+    Single observer ISMCTS from the point of view of player_id.
+
+    Every iteration samples a determinization, descends the shared tree restricted to the moves legal in it,
+    expands one untried move and finishes the game with the playout policy.
+
+    Parameters:
+        state_matrix (np.ndarray): The (6, 32) state, it must be player_id's turn.
+        player_id (int): The searching player.
+        iterations (Optional[int]): Number of iterations to run.
+        time_limit (Optional[float]): Seconds to search for, the search stops at whichever budget runs out first.
+        exploration (float): UCB1 exploration constant.
+        seed: Seed for numpy.random.default_rng.
+        policy (Callable): Playout policy (game, player, rng) -> Action.
+
+    Returns:
+        Dict[int, int]: Visit count of every root action index.
+    """
+    assert iterations is not None or time_limit is not None, "Either iterations or time_limit must be set"
+    rng = np.random.default_rng(seed)
+    root = Node()
+    deadline = None if time_limit is None else time.perf_counter() + time_limit
+    done = 0
+
+    while (iterations is None or done < iterations) and (deadline is None or time.perf_counter() < deadline):
+        done += 1
+        game = determinize(state_matrix, player_id, rng)
+        node = root
+
+        # Selection, as long as every legal move of this determinization has been tried
+        while not game.state[5, 11]:
+            player = 0 if game.state[5, 8] else 1
+            legal = np.flatnonzero(legal_action_mask(game.state, player)).tolist()
+            untried = [index for index in legal if index not in node.children]
+            if untried:
+                # Expansion
+                index = untried[rng.integers(len(untried))]
+                for other in legal:
+                    if other in node.children:
+                        node.children[other].available += 1
+                child = Node(node, index, player)
+                child.available = 1
+                node.children[index] = child
+                node = child
+                game.make_move(Action.from_index(index))
+                break
+            node = node.select(legal, exploration)
+            game.make_move(Action.from_index(node.action))
+
+        winner = playout(game, rng, policy)
+
+        # Backpropagation, a draw by running out of plies counts half
+        while node is not root:
+            node.visits += 1
+            node.wins += 0.5 if winner is None else float(winner == node.player)
+            node = node.parent
+        root.visits += 1
+
+    return {index: child.visits for index, child in root.children.items()}
+
+
+def _search_worker(args) -> Dict[int, int]:
+    return search(*args)
+
+
+class ISMCTSPlayer(Bot):
+    def __init__(self, player_id: int, trump: int, iterations: Optional[int] = 1000, time_limit: Optional[float] = None,
+                 processes: int = 1, exploration: float = 0.7, seed=None, policy: Union[str, Callable] = random_policy,
+                 endgame_time: Optional[float] = None):
+        """
+        Information set MCTS opponent with the interface of frontend.input.Player.
+
+        Parameters:
+            player_id (int): 0 or 1.
+            trump (int): The trump suit, kept for parity with Player.
+            iterations (Optional[int]): Iterations per decision, split over all processes.
+            time_limit (Optional[float]): Seconds per decision.
+            processes (int): Number of worker processes, each searches its own tree and root visits are summed.
+            exploration (float): UCB1 exploration constant.
+            seed: Seed or numpy.random.SeedSequence, every search gets its own child seed.
+            policy (Union[str, Callable]): Playout policy (game, player, rng) -> Action, or its name in PLAYOUT_POLICIES.
+            endgame_time (Optional[float]): Once the deck is empty the position is first given to the exact
+                backend.solver for this many seconds, the search only runs if it is not decided in time.
+        """
+        super().__init__(player_id, trump)
+        assert iterations is not None or time_limit is not None, "Either iterations or time_limit must be set"
+
+        self.iterations = iterations
+        self.time_limit = time_limit
+        self.processes = processes
+        self.exploration = exploration
+        self.policy = PLAYOUT_POLICIES[policy] if isinstance(policy, str) else policy
+        self.seed_sequence = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+        self.pool = None
+        self.endgame_time = endgame_time
+        self.solver = EndgameSolver() if endgame_time is not None else None
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
+
+    def get_action(self, state_matrix: np.ndarray) -> Action:
+        """
+        Searches the position and returns the most visited move.
+        """
+        legal = np.flatnonzero(legal_action_mask(state_matrix, self.player_id))
+        assert len(legal) > 0, "It is not this player's turn"
+        if len(legal) == 1:
+            return Action.from_index(legal[0])
+
+        if self.solver is not None and not state_matrix[2].any():
+            # Nothing left to draw, so the unseen cards are exactly the opponent's hand
+            game = Game.from_state(state_matrix.copy(), np.zeros(0, dtype=int))
+            result = self.solver.solve(game, self.endgame_time)
+            if result.winner is not None:
+                return result.best_move
+
+        seeds = self.seed_sequence.spawn(self.processes)
+        iterations = None if self.iterations is None else max(1, self.iterations // self.processes)
+        jobs = [(state_matrix, self.player_id, iterations, self.time_limit, self.exploration, seed, self.policy) for seed in seeds]
+
+        if self.processes == 1:
+            results = [_search_worker(jobs[0])]
+        else:
+            if self.pool is None:
+                self.pool = multiprocessing.Pool(self.processes)
+            results = self.pool.map(_search_worker, jobs)
+
+        visits: Dict[int, int] = {}
+        for result in results:
+            for index, count in result.items():
+                visits[index] = visits.get(index, 0) + count
+        return Action.from_index(max(visits, key=visits.get))
+
+
+if __name__ == "__main__":
+    game = Game()
+    bots = [ISMCTSPlayer(0, 0, iterations=100, seed=0), ISMCTSPlayer(1, 0, iterations=100, seed=1)]
+    while not game.state[5, 11]:
+        player = 0 if game.state[5, 8] else 1
+        action = bots[player].get_action(game.state)
+        print(f"Player {player}: {MoveKind(action.kind).name} {action.cards}")
+        game.make_move(action)
+    print(f"Player {0 if game.state[5, 12] else 1} won")
@@ -0,0 +1,17 @@
+import numpy as np
+
+from backend.moves import Action, legal_action_mask
+from bots.base import Bot
+
+
+class RandomPlayer(Bot):
+    def __init__(self, player_id: int, trump: int, seed=None):
+        """
+        Plays a uniformly random legal move, the baseline opponent.
+        """
+        super().__init__(player_id, trump)
+        self.rng = np.random.default_rng(seed)
+
+    def get_action(self, state_matrix: np.ndarray) -> Action:
+        legal = np.flatnonzero(legal_action_mask(state_matrix, self.player_id))
+        return Action.from_index(legal[self.rng.integers(len(legal))])
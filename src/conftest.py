@@ -0,0 +1 @@
+# Makes the packages in this directory (backend, bots, ...) importable from the tests
@@ -1,71 +1,100 @@
 from frontend.state_wrapper import State
-from frontend.card_visualiser import CardVisualiser
+from frontend.card_visualiser import get_card_visualiser
 from frontend.constants import RANKS, SUITS
 import numpy as np
 
 class BoardVisualiser:
     def __init__(self, state_matrix: np.ndarray, trump_suit: int):
-        state_wrapper = State(state_matrix)
-        self.state_wrapper = state_wrapper
-        self.card_visualiser = CardVisualiser(trump_suit)
+        self.card_visualiser = get_card_visualiser(trump_suit)
+        self.segments = {} # Segment name -> (bytes of the rows it was rendered from, rendered string)
+        self.board_key = None
+        self.board_str = ""
+        self.set_state_matrix(state_matrix)
 
-    # TODO: Add a set_state_matrix function 
+    def set_state_matrix(self, state_matrix: np.ndarray):
+        """
+        Points the visualiser at another state, e.g. the next position of a game.
+
+        The rendered segments are kept, on the next render only those whose rows differ are rendered again.
+        The matrix is read at render time, so a matrix that is changed in place (Game.state) is shown as it is then.
+
+        Parameters:
+            state_matrix (np.ndarray): The (6, 32) state to show.
+        """
+        self.state_wrapper = State(state_matrix)
 
     def __str__(self):
         return self.visualise_board()
-    
+
     def visualise_board(self) -> str:
-        p0_cards = self.card_visualiser.convert_cards_to_strings(self.state_wrapper.get_p0_cards())
-        p1_cards = self.card_visualiser.convert_cards_to_strings(self.state_wrapper.get_p1_cards())
-        unplayed_cards = self.card_visualiser.convert_cards_to_strings(self.state_wrapper.get_unplayed_cards())
-        left_to_defend_cards = self.card_visualiser.convert_cards_to_strings(self.state_wrapper.get_left_to_defend_cards())
-        cards_on_board = self.card_visualiser.convert_cards_to_strings(self.state_wrapper.get_cards_on_board())
-        
-        p0_cards_str = self._get_player_cards_str(p0_cards, 0)
-        p1_cards_str = self._get_player_cards_str(p1_cards, 1)
-        metadata_str = self._get_metadata_str(unplayed_cards)
-        left_to_defend_cards_str = self._get_left_to_defend_cards_str(left_to_defend_cards)
-        cards_on_board_str = self._get_cards_on_board_str(cards_on_board, left_to_defend_cards)
-        
-        #return f"{p0_cards_str}\n\n{p1_cards_str}\n\n{unplayed_cards_str}\n\n{left_to_defend_cards_str}\n\n{cards_on_board_str}"
-        return "\n\n".join([metadata_str, cards_on_board_str, left_to_defend_cards_str, p0_cards_str, p1_cards_str,])
-    
+        state_matrix = self.state_wrapper.get_state_matrix()
+        board_key = state_matrix.tobytes()
+        if board_key == self.board_key:
+            return self.board_str
+
+        metadata_str = self._get_segment("metadata", state_matrix[[2, 5]], lambda: self._get_metadata_str(
+            np.count_nonzero(self.state_wrapper.get_unplayed_cards())))
+        cards_on_board_str = self._get_segment("on_board", state_matrix[3:5], lambda: self._get_cards_on_board_str(
+            self.state_wrapper.get_cards_on_board(), self.state_wrapper.get_left_to_defend_cards()))
+        left_to_defend_cards_str = self._get_segment("left_to_defend", state_matrix[3], lambda: self._get_left_to_defend_cards_str(
+            self.card_visualiser.convert_cards_to_strings(self.state_wrapper.get_left_to_defend_cards())))
+        p0_cards_str = self._get_segment("p0", state_matrix[0], lambda: self._get_player_cards_str(
+            self.card_visualiser.convert_cards_to_strings(self.state_wrapper.get_p0_cards()), 0))
+        p1_cards_str = self._get_segment("p1", state_matrix[1], lambda: self._get_player_cards_str(
+            self.card_visualiser.convert_cards_to_strings(self.state_wrapper.get_p1_cards()), 1))
+
+        self.board_key = board_key
+        self.board_str = "\n\n".join([metadata_str, cards_on_board_str, left_to_defend_cards_str, p0_cards_str, p1_cards_str,])
+        return self.board_str
+
+    def _get_segment(self, name: str, rows: np.ndarray, render) -> str:
+        """
+        Returns the cached segment if the rows it depends on did not change since it was rendered, renders it otherwise.
+        """
+        key = rows.tobytes()
+        cached = self.segments.get(name)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        segment = render()
+        self.segments[name] = (key, segment)
+        return segment
+
     def _get_player_cards_str(self, player_cards: np.ndarray, player_id: int) -> str:
         player_str = f"Player {player_id} cards: "
         player_str += " ".join(player_cards)
-        
+
         return player_str
-    
-    def _get_metadata_str(self, unplayed_cards: np.ndarray) -> str:
+
+    def _get_metadata_str(self, n_unplayed_cards: int) -> str:
         if self.state_wrapper.get_is_over():
             unplayed_str = f"---> GAME OVER, no cards left to draw. Player {int(not self.state_wrapper.get_p0_won())} won! <---"
         else:
-            n_unplayed_cards = len(unplayed_cards)
             unplayed_str = f"Number of unplayed (in deck) cards: {n_unplayed_cards}"
-            # unplayed_str = " ".join(unplayed_cards)
 
-        trump_card = self.state_wrapper.get_trump_card()
-        trump_str = f"The trump card is: {self.card_visualiser.convert_cards_to_strings(trump_card)}"
-        
+        trump_str = self._get_segment("trump", self.state_wrapper.get_metadata()[:8], lambda:
+            f"The trump card is: {self.card_visualiser.convert_cards_to_strings(self.state_wrapper.get_trump_card())}")
+
         turn_str = f"Turn: Player {int(not self.state_wrapper.get_is_p0_turn())}"
         attacker_str = f"Attacker: Player {int(not self.state_wrapper.get_is_p0_attacking())}"
 
         return "\n".join([unplayed_str, trump_str, attacker_str, turn_str])
-    
+
     def _get_left_to_defend_cards_str(self, left_to_defend_cards: np.ndarray) -> str:
         left_to_defend_str = f"Cards left to defend: "
         left_to_defend_str += " ".join(left_to_defend_cards)
-        
+
         return left_to_defend_str
-    
+
     def _get_cards_on_board_str(self, cards_on_board: np.ndarray, left_to_defend_cards: np.ndarray) -> str:
         cards_on_board_str = f"Cards on board (no longer needed to defend): "
 
-        cards_on_board_not_to_defend = np.setdiff1d(cards_on_board, left_to_defend_cards)
-        cards_on_board_str += " ".join(cards_on_board_not_to_defend)
-        
+        # Defended cards in alphabetical order, like np.setdiff1d of the card strings returns them
+        string_order = self.card_visualiser.string_order
+        defended = (cards_on_board & ~left_to_defend_cards)[string_order]
+        cards_on_board_str += " ".join(self.card_visualiser.card_list[string_order][defended])
+
         return cards_on_board_str
-    
+
 if __name__ == "__main__":
     matrix = np.zeros((6, 32), dtype=bool)
 
@@ -76,6 +105,5 @@ if __name__ == "__main__":
     matrix[4, [23,24,25]] = True
     matrix[5, [4,8]] = True
 
-    state = State(matrix)
-    board_visualiser = BoardVisualiser(state, 0)
-    print(board_visualiser)
\ No newline at end of file
+    board_visualiser = BoardVisualiser(matrix, 0)
+    print(board_visualiser)
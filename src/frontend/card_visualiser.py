@@ -1,10 +1,36 @@
 import numpy as np
 from frontend.constants import RANKS, SUITS
 
+_card_tables = {}
+
+def get_card_tables(suit_indices: np.ndarray) -> tuple:
+    """
+    The card strings and their alphabetical order for a suit ordering, built on first use and cached.
+
+    Parameters:
+        suit_indices (np.ndarray): The suit ordering, trump suit first.
+
+    Returns:
+        tuple: (card_list, string_order), shared arrays that must not be changed by the caller.
+    """
+    key = tuple(suit_indices.tolist())
+    if key not in _card_tables:
+        ordered_suits = SUITS[suit_indices]
+
+        # Create the 32 cards
+        ranks = np.tile(RANKS, 4).reshape(4, 8)
+        suits = np.tile(ordered_suits[:, None], 8).reshape(4, 8)
+        card_list = np.char.add(ranks, suits).flatten()
+        # Card indices in alphabetical order of their strings, as np.setdiff1d and np.unique sort them
+        _card_tables[key] = (card_list, np.argsort(card_list))
+    return _card_tables[key]
+
 class CardVisualiser():
     def __init__(self, trump_suit: int):
+        """
+        Card names for a trump suit, the string tables are only built when a card is first rendered.
+        """
         self.set_suit_ordering(trump_suit)
-        self.set_card_list()
 
     def set_suit_ordering(self, trump_suit: int):
         """
@@ -27,22 +53,17 @@ class CardVisualiser():
 
         self.suit_indices = order
     
-    def set_card_list(self) -> np.ndarray:
+    @property
+    def card_list(self) -> np.ndarray:
         """
-        Calculates the array of 32 cards in string representation based on the trump of the game.
-
-        Returns:
-            numpy.ndarray: An array of 32 cards in string representation.
+        The array of 32 cards in string representation based on the trump of the game.
         """
-        ordered_suits = SUITS[self.suit_indices]
+        return get_card_tables(self.suit_indices)[0]
 
-        # Create the 32 cards
-        ranks = np.tile(RANKS, 4).reshape(4, 8)
-        suits = np.tile(ordered_suits[:, None], 8).reshape(4, 8)
-        cards = np.char.add(ranks, suits)
+    @property
+    def string_order(self) -> np.ndarray:
+        return get_card_tables(self.suit_indices)[1]
 
-        self.card_list = cards.flatten()
-    
     def convert_cards_to_strings(self, cards: np.ndarray) -> np.ndarray:
         """
         Converts a boolean array of size 32 representing the cards to be displayed into a list of card strings.
@@ -61,3 +82,20 @@ class CardVisualiser():
         selected_cards = self.card_list[cards]
 
         return selected_cards
+
+
+_card_visualisers = {}
+
+def get_card_visualiser(trump_suit: int) -> CardVisualiser:
+    """
+    Shared CardVisualiser of a trump suit, so the card list is only built once per trump.
+
+    Parameters:
+        trump_suit (int): The trump suit, 0-3.
+
+    Returns:
+        CardVisualiser: The cached visualiser, it must not be changed by the caller.
+    """
+    if trump_suit not in _card_visualisers:
+        _card_visualisers[trump_suit] = CardVisualiser(trump_suit)
+    return _card_visualisers[trump_suit]
@@ -1,51 +1,10 @@
 import numpy as np
 from frontend.state_wrapper import State
-from frontend.card_visualiser import CardVisualiser
+from frontend.card_visualiser import get_card_visualiser
 from frontend.board_visualiser import BoardVisualiser
 from typing import Optional
 from frontend.constants import MoveType, StateMatrix
-
-class Move:
-    def __init__(self, move_type: MoveType, move_matrix: Optional[np.ndarray] = None):
-        assert type(move_type) == MoveType, "Move type must be a MoveType"
-
-        if move_matrix is not None:
-            assert type(move_matrix) == np.ndarray, "Move matrix must be a numpy array"
-            assert move_matrix.shape == (6,32), "Move matrix must have shape (6,32)"
-            assert move_matrix.dtype == int, "Move matrix must be a int array"
-            self.move_matrix = move_matrix
-        else:
-            self.move_matrix = np.zeros((6, 32), dtype=int)
-
-        self.move_type = move_type
-
-    def __str__(self) -> str:
-        return f"Move type: {self.move_type}\nMove matrix:\n{self.move_matrix}"
-
-    def get_move_matrix(self) -> np.ndarray:
-        return self.move_matrix
-    
-    def get_move_type(self) -> MoveType:
-        return self.move_type
-    
-    def set_move_row(self, row_index: int, row: np.ndarray): # FIXME:
-        if row_index < 0 or row_index >= 6:
-            raise ValueError("Row index must be between 0 and 5")
-        if row.shape != (32,):
-            raise ValueError("Row must have shape (32,)")
-        if row.dtype != int:
-            raise ValueError("Row must be a integer array")
-        
-        self.move_matrix[row_index] = row
-    
-    def __add__(self, other):
-        if type(other) != Move:
-            raise ValueError("Cannot add a Move object with a non-Move object")
-        
-        if self.move_type != other.get_move_type():
-            raise ValueError("Cannot add moves of different types")
-        
-        return Move(self.move_type, self.move_matrix + other.get_move_matrix())
+from backend.moves import Move  # Re-exported, it used to live here
 
 class Player:
     def __init__(self, player_id: int, trump: int):
@@ -53,7 +12,8 @@ class Player:
         assert player_id in {0, 1}, "Player ID must be 0 or 1"
 
         self.player_id = player_id
-        self.card_visualiser = CardVisualiser(trump)
+        self.card_visualiser = get_card_visualiser(trump)
+        self.board_visualiser = None
         self.trump = trump
 
     def get_player_id(self) -> int:
@@ -125,7 +85,11 @@ class Player:
             print("Controls: view board (b), select card (s), end turn (e).")
             command = input("Enter command: ")
             if command == "b":
-                print(BoardVisualiser(current_state.get_state_matrix(), self.trump)) # TODO:  Modify BoardVisualiser to take in state object?
+                if self.board_visualiser is None:
+                    self.board_visualiser = BoardVisualiser(current_state.get_state_matrix(), self.trump) # TODO:  Modify BoardVisualiser to take in state object?
+                else:
+                    self.board_visualiser.set_state_matrix(current_state.get_state_matrix())
+                print(self.board_visualiser)
 
             elif command == "s":
                 selected_card = self.select_own_card(current_state)
@@ -0,0 +1,87 @@
+import argparse
+
+from backend.moves import Action, MoveKind
+from backend.records import GameRecordReader
+from backend.replay import Replay
+from frontend.board_visualiser import BoardVisualiser
+from frontend.card_visualiser import get_card_visualiser
+
+
+class ReplayViewer:
+    def __init__(self, replay: Replay, trump_suit: int = 0):
+        """
+        Steps a BoardVisualiser through the positions of a replayed game.
+
+        Parameters:
+            replay (Replay): The game to show.
+            trump_suit (int): The trump suit, used for the card names.
+        """
+        assert isinstance(replay, Replay), "Replay must be a backend.replay.Replay"
+
+        self.replay = replay
+        self.ply = 0
+        self.card_visualiser = get_card_visualiser(trump_suit)
+        self.board_visualiser = BoardVisualiser(replay.state(0), trump_suit)
+
+    def __str__(self):
+        return self.visualise()
+
+    def seek(self, ply: int) -> str:
+        """
+        Moves to ply, clamped to the game's positions, and returns the rendered board.
+        """
+        self.ply = min(max(ply, 0), len(self.replay) - 1)
+        self.board_visualiser.set_state_matrix(self.replay.state(self.ply))
+        return self.visualise()
+
+    def forward(self, steps: int = 1) -> str:
+        return self.seek(self.ply + steps)
+
+    def back(self, steps: int = 1) -> str:
+        return self.seek(self.ply - steps)
+
+    def visualise(self) -> str:
+        header = f"Ply {self.ply} of {len(self.replay) - 1}"
+        action = self.replay.action(self.ply)
+        if action is not None:
+            header += f", next move: {self.describe_action(action)}"
+        return "\n\n".join([header, self.board_visualiser.visualise_board()])
+
+    def describe_action(self, action: Action) -> str:
+        cards = " ".join(self.card_visualiser.card_list[list(action.cards)])
+        if action.kind == MoveKind.DEFEND:
+            cards += f" on {self.card_visualiser.card_list[action.target]}"
+        return f"{action.kind.name.lower()} {cards}".strip()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Step through a game of a log written by backend.records")
+    parser.add_argument("log", help="game log file")
+    parser.add_argument("game", type=int, nargs="?", default=0, help="index of the game in the log")
+    parser.add_argument("--interval", type=int, default=32, help="plies between checkpoints")
+    args = parser.parse_args()
+
+    with GameRecordReader(args.log) as reader:
+        viewer = ReplayViewer(Replay.from_record(reader[args.game], args.interval))
+        print(viewer)
+        while True:
+            command = input("Controls: next (n), previous (p), go to ply (number), start (s), end (e), quit (q): ")
+            if command in ("n", ""):
+                print(viewer.forward())
+            elif command == "p":
+                print(viewer.back())
+            elif command == "s":
+                print(viewer.seek(0))
+            elif command == "e":
+                print(viewer.seek(len(viewer.replay) - 1))
+            elif command == "q":
+                break
+            else:
+                try:
+                    print(viewer.seek(int(command)))
+                except ValueError:
+                    print("Invalid command.")
+
+
+if __name__ == "__main__":
+    main()
@@ -49,10 +49,12 @@ class State:
         return self.state_matrix[5, 12]
     
     def apply_move(self, move: 'Move'):
-        new_state_matrix = move.get_move_matrix() + np.array(self.state_matrix, dtype=int)
+        move_matrix = move.get_move_matrix()
         
-        if np.any((new_state_matrix != 0) * (new_state_matrix != 1)):
-            print(new_state_matrix)
+        # Only cards that are not set can be added and only set cards removed, so the move just flips cells
+        if np.any(self.state_matrix[move_matrix == 1]) or not np.all(self.state_matrix[move_matrix == -1]) or np.any(np.abs(move_matrix) > 1):
+            print(move_matrix)
             raise ValueError("State matrix must contain only 0s and 1s")
         
-        self.state_matrix = np.array(new_state_matrix, dtype=bool)
\ No newline at end of file
+        # A new matrix, the wrapped one may be shared with a Game
+        self.state_matrix = self.state_matrix != (move_matrix != 0)
\ No newline at end of file
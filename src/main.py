@@ -1,5 +1,5 @@
-from backend.game import *
-from frontend.board_visualiser import *
+from backend.game import Game
+from frontend.board_visualiser import BoardVisualiser
 
 game = Game()
 board_visualiser = BoardVisualiser(game.state,0)
@@ -0,0 +1,384 @@
+"""
+Asyncio server hosting many concurrent games, one session per Game
+Clients speak server.protocol over TCP, play against each other or against a tournament agent.
+Moves are checked with Game.attack and Game.defend on a scratch copy of the session's game and
+played with Game.make_move. Both are a fraction of a millisecond and run on the event loop, bot
+moves can take seconds and run in an executor so the loop keeps serving the other sessions.
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from backend.game import Game
+from backend.moves import ACTION_SIZE, Action, MoveKind, legal_action_mask
+from server.protocol import (MOVE, Error, Message, changed_cells, encode_error, encode_start,
+                             encode_update, read_frame, state_words, view_words)
+from tournament import make_agent, parse_agent, percentiles
+
+LATENCY_WINDOW = 100000 # Most recent move latencies kept for the server wide percentiles
+
+
+def check_move(game: Game, scratch: Game, player: int, action: Action):
+    """
+    Checks whether player may play action in game with the game's own validators
+
+    Whose turn it is and which kind of move fits the bout are checked first, the cards of attacks and
+    throw ins then go through Game.attack, defences, redirects and flashes through Game.defend, both on
+    scratch so game is not changed.
+
+    Params:
+        game: Game the move is meant for
+        scratch: Game used as the validators' workspace, its position is overwritten
+        player: 0-1
+        action: backend.moves.Action
+    Returns:
+        error: None if the move is legal, the protocol Error otherwise
+    """
+    state = game.state
+    if state[5, 11] or bool(state[5, 8]) != (player == 0):
+        return Error.NOT_YOUR_TURN
+    kind = action.kind
+    attacking = bool(state[5, 9]) == (player == 0)
+    pickup = bool(state[5, 10])
+    board = bool(state[4].any())
+    left = bool(state[3].any())
+
+    if attacking:
+        if kind == MoveKind.ATTACK:
+            legal = not board
+        elif kind == MoveKind.THROW_IN or kind == MoveKind.PASS:
+            legal = board and (not left or pickup)
+        else:
+            legal = False
+        if legal and kind != MoveKind.PASS:
+            legal = _scratch(game, scratch).attack(action.to_matrix(player), player) == (True, False)
+    else:
+        legal = left and not pickup
+        if kind == MoveKind.REDIRECT or kind == MoveKind.FLASH:
+            legal = legal and np.array_equal(state[3], state[4])
+        elif kind != MoveKind.DEFEND and kind != MoveKind.PICKUP:
+            legal = False
+        if legal and kind == MoveKind.FLASH: # A flash matrix is empty, the rank shown is checked here
+            rank = action.cards[0]
+            legal = bool(state[player, rank]) and bool(game.board_ranks >> rank & 1)
+        if legal and kind != MoveKind.PICKUP:
+            valid, is_redirect, _ = _scratch(game, scratch).defend(action.to_matrix(player), player)
+            legal = valid and is_redirect == (kind != MoveKind.DEFEND)
+    return None if legal else Error.ILLEGAL_MOVE
+
+
+def _scratch(game, scratch):
+    scratch.state[...] = game.state
+    scratch.board_ranks = game.board_ranks
+    return scratch
+
+
+class Client:
+    """
+    One connection, in at most one session at a time
+    """
+
+    def __init__(self, writer):
+        self.writer = writer
+        self.session = None
+        self.player = -1
+
+    def send(self, data: bytes):
+        if not self.writer.is_closing():
+            self.writer.write(data)
+
+
+class Session:
+    def __init__(self, session_id: int, game: Game):
+        """
+        One game and its two seats, each taken by a Client or a bot
+        """
+        self.id = session_id
+        self.game = game
+        self.scratch = Game.from_state(np.zeros((6, 32), dtype=bool), [])
+        self.clients = [None, None]
+        self.bots = [None, None]
+        self.views = [None, None] # Packed view each client was last sent
+        self.latencies = [] # Seconds from a client's move arriving to its update being written
+        self.bot_latencies = [] # Seconds a bot move took in the executor
+        self.plies = 0
+        self.started = time.perf_counter()
+        self.closed = False
+
+    def summary(self) -> dict:
+        return {
+            "session": self.id,
+            "plies": self.plies,
+            "duration_s": time.perf_counter() - self.started,
+            "winner": (0 if self.game.state[5, 12] else 1) if self.game.state[5, 11] else None,
+            "latency": percentiles(self.latencies),
+            "bot_latency": percentiles(self.bot_latencies),
+        }
+
+
+class GameServer:
+    def __init__(self, executor=None, seed=None, max_plies=1000):
+        """
+        Params:
+            executor: concurrent.futures executor for bot moves, a thread pool with one thread per core if None.
+                      Bots are called with a copy of the state, a process pool works for bots that pickle.
+            seed: seeds every deal and bot, None for fresh entropy
+            max_plies: sessions are ended after this many moves
+        """
+        self.executor = executor or ThreadPoolExecutor(multiprocessing.cpu_count())
+        self.seeds = np.random.SeedSequence(seed)
+        self.max_plies = max_plies
+        self.sessions = {}
+        self.waiting = None # Client that joined without an opponent spec and waits for another
+        self.next_id = 0
+        self.connections = 0
+        self.finished = deque(maxlen=1000) # Summaries of the latest ended sessions
+        self.sessions_total = 0
+        self.moves = 0
+        self.rejected = 0
+        self.bot_failures = 0
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.server = None
+        self.started = time.perf_counter()
+        self.last_sample = (self.started, time.process_time(), 0)
+
+    async def start(self, host="127.0.0.1", port=0, backlog=4096) -> int:
+        """
+        Starts listening, port 0 picks a free port
+
+        Returns:
+            port: the port the server listens on
+        """
+        self.server = await asyncio.start_server(self._handle, host, port, backlog=backlog)
+        return self.server.sockets[0].getsockname()[1]
+
+    async def close(self):
+        for session in list(self.sessions.values()):
+            self._end(session, Error.OPPONENT_LEFT)
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    async def _handle(self, reader, writer):
+        client = Client(writer)
+        self.connections += 1
+        try:
+            while True:
+                payload = await read_frame(reader)
+                received = time.perf_counter()
+                kind = payload[0] if payload else 0
+                if kind == Message.MOVE and len(payload) == MOVE.size:
+                    self._move(client, MOVE.unpack(payload)[1], received)
+                elif kind == Message.JOIN:
+                    self._join(client, payload[1:])
+                elif kind == Message.LEAVE:
+                    if client.session is None:
+                        client.send(encode_error(Error.NOT_IN_GAME))
+                    else:
+                        self._end(client.session, Error.OPPONENT_LEFT)
+                else:
+                    client.send(encode_error(Error.BAD_MESSAGE))
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self.connections -= 1
+            if self.waiting is client:
+                self.waiting = None
+            if client.session is not None:
+                self._end(client.session, Error.OPPONENT_LEFT)
+            writer.close()
+
+    def _join(self, client: Client, spec: bytes):
+        if client.session is not None or self.waiting is client:
+            client.send(encode_error(Error.ALREADY_IN_GAME))
+            return
+        try:
+            spec = spec.decode()
+            if spec:
+                parse_agent(spec)
+        except ValueError: # Also UnicodeDecodeError
+            client.send(encode_error(Error.UNKNOWN_OPPONENT))
+            return
+
+        if not spec and self.waiting is None:
+            self.waiting = client
+            return
+
+        deal_seed, *bot_seeds = self.seeds.spawn(3)
+        session = Session(self.next_id, Game(seed=np.random.default_rng(deal_seed)))
+        if spec:
+            player = session.id % 2
+            session.bots[1 - player] = make_agent(spec, 1 - player, bot_seeds[1 - player])
+            seats = [(client, player)]
+        else:
+            seats = [(self.waiting, 0), (client, 1)]
+            self.waiting = None
+
+        self.next_id += 1
+        self.sessions_total += 1
+        self.sessions[session.id] = session
+        words = state_words(session.game.state)
+        for seat, player in seats:
+            seat.session = session
+            seat.player = player
+            session.clients[player] = seat
+            session.views[player] = view_words(words, player)
+            seat.send(encode_start(session.id, player, len(session.game.deck), bin(words[1 - player]).count("1"),
+                                   session.views[player]))
+        self._bot_turns(session)
+
+    def _move(self, client: Client, index: int, received: float):
+        session = client.session
+        if session is None:
+            client.send(encode_error(Error.NOT_IN_GAME))
+            return
+        if index >= ACTION_SIZE:
+            client.send(encode_error(Error.BAD_MESSAGE))
+            return
+        action = Action.from_index(index)
+        error = check_move(session.game, session.scratch, client.player, action)
+        if error is not None:
+            self.rejected += 1
+            client.send(encode_error(error))
+            return
+        self._play(session, action, client.player)
+        latency = time.perf_counter() - received
+        session.latencies.append(latency)
+        self.latencies.append(latency)
+        if not session.closed:
+            self._bot_turns(session)
+
+    def _play(self, session: Session, action: Action, player: int):
+        game = session.game
+        game.make_move(action)
+        session.plies += 1
+        self.moves += 1
+
+        words = state_words(game.state)
+        deck_size = len(game.deck)
+        for seat, client in enumerate(session.clients):
+            if client is not None:
+                view = view_words(words, seat)
+                cells = changed_cells(session.views[seat], view)
+                session.views[seat] = view
+                client.send(encode_update(action.index, player, deck_size, bin(words[1 - seat]).count("1"), cells))
+        if game.state[5, 11]:
+            self._end(session, None)
+        elif session.plies >= self.max_plies:
+            self._end(session, Error.TRUNCATED)
+
+    def _bot_turns(self, session: Session):
+        player = 0 if session.game.state[5, 8] else 1
+        if session.bots[player] is not None and not session.game.state[5, 11]:
+            asyncio.get_running_loop().create_task(self._bot_move(session, player))
+
+    async def _bot_move(self, session: Session, player: int):
+        start = time.perf_counter()
+        state = session.game.state.copy()
+        try:
+            action = await asyncio.get_running_loop().run_in_executor(self.executor, session.bots[player].get_action, state)
+            # Bot moves are checked like client moves, a broken bot must not corrupt the game
+            legal = (isinstance(action, Action) and action.is_canonical()
+                     and bool(legal_action_mask(session.game.state, player)[action.index]))
+        except Exception:
+            legal = False
+        if session.closed:
+            return
+        if not legal:
+            self.bot_failures += 1
+            self._end(session, Error.BOT_FAILED)
+            return
+        session.bot_latencies.append(time.perf_counter() - start)
+        self._play(session, action, player)
+        if not session.closed:
+            self._bot_turns(session)
+
+    def _end(self, session: Session, reason):
+        """
+        Removes a session, reason is sent to the clients still seated unless the game was played to the end
+        """
+        if session.closed:
+            return
+        session.closed = True
+        del self.sessions[session.id]
+        self.finished.append(session.summary())
+        for client in session.clients:
+            if client is not None:
+                client.session = None
+                if reason is not None:
+                    client.send(encode_error(reason))
+        for bot in session.bots:
+            if bot is not None:
+                bot.close()
+
+    def metrics(self) -> dict:
+        """
+        Load figures, the rates are over the time since the previous call
+
+        sessions_per_core is how many sessions like the current ones one fully busy core would carry,
+        the active sessions divided by the share of a core the process used. It counts all CPU time of
+        the process, bot threads and clients run in the same process included.
+        """
+        now = time.perf_counter()
+        cpu = time.process_time()
+        last_now, last_cpu, last_moves = self.last_sample
+        self.last_sample = (now, cpu, self.moves)
+        wall = max(now - last_now, 1e-9)
+        busy = (cpu - last_cpu) / wall
+        moves = self.moves - last_moves
+        session_p99 = [summary["latency"]["p99_ms"] for summary in self.finished if summary["latency"]]
+        return {
+            "connections": self.connections,
+            "sessions_active": len(self.sessions),
+            "sessions_total": self.sessions_total,
+            "moves": self.moves,
+            "rejected": self.rejected,
+            "bot_failures": self.bot_failures,
+            "moves_per_s": moves / wall,
+            "cpu_busy": busy,
+            "moves_per_cpu_s": moves / (cpu - last_cpu) if cpu > last_cpu else None,
+            "sessions_per_core": len(self.sessions) / busy if busy > 0 else None,
+            "latency": percentiles(list(self.latencies)),
+            "session_p99_ms_median": float(np.median(session_p99)) if session_p99 else None,
+        }
+
+    def session_metrics(self, session_id: int) -> dict:
+        """
+        Summary of a running session: plies, duration, winner and its move latency percentiles
+        """
+        return self.sessions[session_id].summary()
+
+
+async def serve(host: str, port: int, seed, workers: int, interval: float):
+    server = GameServer(ThreadPoolExecutor(workers), seed)
+    port = await server.start(host, port)
+    print(f"Listening on {host}:{port}")
+    try:
+        while True:
+            await asyncio.sleep(interval)
+            print(server.metrics())
+    finally:
+        await server.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Host Durak games for clients speaking server.protocol")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("-s", "--seed", type=int, default=None)
+    parser.add_argument("-w", "--workers", type=int, default=multiprocessing.cpu_count(), help="bot move threads")
+    parser.add_argument("--interval", type=float, default=10.0, help="seconds between metrics reports")
+    args = parser.parse_args()
+    asyncio.run(serve(args.host, args.port, args.seed, args.workers, args.interval))
+
+
+if __name__ == "__main__":
+    main()
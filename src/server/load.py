@@ -0,0 +1,189 @@
+"""
+Loopback clients and a load generator for server.game_server
+Every simulated player is its own TCP connection playing uniformly random legal moves, which it
+finds from its view alone. Without --port the generator starts a GameServer in the same process.
+"""
+
+import argparse
+import asyncio
+import time
+
+import numpy as np
+
+from backend.moves import legal_action_mask
+from server.game_server import GameServer
+from server.protocol import (ERROR, Error, Message, ClientView, encode_join, encode_leave, encode_move,
+                             read_frame)
+from tournament import percentiles
+
+
+class ServerError(Exception):
+    def __init__(self, reason: Error):
+        super().__init__(reason.name)
+        self.reason = reason
+
+
+class LoopbackClient:
+    def __init__(self, seed=None):
+        """
+        A client of the game server that plays random legal moves
+        """
+        self.rng = np.random.default_rng(seed)
+        self.view = None
+        self.latencies = [] # Seconds from sending a move to receiving its update
+        self.reader = None
+        self.writer = None
+
+    async def connect(self, host: str, port: int):
+        self.reader, self.writer = await asyncio.open_connection(host, port)
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            await self.writer.wait_closed()
+
+    async def receive(self) -> int:
+        """
+        Reads one message, applies it to the view
+
+        Returns:
+            message: Message.START or Message.UPDATE
+        Raises:
+            ServerError: the server sent an ERROR
+        """
+        payload = await read_frame(self.reader)
+        if payload[0] == Message.START:
+            self.view = ClientView(payload)
+        elif payload[0] == Message.UPDATE:
+            self.view.apply(payload)
+        elif payload[0] == Message.ERROR:
+            raise ServerError(Error(ERROR.unpack(payload)[1]))
+        return payload[0]
+
+    async def join(self, opponent: str = "") -> ClientView:
+        """
+        Joins a game and waits for it to start, against a tournament agent spec or, if empty, the next client that joins
+        """
+        self.writer.write(encode_join(opponent))
+        while await self.receive() != Message.START:
+            pass
+        return self.view
+
+    async def leave(self):
+        self.writer.write(encode_leave())
+        await self.writer.drain()
+
+    async def play(self):
+        """
+        Plays the joined game to the end
+
+        Returns:
+            winner: 0-1, None if the game was ended early (opponent left or the move limit was hit)
+        """
+        view = self.view
+        pending = None # Time the last move was sent until its update comes back
+        try:
+            while not view.over:
+                if view.my_turn and pending is None:
+                    legal = np.flatnonzero(legal_action_mask(view.move_state(), view.player))
+                    self.writer.write(encode_move(int(legal[self.rng.integers(len(legal))])))
+                    pending = time.perf_counter()
+                if await self.receive() == Message.UPDATE and pending is not None and view.last_mover == view.player:
+                    self.latencies.append(time.perf_counter() - pending)
+                    pending = None
+        except ServerError as error:
+            if error.reason in (Error.OPPONENT_LEFT, Error.TRUNCATED, Error.BOT_FAILED):
+                return None
+            raise
+        return view.winner
+
+
+async def _player(host, port, opponent, games, seed, results):
+    client = LoopbackClient(seed)
+    await client.connect(host, port)
+    try:
+        for _ in range(games):
+            await client.join(opponent)
+            results["finished" if await client.play() is not None else "ended"] += 1
+    finally:
+        results["latencies"].extend(client.latencies)
+        await client.close()
+
+
+async def _sample(server, samples, interval=1.0):
+    while True:
+        await asyncio.sleep(interval)
+        samples.append(server.metrics())
+
+
+async def run_load(players: int, games: int, opponent: str = "random", host=None, port=None, seed=0,
+                   ramp: int = 500) -> dict:
+    """
+    Simulates players connecting at once, each playing games one after the other
+
+    Params:
+        players: number of simultaneous clients, with opponent "" they are paired with each other
+        games: games per client
+        opponent: tournament agent spec the clients play against, "" to play each other
+        host, port: server to load, None starts a GameServer in this process
+        seed: seeds the clients and the in-process server
+        ramp: clients connecting per batch, keeps the listen backlog from overflowing
+    Returns:
+        dict: games finished and ended early, client round trip percentiles, moves per second and,
+              for an in-process server, its metrics at the end and at the sample with the most active sessions
+    """
+    server = None
+    if port is None:
+        server = GameServer(seed=seed)
+        host = "127.0.0.1"
+        port = await server.start(host)
+    results = {"finished": 0, "ended": 0, "latencies": []}
+    seeds = np.random.SeedSequence(seed).spawn(players)
+
+    samples = []
+    if server is not None:
+        sampler = asyncio.create_task(_sample(server, samples))
+
+    start = time.perf_counter()
+    tasks = []
+    for first in range(0, players, ramp):
+        for index in range(first, min(first + ramp, players)):
+            tasks.append(asyncio.create_task(_player(host, port, opponent, games, seeds[index], results)))
+        await asyncio.sleep(0)
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - start
+
+    summary = {
+        "players": players,
+        "finished": results["finished"],
+        "ended": results["ended"],
+        "elapsed_s": elapsed,
+        "client_moves_per_s": len(results["latencies"]) / elapsed,
+        "round_trip": percentiles(results["latencies"]),
+    }
+    if server is not None:
+        sampler.cancel()
+        summary["server"] = server.metrics()
+        # Rates at the busiest point of the run, the final sample is taken after most sessions ended
+        summary["server_peak"] = max(samples, key=lambda sample: sample["sessions_active"], default=None)
+        await server.close()
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load the game server with simulated random players")
+    parser.add_argument("-n", "--players", type=int, default=1000)
+    parser.add_argument("-g", "--games", type=int, default=1, help="games per player")
+    parser.add_argument("-o", "--opponent", default="random", help='agent spec the players face, "" to pair them up')
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=None, help="server to load, an in-process server if not given")
+    parser.add_argument("-s", "--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    summary = asyncio.run(run_load(args.players, args.games, args.opponent, args.host, args.port, args.seed))
+    for key, value in summary.items():
+        print(f"{key}: {value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+"""
+Wire format of the game server, binary frames over a stream
+Every frame is a little endian uint16 payload length followed by the payload, whose first byte is
+the message type.
+
+Client to server
+JOIN     | opponent spec, utf-8 | tournament agent spec ("random", "ismcts:iterations=50") to play a
+         |                      | bot, empty to be paired with the next client that joins empty
+MOVE     | uint16 action        | backend.moves action index, 3 bytes per move
+LEAVE    |                      | gives up the current game
+
+Server to client
+START    | uint32 session, uint8 player, uint8 deck size, uint8 opponent card count, 6 x uint32 view
+UPDATE   | uint16 action, uint8 mover, uint8 deck size, uint8 opponent card count, uint8 n, n x uint8 cells
+ERROR    | uint8 reason (Error)
+
+A view is the state as one player sees it, the opponent's hand (row 1 - player) and the deck
+(row 2) are cleared. After START the client keeps its view up to date from UPDATEs, whose cells
+are the flat indices (row * 32 + card) of the view that toggled, a few bytes per move instead of
+the 192 cells of a full matrix. The game is over once cell 5 * 32 + 11 is set.
+"""
+
+import struct
+from enum import IntEnum
+
+import numpy as np
+
+from backend.bitstate import pack, unpack
+
+HEADER = struct.Struct("<H")
+MOVE = struct.Struct("<BH")
+START = struct.Struct("<BIBBB6I")
+UPDATE = struct.Struct("<BHBBBB")
+ERROR = struct.Struct("<BB")
+
+NO_ACTION = 0xFFFF # UPDATE action of updates no move caused, like the opponent leaving
+
+
+class Message(IntEnum):
+    JOIN = 1
+    MOVE = 2
+    LEAVE = 3
+    START = 16
+    UPDATE = 17
+    ERROR = 18
+
+
+class Error(IntEnum):
+    BAD_MESSAGE = 1  # Unknown type or malformed payload
+    NOT_IN_GAME = 2  # MOVE or LEAVE without a running game
+    ALREADY_IN_GAME = 3
+    UNKNOWN_OPPONENT = 4
+    NOT_YOUR_TURN = 5
+    ILLEGAL_MOVE = 6
+    OPPONENT_LEFT = 7  # The game was ended, the client may JOIN again
+    TRUNCATED = 8  # The game hit the server's move limit and was ended
+    BOT_FAILED = 9  # The bot opponent raised or played an illegal move, the game was ended
+
+
+def frame(payload: bytes) -> bytes:
+    return HEADER.pack(len(payload)) + payload
+
+
+async def read_frame(reader) -> bytes:
+    """
+    Reads one frame's payload from an asyncio.StreamReader
+
+    Raises:
+        asyncio.IncompleteReadError: the stream ended
+    """
+    (length,) = HEADER.unpack(await reader.readexactly(HEADER.size))
+    return await reader.readexactly(length)
+
+
+def encode_join(opponent: str = "") -> bytes:
+    return frame(bytes([Message.JOIN]) + opponent.encode())
+
+
+def encode_move(action: int) -> bytes:
+    return frame(MOVE.pack(Message.MOVE, action))
+
+
+def encode_leave() -> bytes:
+    return frame(bytes([Message.LEAVE]))
+
+
+def encode_start(session: int, player: int, deck_size: int, opponent_count: int, view_words) -> bytes:
+    return frame(START.pack(Message.START, session, player, deck_size, opponent_count, *view_words))
+
+
+def encode_update(action: int, mover: int, deck_size: int, opponent_count: int, cells) -> bytes:
+    return frame(UPDATE.pack(Message.UPDATE, action, mover, deck_size, opponent_count, len(cells)) + bytes(cells))
+
+
+def encode_error(reason: Error) -> bytes:
+    return frame(ERROR.pack(Message.ERROR, reason))
+
+
+def state_words(state: np.ndarray):
+    """
+    State packed into 6 ints (backend.bitstate)
+    """
+    return [int(word) for word in pack(state)]
+
+
+def view_words(words, player: int):
+    """
+    The player's view of packed state words, the opponent's hand and the deck cleared
+    """
+    words = list(words)
+    words[1 - player] = 0
+    words[2] = 0
+    return words
+
+
+def changed_cells(old_words, new_words):
+    """
+    Flat view indices that differ between two packed views
+    """
+    cells = []
+    for row, (old, new) in enumerate(zip(old_words, new_words)):
+        changed = old ^ new
+        while changed:
+            low = changed & -changed
+            cells.append(row * 32 + low.bit_length() - 1)
+            changed ^= low
+    return cells
+
+
+class ClientView:
+    """
+    What one client knows of its game, built from START and kept up to date by UPDATEs
+    """
+
+    def __init__(self, payload: bytes):
+        _, self.session, self.player, self.deck_size, self.opponent_count, *words = START.unpack(payload)
+        self.state = unpack(np.array(words, dtype=np.uint32))
+        self.last_action = NO_ACTION
+        self.last_mover = -1
+
+    def apply(self, payload: bytes):
+        """
+        Applies an UPDATE payload
+        """
+        _, self.last_action, self.last_mover, self.deck_size, self.opponent_count, n = UPDATE.unpack_from(payload)
+        cells = np.frombuffer(payload, dtype=np.uint8, count=n, offset=UPDATE.size)
+        flat = self.state.reshape(-1)
+        flat[cells] = ~flat[cells]
+
+    @property
+    def my_turn(self) -> bool:
+        return bool(self.state[5, 8]) == (self.player == 0) and not self.over
+
+    @property
+    def over(self) -> bool:
+        return bool(self.state[5, 11])
+
+    @property
+    def winner(self) -> int:
+        return 0 if self.state[5, 12] else 1
+
+    def move_state(self) -> np.ndarray:
+        """
+        State to pass to backend.moves.legal_action_mask for this player, the move rules only need to know
+        how many cards the opponent holds, so that many placeholder cards stand in for their hand
+        """
+        state = self.state.copy()
+        state[1 - self.player, :self.opponent_count] = True
+        return state
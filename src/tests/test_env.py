@@ -0,0 +1,29 @@
+import numpy as np
+import pytest
+
+from backend.env import DurakVecEnv, GameBatch
+
+
+def test_illegal_action_steps_no_env():
+    batch = GameBatch(4)
+    _, _, mask = batch.reset(range(4))
+    states = [game.state.copy() for game in batch.games]
+    actions = [int(np.flatnonzero(row)[0]) for row in mask]
+    actions[-1] = int(np.flatnonzero(~mask[-1])[0])
+    with pytest.raises(ValueError):
+        batch.step(actions)
+    assert all((game.state == state).all() for game, state in zip(batch.games, states))
+    batch.step([int(np.flatnonzero(row)[0]) for row in mask])
+
+
+def test_subprocess_env_raises_before_any_worker_steps():
+    env = DurakVecEnv(4, mode="subprocess", workers=2)
+    try:
+        _, info = env.reset(seeds=range(4))
+        legal = [int(np.flatnonzero(row)[0]) for row in info["legal_mask"]]
+        with pytest.raises(ValueError):
+            env.step(legal[:-1] + [int(np.flatnonzero(~info["legal_mask"][-1])[0])])
+        obs, _, _, _ = env.step(legal)
+        assert obs.shape == (4, env.observation_size)
+    finally:
+        env.close()
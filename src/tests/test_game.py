@@ -0,0 +1,129 @@
+import numpy as np
+import pytest
+
+from backend.constants import MoveType
+from backend.game import Game
+from backend.moves import Action, Move, MoveKind, Phase, legal_action_mask, phase_of
+from backend.observation import encode
+from backend.zobrist import zobrist_hash
+
+
+def random_game(seed, rng):
+    """
+    Yields (game, player, action) before every move of a random game, the move is played after the yield
+    """
+    game = Game(seed=seed)
+    while not game.state[5, 11]:
+        player = 0 if game.state[5, 8] else 1
+        action = Action.from_index(rng.choice(np.flatnonzero(legal_action_mask(game.state, player))))
+        yield game, player, action
+        game.step(player, action)
+
+
+def test_phase_is_tracked():
+    rng = np.random.default_rng(0)
+    for seed in range(30):
+        for game, player, action in random_game(seed, rng):
+            assert game.phase == phase_of(game.state)
+            assert action.kind in {MoveKind.PICKUP, MoveKind.FLASH} or game.action_from_matrix(action.to_matrix(player), player) == action
+
+
+def test_step_matches_make_move_and_unmake_restores_phase():
+    rng = np.random.default_rng(1)
+    for seed in range(10):
+        replica = Game(seed=seed)
+        phases = []
+        for game, player, action in random_game(seed, rng):
+            phases.append(replica.phase)
+            replica.make_move(action)
+        for phase in reversed(phases):
+            replica.unmake_move()
+            assert replica.phase == phase
+        assert (replica.state == Game(seed=seed).state).all()
+
+
+def test_step_rejects_other_player():
+    game = Game(seed=0)
+    player = 0 if game.state[5, 8] else 1
+    action = Action.from_index(np.flatnonzero(legal_action_mask(game.state, player))[0])
+    with pytest.raises(ValueError):
+        game.step(1 - player, action)
+
+
+def test_user_update_rejects_empty_defence_without_trump():
+    rng = np.random.default_rng(2)
+    for seed in range(30):
+        for game, player, action in random_game(seed, rng):
+            if game.phase == Phase.DEFEND and not (game.state[player, :8] & game.state[4, :8]).any():
+                state = game.state.copy()
+                assert not game.user_update(Move(MoveType.DEFEND))[1]
+                assert (game.state == state).all()
+                return
+    pytest.fail("No defence without a trump to flash was found")
+
+
+def test_matrix_must_match_action():
+    game = Game(seed=0)
+    player = 0 if game.state[5, 8] else 1
+    card = int(np.flatnonzero(game.state[player])[0])
+    only_removed = np.zeros((6, 32), dtype=int)
+    only_removed[player, card] = -1
+    with pytest.raises(ValueError):
+        game.action_from_matrix(only_removed, player)
+
+    opponent_changed = Action(MoveKind.ATTACK, (card,)).to_matrix(player)
+    opponent_changed[1 - player, np.flatnonzero(game.state[1 - player])[0]] = -1
+    state = game.state.copy()
+    assert not game.user_update(opponent_changed)[1]
+    assert (game.state == state).all()
+
+
+def test_legacy_moves_keep_the_zobrist_hash():
+    rng = np.random.default_rng(3)
+    for seed in range(10):
+        for game, player, action in random_game(seed, rng):
+            scratch = Game.from_state(game.state.copy(), np.array(game.deck))
+            scratch.enable_zobrist()
+            if action.kind in {MoveKind.ATTACK, MoveKind.THROW_IN}:
+                assert scratch.attack(action.to_matrix(player), player)[0]
+            elif action.kind in {MoveKind.DEFEND, MoveKind.REDIRECT}:
+                assert scratch.defend(action.to_matrix(player), player)[0]
+            elif action.kind == MoveKind.PICKUP:
+                scratch.ExecutePickup(player)
+            assert scratch.zobrist == zobrist_hash(scratch.state, len(scratch.deck))
+
+
+def test_legacy_moves_keep_the_observations():
+    rng = np.random.default_rng(5)
+    for seed in range(10):
+        for game, player, action in random_game(seed, rng):
+            scratch = Game.from_state(game.state.copy(), np.array(game.deck))
+            scratch.enable_observations()
+            if action.kind in {MoveKind.ATTACK, MoveKind.THROW_IN}:
+                assert scratch.attack(action.to_matrix(player), player)[0]
+            elif action.kind in {MoveKind.DEFEND, MoveKind.REDIRECT}:
+                assert scratch.defend(action.to_matrix(player), player)[0]
+            elif action.kind == MoveKind.PICKUP:
+                board = scratch.state[4].copy()
+                scratch.ExecutePickup(player)
+                assert not (board & ~scratch.observer.known[1 - player]).any()
+            for q in (0, 1):
+                assert not (scratch.observer.known[q] & ~scratch.state[1 - q]).any()
+                fresh = encode(scratch.state, len(scratch.deck), q, scratch.observer.known[q])
+                assert (scratch.observer[q] == fresh).all()
+
+
+def test_step_rejects_actions_with_cards_their_index_does_not_stand_for():
+    rng = np.random.default_rng(4)
+    for seed in range(30):
+        for game, player, action in random_game(seed, rng):
+            if action.kind == MoveKind.THROW_IN:
+                opponent_card = int(np.flatnonzero(game.state[1 - player])[0])
+                state = game.state.copy()
+                with pytest.raises(ValueError):
+                    game.step(player, Action(MoveKind.THROW_IN, action.cards + (opponent_card,)))
+                with pytest.raises(ValueError):
+                    game.step(player, Action(MoveKind.ATTACK, action.cards))
+                assert (game.state == state).all()
+                return
+    pytest.fail("No throw in was found")
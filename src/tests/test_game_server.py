@@ -0,0 +1,70 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+import tournament
+from backend.moves import Action, MoveKind, legal_action_mask
+from bots.base import Bot
+from server.game_server import GameServer
+from server.load import LoopbackClient
+
+
+class IllegalBot(Bot):
+    def __init__(self, player_id: int, trump: int, seed=None):
+        super().__init__(player_id, trump)
+
+    def get_action(self, state_matrix: np.ndarray) -> Action:
+        return Action(MoveKind.PASS) if state_matrix[3].any() else Action(MoveKind.PICKUP)
+
+
+class RaisingBot(IllegalBot):
+    def get_action(self, state_matrix: np.ndarray) -> Action:
+        raise RuntimeError("Bot failed")
+
+
+class SmugglingBot(IllegalBot):
+    # Plays legal moves, but adds one of the opponent's cards to its first defence, throw in or redirect,
+    # which Action.index does not see as it reads only the first card
+    def get_action(self, state_matrix: np.ndarray) -> Action:
+        legal = [Action.from_index(index) for index in np.flatnonzero(legal_action_mask(state_matrix, self.player_id))]
+        for action in legal:
+            if action.kind in (MoveKind.DEFEND, MoveKind.THROW_IN, MoveKind.REDIRECT):
+                return action._replace(cards=action.cards + (int(np.flatnonzero(state_matrix[1 - self.player_id])[0]),))
+        return legal[0]
+
+
+async def play_against(spec):
+    server = GameServer(seed=0)
+    port = await server.start()
+    client = LoopbackClient(seed=0)
+    await client.connect("127.0.0.1", port)
+    await client.join(spec)
+    winner = await asyncio.wait_for(client.play(), 10)
+    await client.close()
+    await server.close()
+    return server, winner
+
+
+@pytest.mark.parametrize("bot", [IllegalBot, RaisingBot])
+def test_failing_bot_ends_the_session(monkeypatch, bot):
+    monkeypatch.setitem(tournament.AGENTS, "failing", bot)
+    server, winner = asyncio.run(play_against("failing"))
+    assert winner is None
+    assert server.bot_failures == 1
+    assert not server.sessions
+    assert server.finished[-1]["plies"] <= 1
+
+
+def test_random_bot_plays_to_the_end():
+    server, winner = asyncio.run(play_against("random"))
+    assert winner in (0, 1)
+    assert server.bot_failures == 0
+
+
+def test_bot_move_with_unindexed_cards_ends_the_session(monkeypatch):
+    monkeypatch.setitem(tournament.AGENTS, "failing", SmugglingBot)
+    server, winner = asyncio.run(play_against("failing"))
+    assert winner is None
+    assert server.bot_failures == 1
+    assert not server.sessions
@@ -0,0 +1,35 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from backend.game import Game
+from backend.moves import Action, legal_action_mask
+from bots.heuristic import LowestCardBot, OverloadBot, TrumpSaverBot
+
+
+def positions(games=20, seed=0):
+    rng = np.random.default_rng(seed)
+    states = []
+    for game_seed in range(games):
+        game = Game(seed=game_seed)
+        while not game.state[5, 11]:
+            player = 0 if game.state[5, 8] else 1
+            states.append((game.state.copy(), player))
+            legal = np.flatnonzero(legal_action_mask(game.state, player))
+            game.make_move(Action.from_index(legal[rng.integers(len(legal))]))
+    return states
+
+
+def test_choose_is_legal():
+    for state, player in positions(5):
+        for bot in (LowestCardBot, TrumpSaverBot, OverloadBot):
+            assert legal_action_mask(state, player)[bot.choose(state, player)]
+
+
+def test_concurrent_choose_is_legal():
+    states = positions()
+    with ThreadPoolExecutor(4) as executor:
+        for _ in range(3):
+            chosen = list(executor.map(lambda position: LowestCardBot.choose(*position), states))
+            for (state, player), index in zip(states, chosen):
+                assert legal_action_mask(state, player)[index]
@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+
+from backend import kernel
+from backend.bitstate import unpack
+from backend.game import Game
+from backend.moves import ACTION_SIZE, Action, legal_action_mask
+
+
+@pytest.fixture(params=["interpreted", "compiled"])
+def rules(request):
+    """
+    legal_actions, apply_action and _playouts of the kernel, as plain Python or compiled by Numba
+    """
+    functions = (kernel.legal_actions, kernel.apply_action, kernel._playouts)
+    if request.param == "compiled":
+        pytest.importorskip("numba")
+        return functions
+    return tuple(getattr(function, "py_func", function) for function in functions)
+
+
+def test_kernel_matches_game(rules):
+    legal_actions, apply_action, _ = rules
+    rng = np.random.default_rng(0)
+    out = np.empty(ACTION_SIZE, dtype=np.int64)
+    for seed in range(20):
+        game = Game(seed=seed)
+        words, deck = kernel.position_of(game)
+        position = 0
+        while True:
+            assert (unpack(words.astype(np.uint32)) == game.state).all()
+            assert (deck[position:] == game.deck).all()
+            legal = np.flatnonzero(legal_action_mask(game.state, 0 if game.state[5, 8] else 1))
+            count = legal_actions(words, out)
+            assert (out[:count] == legal).all()
+            if game.state[5, 11]:
+                break
+            action = legal[rng.integers(len(legal))]
+            game.make_move(Action.from_index(action))
+            position = apply_action(words, deck, position, action)
+
+
+def test_playouts_match_numpy_engine(rules):
+    _, _, playouts = rules
+    for seed in range(5):
+        game = Game(seed=seed)
+        draws = np.random.default_rng(seed).random((4, kernel.MAX_PLIES))
+        words, deck = kernel.position_of(game)
+        for result, expected in zip(playouts(words, deck, 0, draws), kernel._numpy_playouts(game, draws)):
+            assert (result == expected).all()
@@ -0,0 +1,49 @@
+import numpy as np
+
+from backend.game import Game
+from backend.solver import EndgameSolver
+
+TIME_LIMIT = 5.0
+
+
+def endgames(count, full=False, most_cards=None):
+    """
+    Endgames of random games from seed 0 on, played on after the deck ran out until at most most_cards
+    are in the hands, or if full 6 vs 6 endgames at the start of a bout
+    """
+    found = []
+    seed = 0
+    while len(found) < count:
+        rng = np.random.default_rng(seed)
+        game = Game(seed=seed)
+        seed += 1
+        while not game.state[5, 11] and (len(game.deck) or (most_cards is not None and game.state[[0, 1]].sum() > most_cards)):
+            moves = game.legal_moves(0 if game.state[5, 8] else 1)
+            game.make_move(moves[rng.integers(len(moves))])
+        if game.state[5, 11]:
+            continue
+        if full and ((game.state[[0, 1]].sum(axis=1) != 6).any() or game.state[4].any()):
+            continue
+        found.append(game)
+    return found
+
+
+def test_six_vs_six_endgames_are_solved_in_time():
+    for game in endgames(8, full=True):
+        result = EndgameSolver(time_limit=TIME_LIMIT).solve(game)
+        assert result.winner is not None
+        assert result.elapsed < TIME_LIMIT
+
+
+def test_best_move_keeps_the_win():
+    solver = EndgameSolver(time_limit=1.0)
+    decided = 0
+    for game in endgames(30, most_cards=8):
+        # Some small endgames can be played round in circles forever and are never decided
+        result = solver.solve(game)
+        if result.winner is None:
+            continue
+        decided += 1
+        game.make_move(result.best_move)
+        assert EndgameSolver(time_limit=TIME_LIMIT).solve(game).winner == result.winner
+    assert decided >= 20
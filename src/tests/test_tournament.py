@@ -0,0 +1,19 @@
+import json
+
+import tournament
+
+
+def test_run_summary(tmp_path):
+    out = tmp_path / "results.jsonl"
+    summary = tournament.run(["random", "lowest"], 6, 2, 0, str(out), baseline=2)
+    records = [json.loads(line) for line in out.read_text().splitlines()]
+    assert sorted(record["game"] for record in records) == list(range(6))
+    assert sum(summary["wins"]) + summary["unfinished"] == 6
+    assert summary["efficiency"] == summary["games_per_s"] / (2 * summary["single_process_games_per_s"])
+    assert 0 < summary["utilization"] <= 1
+
+
+def test_run_without_baseline(tmp_path):
+    summary = tournament.run(["random", "random"], 2, 1, 0, str(tmp_path / "results.jsonl"), baseline=0)
+    assert summary["efficiency"] is None
+    assert summary["single_process_games_per_s"] is None
@@ -0,0 +1,94 @@
+import logging
+
+import numpy as np
+import pytest
+
+from backend.game import Game
+from backend.instrumentation import log
+from backend.moves import ACTION_SIZE, Action, legal_action_mask
+from backend.validation import Reason, check_attacks, check_defences, check_throw_ins
+
+
+def _scalar(game, moves, player, kind):
+    """
+    Runs every candidate through the scalar validator on a copy of game, with the reason it logs
+    """
+    class Last(logging.Handler):
+        def emit(self, record):
+            self.reason = record.reason
+
+    handler = Last()
+    level = log.level
+    log.addHandler(handler)
+    log.setLevel(logging.DEBUG)
+    results = []
+    try:
+        for move in moves:
+            scratch = Game.from_state(game.state.copy(), game.deck)
+            handler.reason = None
+            try:
+                if kind == "attack":
+                    result = scratch._attack(move, player)
+                elif kind == "defend":
+                    result = scratch._defend(move, player)
+                else:
+                    result = (scratch.check_wurf(move, player),)
+            except AssertionError:
+                results.append((False,) + (False,) * (2 if kind == "defend" else 1 if kind == "attack" else 0)
+                               + (Reason.MALFORMED,))
+                continue
+            reason = Reason.VALID if result[0] else Reason[handler.reason.upper()]
+            results.append(tuple(result) + (reason,))
+    finally:
+        log.removeHandler(handler)
+        log.setLevel(level)
+    return results
+
+
+def _candidates(game, player, rng, count):
+    """
+    Every legal move of player as a move matrix, matrices of random actions of both roles and random noise
+    """
+    indices = list(np.flatnonzero(legal_action_mask(game.state, player)))
+    indices += list(rng.integers(ACTION_SIZE, size=count))
+    moves = [Action.from_index(index).to_matrix(player) for index in indices]
+    for _ in range(count):
+        move = np.zeros((6, 32), dtype=int)
+        rows = rng.choice([player, 3, 4], size=rng.integers(1, 4))
+        move[rows, rng.integers(32, size=len(rows))] = rng.choice([-1, 1], size=len(rows))
+        if rng.random() < 0.05:
+            move[rng.choice([1 - player, 2]), rng.integers(32)] = 1
+        moves.append(move)
+    # Half of the random actions played by the right cards: any card of the hand in the slot of another
+    for move in moves[len(indices) - count:len(indices)]:
+        hand = np.flatnonzero(game.state[player])
+        if len(hand) and rng.random() < 0.5:
+            played = np.flatnonzero(move[4] == 1)
+            if len(played):
+                card = rng.choice(hand)
+                move[[player, 4], played[0]] = 0
+                move[player, card] = -1
+                move[4, card] = 1
+                if move[3, played[0]] == 1:
+                    move[3, played[0]] = 0
+                    move[3, card] = 1
+    return np.array(moves)
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_batch_validators_match_scalar(seed):
+    # Every position of a random game, for both players
+    rng = np.random.default_rng(seed)
+    game = Game(seed=rng)
+    while not game.state[5, 11]:
+        mover = 0 if game.state[5, 8] else 1
+        for player in (mover, 1 - mover):
+            moves = _candidates(game, player, rng, 20)
+            batch = {"attack": check_attacks(game, moves, player), "defend": check_defences(game, moves, player)}
+            if np.any(game.state[4]):
+                batch["wurf"] = check_throw_ins(game, moves, player)
+            for kind, results in batch.items():
+                for i, expected in enumerate(_scalar(game, moves, player, kind)):
+                    got = tuple(bool(values[i]) for values in results[:-1]) + (Reason(results[-1][i]),)
+                    assert got == tuple(expected), (kind, player, moves[i], got, expected)
+        game.make_move(Action.from_index(rng.choice(np.flatnonzero(legal_action_mask(game.state, mover)))))
@@ -0,0 +1,178 @@
+import argparse
+import ast
+import json
+import multiprocessing
+import time
+
+import numpy as np
+
+from backend.game import Game
+from bots.heuristic import LowestCardBot, OverloadBot, TrumpSaverBot
+from bots.ismcts import ISMCTSPlayer
+from bots.random_player import RandomPlayer
+
+# Agents that can be named on the command line, as name or name:key=value,key=value
+AGENTS = {
+    "random": RandomPlayer,
+    "ismcts": ISMCTSPlayer,
+    "lowest": LowestCardBot,
+    "trumpsaver": TrumpSaverBot,
+    "overload": OverloadBot,
+}
+
+
+def parse_agent(spec: str):
+    """
+    Splits an agent spec like "ismcts:iterations=200,exploration=1.0" into the agent class and its keyword arguments.
+    """
+    name, _, options = spec.partition(":")
+    if name not in AGENTS:
+        raise ValueError(f"Unknown agent {name}, choose from {', '.join(AGENTS)}")
+    kwargs = {}
+    for option in filter(None, options.split(",")):
+        key, _, value = option.partition("=")
+        try:
+            kwargs[key] = ast.literal_eval(value)
+        except (ValueError, SyntaxError):
+            kwargs[key] = value
+    return AGENTS[name], kwargs
+
+
+def make_agent(spec: str, player_id: int, seed):
+    agent_class, kwargs = parse_agent(spec)
+    return agent_class(player_id, 0, seed=seed, **kwargs)
+
+
+def percentiles(latencies):
+    if not latencies:
+        return None
+    p50, p90, p99 = np.percentile(np.array(latencies) * 1000, [50, 90, 99])
+    return {"p50_ms": p50, "p90_ms": p90, "p99_ms": p99, "moves": len(latencies)}
+
+
+def play_game(task) -> dict:
+    """
+    Plays one game between two agent specs, the agents swap seats on odd games.
+
+    Every game gets its own seeds derived from (seed, game index), so results do not depend
+    on which worker plays a game or in what order.
+
+    Parameters:
+        task (tuple): (game index, (spec 0, spec 1), base seed, maximum number of moves).
+
+    Returns:
+        dict: The game's record, winner is the index into the spec pair or None if the move limit was hit.
+    """
+    index, specs, seed, max_plies = task
+    deal_seed, *agent_seeds = np.random.SeedSequence([seed, index]).spawn(3)
+    swap = index % 2 == 1
+    seats = [specs[1], specs[0]] if swap else list(specs)
+
+    start = time.perf_counter()
+    game = Game(seed=np.random.default_rng(deal_seed))
+    agents = [make_agent(seats[player], player, agent_seeds[player]) for player in (0, 1)]
+    latencies = [[], []]
+    plies = 0
+
+    while not game.state[5, 11] and plies < max_plies:
+        player = 0 if game.state[5, 8] else 1
+        move_start = time.perf_counter()
+        action = agents[player].get_action(game.state)
+        latencies[player].append(time.perf_counter() - move_start)
+        game.make_move(action)
+        plies += 1
+
+    for agent in agents:
+        agent.close()
+
+    winner = None
+    if game.state[5, 11]:
+        winner_seat = 0 if game.state[5, 12] else 1
+        winner = winner_seat ^ int(swap)
+
+    return {
+        "game": index,
+        "agents": list(specs),
+        "seats": seats,
+        "winner": winner,
+        "winner_agent": None if winner is None else specs[winner],
+        "plies": plies,
+        "duration_s": time.perf_counter() - start,
+        "latency": [percentiles(latencies[int(swap)]), percentiles(latencies[1 - int(swap)])],
+    }
+
+
+def run(specs, games: int, processes: int, seed: int, out: str, max_plies: int = 1000, baseline: int = 10) -> dict:
+    """
+    Plays games between the two agent specs over a process pool and streams every finished game
+    to out as one JSON line.
+
+    The first baseline games are played once more in this process beforehand, the single process
+    games per second the pool's throughput is compared against.
+
+    Returns:
+        dict: Summary with wins per agent, games per second and parallel efficiency
+    """
+    for spec in specs:
+        parse_agent(spec)
+    tasks = [(index, tuple(specs), seed, max_plies) for index in range(games)]
+    wins = [0, 0]
+    unfinished = 0
+    busy = 0.0
+
+    baseline = min(baseline, games)
+    single_games_per_s = None
+    if baseline:
+        start = time.perf_counter()
+        for task in tasks[:baseline]:
+            play_game(task)
+        single_games_per_s = baseline / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    with open(out, "w", buffering=1) as results, multiprocessing.Pool(processes) as pool:
+        for record in pool.imap_unordered(play_game, tasks):
+            results.write(json.dumps(record) + "\n")
+            busy += record["duration_s"]
+            if record["winner"] is None:
+                unfinished += 1
+            else:
+                wins[record["winner"]] += 1
+    elapsed = time.perf_counter() - start
+
+    # Efficiency is the speedup over one process per process, 1.0 is perfect linear scaling. Utilization
+    # is the share of the pool's wall time spent playing, it stays near 1.0 when the processes slow each
+    # other down (shared cores, memory bandwidth), which efficiency shows
+    games_per_s = games / elapsed
+    return {
+        "agents": list(specs),
+        "games": games,
+        "wins": wins,
+        "unfinished": unfinished,
+        "elapsed_s": elapsed,
+        "games_per_s": games_per_s,
+        "games_per_s_per_core": games_per_s / processes,
+        "single_process_games_per_s": single_games_per_s,
+        "efficiency": None if single_games_per_s is None else games_per_s / (processes * single_games_per_s),
+        "utilization": busy / (elapsed * processes),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Play many games between two agents over a process pool")
+    parser.add_argument("agents", nargs=2, help=f"agent specs, name[:key=value,...] with name in {', '.join(AGENTS)}")
+    parser.add_argument("-n", "--games", type=int, default=100)
+    parser.add_argument("-p", "--processes", type=int, default=multiprocessing.cpu_count())
+    parser.add_argument("-s", "--seed", type=int, default=0)
+    parser.add_argument("-o", "--out", default="tournament.jsonl", help="results file, one JSON line per game")
+    parser.add_argument("--max-plies", type=int, default=1000)
+    parser.add_argument("-b", "--baseline", type=int, default=10,
+                        help="games played in one process first to measure the efficiency against, 0 to skip")
+    args = parser.parse_args()
+
+    summary = run(args.agents, args.games, args.processes, args.seed, args.out, args.max_plies, args.baseline)
+    for key, value in summary.items():
+        print(f"{key}: {value}")
+
+
+if __name__ == "__main__":
+    main()